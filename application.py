@@ -1,12 +1,28 @@
 import os
-from flask import Flask, request, jsonify, redirect
+import hmac
+from flask import Flask, Response, request, jsonify, redirect, g, stream_with_context
 from flask_cors import CORS
 from werkzeug.security import check_password_hash, generate_password_hash
 import json
+import csv
+import io
 from datetime import datetime, timedelta
 import jwt
 from utils.auth import generate_token, login_required, get_user_from_request
+from utils.http_cache import etag_cache, not_modified_response, conditional_response
+from utils.compression import init_compression
+from utils.load_shedding import init_load_shedding, AdaptiveLimit
+from utils.metrics import metrics
+from utils.json_provider import FastJSONProvider
+from utils.idempotency import Idempotency
+from utils.bulkhead import Bulkhead
+from utils.single_flight import single_flight
+from utils.uploads import init_upload_limits, UploadPolicy, uploaded_type, MB
+from werkzeug.exceptions import HTTPException
 from services.aws_service import AWSService
+from services.task_queue import task_queue
+from services import request_loader
+from models.company import Company
 from dotenv import load_dotenv
 load_dotenv()  # Add this line at the top after imports
 
@@ -14,6 +30,20 @@ load_dotenv()  # Add this line at the top after imports
 application = Flask(__name__)
 application.config['SECRET_KEY'] = 'your-secret-key'
 application.config['RECAPTCHA_SECRET_KEY'] = os.environ.get('RECAPTCHA_SECRET_KEY')
+application.config['JSON_ENCODER'] = os.environ.get('JSON_ENCODER', 'auto')
+application.json = FastJSONProvider(application)
+# 0: clients revalidate settings on every use (cheap 304s), so updates show up at once
+application.config['SETTINGS_CACHE_MAX_AGE'] = int(os.environ.get('SETTINGS_CACHE_MAX_AGE', '0'))
+application.config['COMPANY_NAME_CACHE_MAX_AGE'] = int(os.environ.get('COMPANY_NAME_CACHE_MAX_AGE', '300'))
+etag_cache.ttl = float(os.environ.get('ETAG_CACHE_TTL', '30'))
+# Signs media download tokens; must be secret and shared by every worker
+application.config['MEDIA_TOKEN_SECRET'] = os.environ.get('MEDIA_TOKEN_SECRET')
+if not application.config['MEDIA_TOKEN_SECRET']:
+    raise RuntimeError("MEDIA_TOKEN_SECRET must be set to sign media download tokens")
+application.config['MEDIA_DOWNLOAD_REDIRECT'] = os.environ.get('MEDIA_DOWNLOAD_REDIRECT', 'false').lower() == 'true'
+application.config['BULK_APPROVAL_LIMIT'] = int(os.environ.get('BULK_APPROVAL_LIMIT', '500'))
+# Bearer token of the metrics scraper; /api/metrics is disabled without one
+application.config['METRICS_TOKEN'] = os.environ.get('METRICS_TOKEN')
 
 google_captcha_url = "https://www.google.com/recaptcha/api/siteverify"
 
@@ -21,13 +51,65 @@ google_captcha_url = "https://www.google.com/recaptcha/api/siteverify"
 CORS(application,
      supports_credentials=True,
      origins=["https://app.smartreferralhub.com", "http://localhost:5173"],
-     allow_headers=["Content-Type", "Authorization"],
+     allow_headers=["Content-Type", "Authorization", "Idempotency-Key"],
      methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-     expose_headers=["Content-Type", "Authorization"],
+     expose_headers=["Content-Type", "Authorization", "ETag", "Idempotent-Replayed", "Retry-After"],
      max_age=3600)
 
+# Adaptive cap on concurrent requests; public reads are shed first under load
+init_load_shedding(application, AdaptiveLimit(
+    initial=int(os.environ.get('CONCURRENCY_LIMIT_INITIAL', '20')),
+    min_limit=int(os.environ.get('CONCURRENCY_LIMIT_MIN', '4')),
+    max_limit=int(os.environ.get('CONCURRENCY_LIMIT_MAX', '200'))
+))
+
+# Compress JSON responses above the size threshold
+init_compression(application, min_size=int(os.environ.get('COMPRESS_MIN_SIZE', '1024')))
+
+# Reject oversized or non-media uploads while they stream in
+MAX_IMAGE_SIZE = int(os.environ.get('UPLOAD_MAX_IMAGE_MB', '20')) * MB
+MAX_VIDEO_SIZE = int(os.environ.get('UPLOAD_MAX_VIDEO_MB', '200')) * MB
+init_upload_limits(application, {
+    'upload_files': UploadPolicy(
+        max_request=int(os.environ.get('UPLOAD_MAX_REQUEST_MB', '300')) * MB,
+        max_sizes={'image': MAX_IMAGE_SIZE, 'video': MAX_VIDEO_SIZE}
+    ),
+    'posttags': UploadPolicy(
+        max_request=MAX_VIDEO_SIZE + MB,
+        max_sizes={'image': MAX_IMAGE_SIZE, 'video': MAX_VIDEO_SIZE}
+    )
+})
+
 # Initialize AWS services
-aws_service = AWSService()
+aws_service = AWSService(media_token_secret=application.config['MEDIA_TOKEN_SECRET'])
+# Cached ETags are checked against versions shared by every worker
+etag_cache.store = aws_service
+task_queue.start(workers=int(os.environ.get('TASK_QUEUE_WORKERS', '2')))
+
+# Retries carrying the same Idempotency-Key replay the first response
+idempotent = Idempotency(aws_service, ttl=int(os.environ.get('IDEMPOTENCY_TTL', '86400')))
+
+# Caps one company's concurrent expensive requests (client listings, exports, bulk updates)
+tenant_bulkhead = Bulkhead(
+    'tenant',
+    limit=int(os.environ.get('TENANT_CONCURRENCY', '2')),
+    wait=float(os.environ.get('TENANT_QUEUE_WAIT', '0.5'))
+)
+
+# Request-scoped loader de-duplicating and batching DynamoDB point reads
+@application.before_request
+def start_request_loader():
+    g.request_loader_token = request_loader.activate(aws_service.dynamodb)
+
+@application.teardown_request
+def finish_request_loader(exc=None):
+    token = g.pop('request_loader_token', None)
+    if token is None:
+        return
+    loader = request_loader.deactivate(token)
+    metrics.increment('request_loader.reads', loader.requested)
+    metrics.increment('request_loader.calls', loader.calls)
+    metrics.increment('request_loader.calls_saved', loader.calls_saved)
 
 # CUSTOMER LOGIN
 @application.route('/api/login', methods=['POST'])
@@ -41,12 +123,12 @@ def login():
             return jsonify({"error": "Email and password are required"}), 400
 
         # Get user and verify password
-        user_item = aws_service.get_user(email)
-        if not user_item:
+        # Strong read so a login right after signup sees the new user
+        user = aws_service.get_user(email, attributes=('password_hash', 'name'), consistent=True)
+        if not user:
             return jsonify({"error": "Invalid credentials"}), 401
 
-        stored_password = user_item.get('password', {}).get('S', '')
-        if not check_password_hash(stored_password, password):
+        if not check_password_hash(user.password_hash, password):
             return jsonify({"error": "Invalid credentials"}), 401
 
         # Generate token
@@ -55,7 +137,7 @@ def login():
         return jsonify({
             "message": "Login successful",
             "email": email,
-            "name": user_item.get('name', {}).get('S', ''),
+            "name": user.name,
             "token": token,
             "is_company": False
         }), 200
@@ -94,6 +176,9 @@ def upload_files():
             
         upload_errors = []
         uploaded_files = []
+
+        # Every file needs the referral counter and company check, load both at once
+        aws_service.prefetch_user_and_company(user_email)
         
         # Process files
         files = {}
@@ -114,7 +199,12 @@ def upload_files():
             backend_category = category_map.get(category, category)
             
             if backend_category == 'testimonial':
-                if file_list and file_list[0].filename:
+                if file_list and file_list[0].filename and not uploaded_type(file_list[0]).startswith('video/'):
+                    upload_errors.append({
+                        'file': file_list[0].filename,
+                        'error': 'Testimonial must be a video'
+                    })
+                elif file_list and file_list[0].filename:
                     url, original_name = aws_service.upload_file_to_s3(
                         file_list[0],
                         'testimonial',
@@ -157,12 +247,16 @@ def upload_files():
             "uploaded": uploaded_files
         }), 200
 
+    except HTTPException:
+        # 413/415 from the upload policy, raised while the body streams in
+        raise
     except Exception as e:
         print(f"Upload error: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
 @application.route("/api/submit", methods=['POST'])
 @login_required
+@idempotent
 def submit():
     try:
         user_email = get_user_from_request()
@@ -181,7 +275,7 @@ def submit():
         # Get total referrals
         total_referrals = aws_service.get_total_referrals(user_email)
         
-        aws_service.update_form_approval_status(user_email, total_referrals, False, "Not approved by the company yet.")
+        aws_service.queue_form_approval_status(user_email, total_referrals, False, aws_service.PENDING_REASON)
         
         return jsonify({
             "message": "Form submitted successfully"
@@ -239,17 +333,29 @@ def get_step_links(step_name):
         company_name = request.args.get('company_name')
         if not company_name:
             return jsonify({"error": "Company name is required"}), 400
-        links = aws_service.get_links_by_step(company_name, step_name.lower())
-        return jsonify({
+
+        cache_key = ('links', company_name, step_name.lower())
+        max_age = application.config['SETTINGS_CACHE_MAX_AGE']
+        not_modified = not_modified_response(cache_key, max_age)
+        if not_modified:
+            return not_modified
+
+        # Identical concurrent requests share one query
+        links = single_flight.do(
+            ('links', company_name, step_name.lower()),
+            aws_service.get_links_by_step, company_name, step_name.lower()
+        )
+        response = jsonify({
             "links": [
                 {
-                    "step_name": item['step_name']['S'],
-                    "platform": item['platform']['S'],
-                    "link": item['link']['S']
+                    "step_name": link.step_name,
+                    "platform": link.platform,
+                    "link": link.link
                 }
-                for item in links
+                for link in links
             ]
-        }), 200
+        })
+        return conditional_response(response, cache_key, max_age)
     except Exception as e:
         print(f"Error getting links: {str(e)}")
         return jsonify({"error": "Failed to get links"}), 500
@@ -278,6 +384,7 @@ def update_link():
                 new_link, 
                 new_platform.lower() if new_platform else None
             ):
+                etag_cache.invalidate('links', company_name)
                 return jsonify({"message": "Link updated successfully"}), 200
         except ValueError as e:
             return jsonify({"error": str(e)}), 400
@@ -289,6 +396,7 @@ def update_link():
         return jsonify({"error": "Failed to update link"}), 500
 
 @application.route('/api/clients', methods=['GET'])
+@tenant_bulkhead
 def get_all_clients():
     # get all clients from DynamoDB and then there media from s3 bucket {bucket/email/step_name/}
     try:
@@ -296,12 +404,111 @@ def get_all_clients():
         if not company_email:
             return jsonify({"error": "Company email is required"}), 400
             
-        clients = aws_service.get_all_clients(company_email)
+        # Identical concurrent requests share one listing
+        clients = single_flight.do(('clients', company_email), aws_service.get_all_clients, company_email)
         return jsonify({"clients": clients}), 200
     except Exception as e:
         print(f"Error getting clients: {str(e)}")
         return jsonify({"error": "Failed to get clients"}), 500
     
+@application.route('/api/approvals/pending', methods=['GET'])
+@login_required
+def get_pending_approvals():
+    """Page through a company's forms awaiting review, oldest first"""
+    try:
+        company_email = request.args.get('company_email')
+        if not company_email:
+            return jsonify({"error": "Company email is required"}), 400
+        limit = request.args.get('limit', 50, type=int)
+        if not 1 <= limit <= 100:
+            return jsonify({"error": "Limit must be between 1 and 100"}), 400
+
+        try:
+            approvals, cursor = aws_service.query_pending_approvals(
+                company_email, limit, request.args.get('cursor')
+            )
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        return jsonify({
+            "pending": [{
+                'email': approval.user_email,
+                'form_number': approval.form_number,
+                'submitted_at': approval.submitted_at
+            } for approval in approvals],
+            "cursor": cursor
+        }), 200
+    except Exception as e:
+        print(f"Error getting pending approvals: {str(e)}")
+        return jsonify({"error": "Failed to get pending approvals"}), 500
+
+@application.route('/api/clients/summary', methods=['GET'])
+@login_required
+def get_clients_summary():
+    """Dashboard counters for a company, answered from its company item"""
+    try:
+        company_email = request.args.get('company_email')
+        if not company_email:
+            return jsonify({"error": "Company email is required"}), 400
+
+        summary = aws_service.get_company_stats(company_email)
+        if summary is None:
+            return jsonify({"error": "Company not found"}), 404
+        return jsonify({"summary": summary}), 200
+    except Exception as e:
+        print(f"Error getting clients summary: {str(e)}")
+        return jsonify({"error": "Failed to get clients summary"}), 500
+
+EXPORT_FIELDS = [
+    'customer_email', 'customer_name', 'submission_number', 'friend_name', 'friend_email',
+    'friend_phone', 'score', 'approval_status', 'reason', 'media_count'
+]
+
+def _export_csv(rows):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+    writer.writeheader()
+    yield buffer.getvalue()
+    for row in rows:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerow(row)
+        yield buffer.getvalue()
+
+def _export_ndjson(rows):
+    for row in rows:
+        yield json.dumps(row) + '\n'
+
+@application.route('/api/clients/export', methods=['GET'])
+@login_required
+@tenant_bulkhead
+def export_clients():
+    """Stream one row per referral as CSV (default) or NDJSON"""
+    company_email = request.args.get('company_email')
+    if not company_email:
+        return jsonify({"error": "Company email is required"}), 400
+    export_format = request.args.get('format', 'csv').lower()
+    if export_format not in ('csv', 'ndjson'):
+        return jsonify({"error": "Format must be csv or ndjson"}), 400
+
+    def generate():
+        rows = aws_service.iter_referral_rows(company_email)
+        try:
+            yield from (_export_csv(rows) if export_format == 'csv' else _export_ndjson(rows))
+        except Exception as e:
+            # Headers are already sent; re-raising makes the server abort the
+            # chunked response so the client sees an incomplete transfer
+            # rather than a file that looks complete
+            print(f"Error exporting clients: {str(e)}")
+            raise
+
+    mimetype = 'text/csv' if export_format == 'csv' else 'application/x-ndjson'
+    return Response(
+        stream_with_context(generate()),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename="referrals.{export_format}"'}
+    )
+
 @application.route('/api/discount', methods=['GET', 'PUT'])
 def get_discount():
     try:
@@ -318,16 +525,24 @@ def get_discount():
             }
             
             if aws_service.update_company_settings(company_email, settings):
+                etag_cache.invalidate('discount', company_email)
                 return jsonify({"message": "Discount updated successfully"}), 200
             return jsonify({"error": "Failed to update discount"}), 500
         
         # GET request
+        cache_key = ('discount', company_email)
+        max_age = application.config['SETTINGS_CACHE_MAX_AGE']
+        not_modified = not_modified_response(cache_key, max_age)
+        if not_modified:
+            return not_modified
+
         settings = aws_service.get_company_settings(company_email)
         if settings:
-            return jsonify({
+            response = jsonify({
                 "discount": settings['discount'],
                 "multiplier": settings['multiplier']
-            }), 200
+            })
+            return conditional_response(response, cache_key, max_age)
         return jsonify({"error": "Failed to get discount settings"}), 500
         
     except Exception as e:
@@ -358,25 +573,16 @@ def posttags():
             except json.JSONDecodeError:
                 return jsonify({"error": "Invalid hashtags format"}), 400
 
-            # Upload file to S3
-            url, original_name = aws_service.upload_file_to_s3(
+            # Upload file to S3 and save it with the new hashtags
+            url, original_name, _, _ = aws_service.upload_post_media(
                 file,
-                'media',
-                company_email  # Use company email instead of 'admin'
+                company_email,  # Use company email instead of 'admin'
+                hashtags
             )
             
             if not url:
                 return jsonify({"error": "Failed to upload media file"}), 500
 
-            # Update company settings with new hashtags and image
-            settings = {
-                'hashtags': hashtags,
-                'post_image': url
-            }
-            
-            if not aws_service.update_company_settings(company_email, settings):
-                return jsonify({"error": "Failed to update settings"}), 500
-
             return jsonify({
                 "message": "Post updated successfully",
                 "url": url,
@@ -385,9 +591,18 @@ def posttags():
             }), 200
 
         # GET request
-        settings = aws_service.get_post_settings(company_email)
-        return jsonify(settings), 200
+        cache_key = ('posttags', company_email)
+        max_age = application.config['SETTINGS_CACHE_MAX_AGE']
+        not_modified = not_modified_response(cache_key, max_age)
+        if not_modified:
+            return not_modified
+
+        settings = single_flight.do(('posttags', company_email), aws_service.get_post_settings, company_email)
+        return conditional_response(jsonify(settings), cache_key, max_age)
             
+    except HTTPException:
+        # 413/415 from the upload policy, raised while the body streams in
+        raise
     except Exception as e:
         print(f"Error in posttags endpoint: {str(e)}")
         return jsonify({"error": "Internal server error"}), 500
@@ -401,29 +616,21 @@ def delete_post():
     
     try:
         # Check if the company exists
-        company = aws_service.get_company_by_email(company_email)
+        company = aws_service.get_company_by_email(company_email, attributes=('email',))
         if not company:
             return jsonify({'error': 'Company not found'}), 404
         
-        # Delete the post from S3
-        # List objects in the company's post directory to find files to delete
-        response = aws_service.s3_client.list_objects_v2(
-            Bucket=aws_service.bucket_name,
-            Prefix=f"{company_email}/post/"
-        )
-        
-        # Delete any files found
-        if 'Contents' in response:
-            for obj in response['Contents']:
-                aws_service.s3_client.delete_object(
-                    Bucket=aws_service.bucket_name,
-                    Key=obj['Key']
-                )
+        # Delete the post from S3 in the background; clearing post_media_key
+        # below already hides it
+        aws_service.queue_purge_prefix(f"{company_email}/post/")
         
-        # Clear the hashtags in DynamoDB
+        # Clear the hashtags and media key in DynamoDB
         aws_service.update_company_settings(company_email, {
-            'hashtags': []  # Empty list to clear hashtags
+            'hashtags': [],  # Empty list to clear hashtags
+            'post_media_key': '',
+            'post_media_type': ''
         })
+        etag_cache.invalidate('posttags', company_email)
         
         return jsonify({
             'status': 'success',
@@ -440,11 +647,18 @@ def download_media(encoded_key):
         # Add error handling for invalid encoded key
         if not encoded_key:
             return jsonify({"error": "Invalid key"}), 400
+
+        # Redirect mode lets the browser fetch straight from S3 in one hop
+        redirect_mode = request.args.get('redirect', str(application.config['MEDIA_DOWNLOAD_REDIRECT']))
+        redirect_mode = redirect_mode.lower() in ('1', 'true')
             
         # Get the download URL from S3
-        url = aws_service.get_download_url(encoded_key)
+        url = aws_service.get_download_url(encoded_key, as_attachment=not redirect_mode)
         if not url:
-            return jsonify({"error": "File not found"}), 404
+            return jsonify({"error": "Invalid or expired media token"}), 403
+
+        if redirect_mode:
+            return redirect(url, 302)
             
         # Return the signed URL
         return jsonify({"url": url})
@@ -455,6 +669,7 @@ def download_media(encoded_key):
 # on form submitted update referrals in user table and referrals score list
 @application.route('/api/update-referrals-numbers', methods=['POST'])
 @login_required
+@idempotent
 def update_referrals_numbers():
     try:
         user_email = get_user_from_request()
@@ -488,20 +703,14 @@ def add_company_info():
             return jsonify({"error": "All fields are required"}), 400
                     
         # Check if company already exists
-        existing_company = aws_service.get_item(aws_service.companies_table, {'email': email})
+        existing_company = aws_service.get_company_by_email(email, attributes=('email',), consistent=True)
         if existing_company:
             return jsonify({"success": False}), 200
             
-        # Create company record
-        company_data = {
-            'email': email,
-            'name': name,
-        }
-        
         # Save company to DynamoDB
-        aws_service.put_item(aws_service.companies_table, company_data)
+        aws_service.create_company(Company(email=email, name=name))
         
-        aws_service.init_links(name, "No Link added")
+        aws_service.queue_init_links(name, "No Link added")
         
         return jsonify({
             "success": True,
@@ -544,17 +753,17 @@ def customer_signup():
             return jsonify({"error": "All fields are required"}), 400
 
         # Check if company exists
-        company = aws_service.get_company_by_name(company_name)
+        company = aws_service.get_company_by_name(company_name, attributes=('email',))
         if not company:
             return jsonify({"error": "Invalid company"}), 404
 
         # Get company email from company data
-        company_email = company['email']
+        company_email = company.email
         if not company_email:
             return jsonify({"error": "Invalid company data"}), 500
 
         # Check if user already exists
-        existing_user = aws_service.get_user(email)
+        existing_user = aws_service.get_user(email, attributes=('email',), consistent=True)
         if existing_user:
             return jsonify({"error": "User already exists"}), 400
 
@@ -566,10 +775,7 @@ def customer_signup():
             'company_name': company_name,
             'company_email': company_email,
             'created_at': datetime.now().isoformat(),
-            'terms_accepted': False,
-            'friends': [],
-            'referrals_score': [],
-            'total_referrals': 0
+            'terms_accepted': False
         }
         
         if not aws_service.create_user(user_data):
@@ -589,10 +795,18 @@ def get_company_name():
         email = request.args.get('email')
         if not email:
             return jsonify({"error": "Email is required"}), 400
+
+        cache_key = ('company-name', email)
+        max_age = application.config['COMPANY_NAME_CACHE_MAX_AGE']
+        not_modified = not_modified_response(cache_key, max_age, private=True)
+        if not_modified:
+            return not_modified
+
         company = aws_service.get_company_by_user_email(email)
         if not company:
             return jsonify({"error": "Company not found"}), 404
-        return jsonify({"company_name": company.get('name'), "company_email": company.get('email')}), 200
+        response = jsonify({"company_name": company.name, "company_email": company.email})
+        return conditional_response(response, cache_key, max_age, private=True)
     except Exception as e:
         print(f"Error in get company name: {str(e)}")
         return jsonify({"error": "Internal server error"}), 500
@@ -604,7 +818,7 @@ def company_exists():
 
         if not company_name:
             return jsonify({"error": "Company name is required"}), 400
-        company = aws_service.get_company_by_name(company_name)
+        company = aws_service.get_company_by_name(company_name, attributes=('email',))
         if not company:
             return jsonify({"exists": False}), 200
         return jsonify({"exists": True}), 200
@@ -614,6 +828,7 @@ def company_exists():
 
 @application.route('/api/approve-form', methods=['POST'])
 @login_required
+@idempotent
 def approve_form():
     """Endpoint to approve or disapprove a form submission"""
     try:
@@ -661,6 +876,72 @@ def approve_form():
         print(f"Error in approve form: {str(e)}")
         return jsonify({"error": "Internal server error"}), 500
 
+@application.route('/api/approve-forms', methods=['POST'])
+@login_required
+@tenant_bulkhead
+@idempotent
+def approve_forms():
+    """Approve or disapprove many form submissions in one request"""
+    try:
+        data = request.get_json(silent=True) or {}
+        decisions = data.get('decisions')
+        if not isinstance(decisions, list) or not decisions:
+            return jsonify({"error": "A non-empty list of decisions is required"}), 400
+        if len(decisions) > application.config['BULK_APPROVAL_LIMIT']:
+            return jsonify({
+                "error": f"At most {application.config['BULK_APPROVAL_LIMIT']} decisions per request"
+            }), 400
+
+        current_user = get_user_from_request()
+        if not current_user:
+            return jsonify({"error": "Unauthorized"}), 401
+
+        # Validate each decision like /api/approve-form; invalid ones are
+        # reported without failing the rest
+        results = []
+        valid = []
+        seen = set()
+        for decision in decisions:
+            decision = decision if isinstance(decision, dict) else {}
+            email = decision.get('email')
+            form_number = decision.get('formNumber')
+            is_approved = decision.get('isApproved')
+            reason = decision.get('reason', '')
+            result = {"email": email, "formNumber": form_number}
+            results.append(result)
+
+            if not all([email, isinstance(form_number, int), isinstance(is_approved, bool)]):
+                result.update(success=False, error="Missing or invalid required fields")
+            elif not is_approved and not reason:
+                result.update(success=False, error="Reason is required for disapproval")
+            elif (email, form_number) in seen:
+                result.update(success=False, error="Duplicate decision for this form")
+            else:
+                seen.add((email, form_number))
+                result.update(isApproved=is_approved)
+                valid.append((result, {
+                    'user_email': email,
+                    'form_number': form_number,
+                    'is_approved': is_approved,
+                    'reason': reason
+                }))
+
+        written = aws_service.bulk_update_form_approval_status([decision for _, decision in valid])
+        for (result, _), success in zip(valid, written):
+            result['success'] = success
+            if not success:
+                result['error'] = "Failed to update form status"
+
+        succeeded = sum(1 for result in results if result['success'])
+        return jsonify({
+            "message": f"Updated {succeeded} of {len(results)} forms",
+            "results": results
+        }), 200
+
+    except Exception as e:
+        print(f"Error in bulk approve forms: {str(e)}")
+        return jsonify({"error": "Internal server error"}), 500
+
 @application.route('/api/links/check-platform', methods=['GET'])
 def check_platform_exists():
     try:
@@ -683,6 +964,16 @@ def check_platform_exists():
         print(f"Error checking platform: {str(e)}")
         return jsonify({"error": "Failed to check platform"}), 500
 
+@application.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    token = application.config['METRICS_TOKEN']
+    if not token:
+        return jsonify({"error": "Not found"}), 404
+    auth_header = request.headers.get('Authorization', '')
+    if not hmac.compare_digest(auth_header.encode(), f"Bearer {token}".encode()):
+        return jsonify({"error": "Authentication required"}), 401
+    return jsonify(metrics.snapshot()), 200
+
 @application.route('/')
 def index():
     return "Hello, World!"
@@ -0,0 +1,86 @@
+"""Compare the generated model codec with hand-walking DynamoDB items.
+
+Decodes a batch of realistic user items both ways and reports time per item
+and bytes allocated per item (tracemalloc).
+
+Usage: python -m benchmarks.dynamo_codec [users] [submissions_per_user]
+"""
+import sys
+import timeit
+import tracemalloc
+from datetime import datetime
+from models.user import User
+
+def build_user_items(num_users: int, submissions: int) -> list:
+    items = []
+    for u in range(num_users):
+        items.append({
+            'email': {'S': f"customer{u}@example.com"},
+            'password': {'S': 'scrypt:32768:8:1$' + 'x' * 120},
+            'name': {'S': f"Customer {u}"},
+            'company_name': {'S': 'Credit Repair Co'},
+            'company_email': {'S': 'owner@creditrepairco.net'},
+            'created_at': {'S': datetime(2025, 1, 1, 12, 0).isoformat()},
+            'terms_accepted': {'BOOL': True},
+            'total_referrals': {'N': str(submissions)},
+            'referrals_score': {'L': [{'N': str(10 * i)} for i in range(submissions)]},
+            'friends': {'L': [
+                {'L': [
+                    {'M': {
+                        'name': {'S': f"Friend {f}"},
+                        'email': {'S': f"friend{f}@example.com"},
+                        'phone_number': {'S': '555-0100'}
+                    }}
+                    for f in range(3)
+                ]}
+                for _ in range(submissions)
+            ]}
+        })
+    return items
+
+def walk_dicts(item):
+    """The dict-walking previously done in AWSService.get_all_clients"""
+    friends = item.get('friends', {}).get('L', [])
+    return {
+        'email': item.get('email', {}).get('S', ''),
+        'name': item.get('name', {}).get('S', ''),
+        'password': item.get('password', {}).get('S', ''),
+        'company_email': item.get('company_email', {}).get('S', ''),
+        'terms_accepted': item.get('terms_accepted', {}).get('BOOL', False),
+        'total_referrals': int(item.get('total_referrals', {}).get('N', '0')),
+        'referrals_score': [int(s.get('N', '0')) for s in item.get('referrals_score', {}).get('L', [])],
+        'friends': [
+            [
+                {
+                    'name': f.get('M', {}).get('name', {}).get('S', ''),
+                    'email': f.get('M', {}).get('email', {}).get('S', ''),
+                    'phone': f.get('M', {}).get('phone_number', {}).get('S', '')
+                }
+                for f in group.get('L', [])
+            ]
+            for group in friends
+        ]
+    }
+
+def measure(label: str, decode, items: list):
+    runs = 5
+    seconds = min(timeit.repeat(lambda: [decode(i) for i in items], number=runs, repeat=3)) / runs
+    tracemalloc.start()
+    decoded = [decode(i) for i in items]
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del decoded
+    per_item = len(items)
+    print(f"{label:>10}: {seconds / per_item * 1e6:7.2f} us/item  "
+          f"{retained / per_item:8.0f} B retained/item  {peak / per_item:8.0f} B peak/item")
+
+def main():
+    num_users = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    submissions = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    items = build_user_items(num_users, submissions)
+    print(f"{num_users} user items x {submissions} submissions")
+    measure('dict-walk', walk_dicts, items)
+    measure('codec', User.from_dynamo_item, items)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""Compare the JSON encoders available to FastJSONProvider on a /api/clients-shaped payload.
+
+Usage: python -m benchmarks.json_encoders [clients] [referrals_per_client]
+"""
+import random
+import sys
+import timeit
+from datetime import datetime, timedelta
+from decimal import Decimal
+from utils.json_provider import ENCODERS
+
+def build_clients_payload(num_clients: int, referrals: int) -> dict:
+    rng = random.Random(42)
+    now = datetime(2025, 1, 1)
+    clients = {}
+    for c in range(num_clients):
+        email = f"customer{c}@example.com"
+        data = []
+        for i in range(referrals):
+            media = {}
+            for step in ('reviews', 'social', 'content', 'tagging'):
+                media[step] = [
+                    {
+                        'filename': f"20250101_120000_{rng.randint(10000000, 99999999)}.jpg",
+                        'url': (
+                            f"https://smartreferralhub-bucket.s3.amazonaws.com/{email}/{i}/{step}/file.jpg"
+                            "?X-Amz-Algorithm=AWS4-HMAC-SHA256&X-Amz-Credential=AKIAEXAMPLE%2F20250101%2F"
+                            "us-west-1%2Fs3%2Faws4_request&X-Amz-Date=20250101T120000Z&X-Amz-Expires=3600"
+                            f"&X-Amz-SignedHeaders=host&X-Amz-Signature={rng.getrandbits(256):064x}"
+                        ),
+                        'uploaded_at': now + timedelta(minutes=rng.randint(0, 10000))
+                    }
+                    for _ in range(2)
+                ]
+            data.append({
+                'status': {'is_approved': rng.random() < 0.5, 'updated_at': now.isoformat(), 'reason': ''},
+                'score': Decimal(rng.randint(0, 100)),
+                'friends': [
+                    {'name': f"Friend {f}", 'email': f"friend{f}@example.com", 'phone': '555-0100'}
+                    for f in range(3)
+                ],
+                'media': media
+            })
+        clients[email] = {
+            'info': {'email': email, 'name': f"Customer {c}", 'terms_accepted': True, 'total_referrals': referrals},
+            'data': data
+        }
+    return {'clients': clients}
+
+def main():
+    num_clients = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    referrals = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    payload = build_clients_payload(num_clients, referrals)
+    print(f"payload: {num_clients} clients x {referrals} referrals")
+    for name, encode in ENCODERS.items():
+        size = len(encode(payload))
+        runs = 20
+        seconds = min(timeit.repeat(lambda: encode(payload), number=runs, repeat=3)) / runs
+        print(f"{name:>8}: {seconds * 1000:8.2f} ms/encode  {size / 1024:9.1f} KiB")
+
+if __name__ == '__main__':
+    main()
@@ -2,6 +2,7 @@ import boto3
 import os
 from datetime import datetime
 from dotenv import load_dotenv
+from models.referral_link import ReferralLink
 
 def init_links():
     # Load environment variables from .env file
@@ -49,17 +50,17 @@ def init_links():
 
         # Insert initial links
         for link_data in initial_links:
-            link = {
-                'id': {'S': f"{link_data['step_name']}#{link_data['platform']}"},
-                'step_name': {'S': link_data['step_name']},
-                'platform': {'S': link_data['platform']},
-                'link': {'S': link_data['link']},
-                'created_at': {'N': str(int(datetime.now().timestamp()))}
-            }
+            link = ReferralLink(
+                id=f"{link_data['step_name']}#{link_data['platform']}",
+                step_name=link_data['step_name'],
+                platform=link_data['platform'],
+                link=link_data['link'],
+                created_at=datetime.now()
+            )
             try:
                 response = dynamodb.put_item(
                     TableName=table_name,
-                    Item=link
+                    Item=link.to_dynamo_item()
                 )
                 print(f"Added link: {link_data['step_name']} - {link_data['platform']}")
             except Exception as e:
@@ -0,0 +1,68 @@
+import argparse
+import boto3
+import os
+from dotenv import load_dotenv
+from migrations import all_migrations
+from migrations.runner import MigrationRunner
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Apply pending DynamoDB schema migrations')
+    parser.add_argument('--list', action='store_true', help='show each migration and its status, then exit')
+    parser.add_argument('--dry-run', action='store_true', help='scan and report what would change without writing')
+    parser.add_argument('--only', help='apply just this migration id')
+    parser.add_argument('--segments', type=int, default=4, help='parallel scan segments per backfill')
+    parser.add_argument('--capacity-share', type=float, default=0.25,
+                        help='share of a provisioned table\'s read/write capacity a backfill may use')
+    parser.add_argument('--read-units', type=float, default=100,
+                        help='read units per second a backfill may use on an on-demand table')
+    parser.add_argument('--write-units', type=float, default=50,
+                        help='write units per second a backfill may use on an on-demand table')
+    return parser.parse_args()
+
+def migrate():
+    args = parse_args()
+
+    # Load environment variables from .env file
+    load_dotenv()
+
+    aws_access_key_id = os.getenv('AWS_ACCESS_KEY_ID')
+    aws_secret_access_key = os.getenv('AWS_SECRET_ACCESS_KEY')
+
+    if not aws_access_key_id or not aws_secret_access_key:
+        print("Error: AWS credentials not found in environment variables")
+        return
+
+    try:
+        dynamodb = boto3.client(
+            'dynamodb',
+            region_name='us-west-1',
+            aws_access_key_id=aws_access_key_id,
+            aws_secret_access_key=aws_secret_access_key
+        )
+        runner = MigrationRunner(
+            dynamodb,
+            segments=args.segments,
+            capacity_share=args.capacity_share,
+            on_demand_read_units=args.read_units,
+            on_demand_write_units=args.write_units,
+            dry_run=args.dry_run
+        )
+        migrations = all_migrations()
+
+        if args.list:
+            records = runner.get_records()
+            for migration in sorted(migrations, key=lambda m: m.id):
+                record = records.get(migration.id)
+                status = record.status if record else 'pending'
+                print(f"{migration.id:<28} {status:<8} {migration.description}")
+            return
+
+        if args.only and args.only not in {migration.id for migration in migrations}:
+            print(f"Error: unknown migration {args.only}")
+            return
+        runner.run(migrations, only=args.only)
+    except Exception as e:
+        print(f"Error running migrations: {str(e)}")
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,13 @@
+"""Schema migrations, applied in id order by `python migrate.py`"""
+from migrations.users_company_index import UsersCompanyIndex
+from migrations.form_approval_keys import FormApprovalKeys
+from migrations.split_referrals import SplitReferrals
+from migrations.pending_approvals import PendingApprovals
+
+def all_migrations():
+    return [
+        UsersCompanyIndex(),
+        FormApprovalKeys(),
+        SplitReferrals(),
+        PendingApprovals()
+    ]
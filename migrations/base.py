@@ -0,0 +1,114 @@
+import threading
+import time
+from services.scanner import CapacityThrottle
+
+class MigrationContext:
+    """What a migration uses to touch DynamoDB during a run
+
+    Reads and writes made through the context are charged against the run's
+    capacity caps, and writes are only counted, not made, in a dry run.
+    """
+
+    def __init__(self, dynamodb, dry_run: bool = False, read_throttle: CapacityThrottle = None,
+                 write_throttle: CapacityThrottle = None):
+        self.dynamodb = dynamodb
+        self.dry_run = dry_run
+        self.read_throttle = read_throttle
+        self.write_throttle = write_throttle
+        self._lock = threading.Lock()
+        self.writes = 0
+
+    def get_item(self, **params):
+        """GetItem charged against the read cap; returns the item or None"""
+        response = self.dynamodb.get_item(ReturnConsumedCapacity='TOTAL', **params)
+        if self.read_throttle:
+            self.read_throttle.spend(response.get('ConsumedCapacity', {}).get('CapacityUnits', 0))
+        return response.get('Item')
+
+    def write(self, operation: str, **params) -> bool:
+        """Run put_item, update_item or delete_item unless this is a dry run
+
+        Returns False if the write's ConditionExpression failed.
+        """
+        with self._lock:
+            self.writes += 1
+        if self.dry_run:
+            return True
+        try:
+            response = getattr(self.dynamodb, operation)(ReturnConsumedCapacity='TOTAL', **params)
+        except self.dynamodb.exceptions.ConditionalCheckFailedException:
+            # A failed condition still consumes a write unit
+            if self.write_throttle:
+                self.write_throttle.spend(1)
+            return False
+        if self.write_throttle:
+            self.write_throttle.spend(response.get('ConsumedCapacity', {}).get('CapacityUnits', 0))
+        return True
+
+    def create_index(self, table: str, index: dict, attribute_definitions: list):
+        """Add a global secondary index unless the table already has it
+
+        Waits until the table and the index are ACTIVE, since DynamoDB builds
+        only one index per table at a time and later migrations may update
+        the same table.
+        """
+        description = self._wait_until_active(table)
+        if any(existing['IndexName'] == index['IndexName']
+               for existing in description.get('GlobalSecondaryIndexes', [])):
+            print(f"{index['IndexName']} already exists on {table}")
+            self._wait_until_active(table, index['IndexName'])
+            return
+        if description.get('BillingModeSummary', {}).get('BillingMode') != 'PAY_PER_REQUEST':
+            index = dict(index, ProvisionedThroughput={'ReadCapacityUnits': 5, 'WriteCapacityUnits': 5})
+        print(f"{'Would create' if self.dry_run else 'Creating'} {index['IndexName']} on {table}")
+        if self.dry_run:
+            return
+        self.dynamodb.update_table(
+            TableName=table,
+            AttributeDefinitions=attribute_definitions,
+            GlobalSecondaryIndexUpdates=[{'Create': index}]
+        )
+        self._wait_until_active(table, index['IndexName'])
+
+    def _wait_until_active(self, table: str, index_name: str = None, poll_interval: float = 10):
+        """Poll until the table (and index_name, if given) is ACTIVE; returns the table description"""
+        while True:
+            description = self.dynamodb.describe_table(TableName=table)['Table']
+            index_status = 'ACTIVE'
+            if index_name:
+                index_status = next(
+                    (index.get('IndexStatus') for index in description.get('GlobalSecondaryIndexes', [])
+                     if index['IndexName'] == index_name),
+                    'CREATING'
+                )
+            if description.get('TableStatus') == 'ACTIVE' and index_status == 'ACTIVE':
+                return description
+            print(f"Waiting for {index_name or table} to become active "
+                  f"(table {description.get('TableStatus')}, index {index_status})")
+            time.sleep(poll_interval)
+
+class Migration:
+    """One schema change, optionally with a backfill over every item of `table`
+
+    Subclasses set `id` (applied in sorted order), `description` and, for a
+    backfill, `table` and `scan_params()`; `process` is called once per
+    scanned item, possibly from several threads at once. Backfills may be
+    interrupted and resumed, so `process` must be idempotent.
+    """
+    id = ''
+    description = ''
+    table = None
+
+    def before(self, ctx: MigrationContext):
+        """Runs before the backfill, e.g. to create an index the backfill feeds"""
+
+    def scan_params(self) -> dict:
+        """Extra Scan parameters (FilterExpression, ProjectionExpression...)"""
+        return {}
+
+    def process(self, ctx: MigrationContext, item: dict) -> bool:
+        """Migrate one item; returns True if it was (or would be) changed"""
+        return False
+
+    def after(self, ctx: MigrationContext):
+        """Runs once the backfill has finished, e.g. to index the backfilled attributes"""
@@ -0,0 +1,50 @@
+from migrations.base import Migration
+from models.form_approval import FormApproval
+
+class FormApprovalKeys(Migration):
+    id = '0002_form_approval_keys'
+    description = 'Set user_email and form_number on approvals, then add UserFormIndex'
+    table = 'smart-referral-form-approvals'
+
+    def scan_params(self):
+        return {
+            'FilterExpression': 'attribute_not_exists(user_email)',
+            'ProjectionExpression': 'form_id'
+        }
+
+    def process(self, ctx, item):
+        form_id = item['form_id']['S']
+        try:
+            user_email, form_number = FormApproval.parse_form_id(form_id)
+        except ValueError:
+            print(f"Skipping malformed form_id: {form_id}")
+            return False
+        return ctx.write(
+            'update_item',
+            TableName=self.table,
+            Key={'form_id': {'S': form_id}},
+            UpdateExpression='SET user_email = :email, form_number = :number',
+            ConditionExpression='attribute_exists(form_id)',
+            ExpressionAttributeValues={
+                ':email': {'S': user_email},
+                ':number': {'N': str(form_number)}
+            }
+        )
+
+    def after(self, ctx):
+        # Indexed after the backfill so it is built from complete rows
+        ctx.create_index(
+            self.table,
+            {
+                'IndexName': 'UserFormIndex',
+                'KeySchema': [
+                    {'AttributeName': 'user_email', 'KeyType': 'HASH'},
+                    {'AttributeName': 'form_number', 'KeyType': 'RANGE'}
+                ],
+                'Projection': {'ProjectionType': 'ALL'}
+            },
+            [
+                {'AttributeName': 'user_email', 'AttributeType': 'S'},
+                {'AttributeName': 'form_number', 'AttributeType': 'N'}
+            ]
+        )
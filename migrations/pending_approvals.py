@@ -0,0 +1,74 @@
+from migrations.base import Migration
+from models.form_approval import PENDING_REASON
+
+USERS_TABLE = 'smart-referral-users'
+
+class PendingApprovals(Migration):
+    id = '0004_pending_approvals'
+    description = 'Add PendingApprovalIndex and enter forms awaiting review into it'
+    table = 'smart-referral-form-approvals'
+
+    def __init__(self):
+        self._company_emails = {}
+
+    def before(self, ctx):
+        ctx.create_index(
+            self.table,
+            {
+                'IndexName': 'PendingApprovalIndex',
+                'KeySchema': [
+                    {'AttributeName': 'pending_company', 'KeyType': 'HASH'},
+                    {'AttributeName': 'submitted_at', 'KeyType': 'RANGE'}
+                ],
+                'Projection': {
+                    'ProjectionType': 'INCLUDE',
+                    'NonKeyAttributes': ['user_email', 'form_number']
+                }
+            },
+            [
+                {'AttributeName': 'pending_company', 'AttributeType': 'S'},
+                {'AttributeName': 'submitted_at', 'AttributeType': 'S'}
+            ]
+        )
+
+    def scan_params(self):
+        return {
+            'FilterExpression': 'is_approved = :false AND reason = :pending AND attribute_not_exists(pending_company)',
+            'ProjectionExpression': 'form_id, user_email, updated_at',
+            'ExpressionAttributeValues': {
+                ':false': {'BOOL': False},
+                ':pending': {'S': PENDING_REASON}
+            }
+        }
+
+    def _company_email_of(self, ctx, user_email: str):
+        if user_email not in self._company_emails:
+            user = ctx.get_item(
+                TableName=USERS_TABLE,
+                Key={'email': {'S': user_email}},
+                ProjectionExpression='company_email'
+            )
+            self._company_emails[user_email] = (user or {}).get('company_email', {}).get('S')
+        return self._company_emails[user_email]
+
+    def process(self, ctx, item):
+        form_id = item['form_id']['S']
+        user_email = item.get('user_email', {}).get('S')
+        company_email = self._company_email_of(ctx, user_email) if user_email else None
+        if not company_email:
+            print(f"Skipping {form_id}: no user_email or company (needs 0002_form_approval_keys)")
+            return False
+        return ctx.write(
+            'update_item',
+            TableName=self.table,
+            Key={'form_id': {'S': form_id}},
+            UpdateExpression='SET pending_company = :company, submitted_at = :submitted_at',
+            # Leave forms that were reviewed since the scan alone
+            ConditionExpression='is_approved = :false AND reason = :pending',
+            ExpressionAttributeValues={
+                ':company': {'S': company_email},
+                ':submitted_at': item.get('updated_at', {'S': ''}),
+                ':false': {'BOOL': False},
+                ':pending': {'S': PENDING_REASON}
+            }
+        )
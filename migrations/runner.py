@@ -0,0 +1,170 @@
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from models.codec import codec_for
+from models.migration_record import MigrationRecord
+from services.scanner import CapacityThrottle, scan_pages
+from migrations.base import MigrationContext
+
+MIGRATIONS_TABLE = 'smart-referral-migrations'
+
+class MigrationRunner:
+    """Applies pending migrations, recording progress in MIGRATIONS_TABLE
+
+    Backfills scan with parallel segments and stay under `capacity_share` of
+    the table's provisioned read and write capacity (or the given unit caps
+    for on-demand tables). Each segment's position is checkpointed after
+    every page, so an interrupted run resumes where it stopped.
+    """
+
+    def __init__(self, dynamodb, segments: int = 4, capacity_share: float = 0.25,
+                 on_demand_read_units: float = 100, on_demand_write_units: float = 50,
+                 dry_run: bool = False):
+        self.dynamodb = dynamodb
+        self.segments = segments
+        self.capacity_share = capacity_share
+        self.on_demand_read_units = on_demand_read_units
+        self.on_demand_write_units = on_demand_write_units
+        self.dry_run = dry_run
+        self.codec = codec_for(MigrationRecord)
+
+    def _create_migrations_table_if_not_exists(self):
+        try:
+            self.dynamodb.describe_table(TableName=MIGRATIONS_TABLE)
+        except self.dynamodb.exceptions.ResourceNotFoundException:
+            print(f"Creating migrations table: {MIGRATIONS_TABLE}")
+            self.dynamodb.create_table(
+                TableName=MIGRATIONS_TABLE,
+                KeySchema=[{'AttributeName': 'id', 'KeyType': 'HASH'}],
+                AttributeDefinitions=[{'AttributeName': 'id', 'AttributeType': 'S'}],
+                BillingMode='PAY_PER_REQUEST'
+            )
+            waiter = self.dynamodb.get_waiter('table_exists')
+            waiter.wait(TableName=MIGRATIONS_TABLE)
+
+    def get_records(self) -> dict:
+        """Migration records by id"""
+        try:
+            self.dynamodb.describe_table(TableName=MIGRATIONS_TABLE)
+        except self.dynamodb.exceptions.ResourceNotFoundException:
+            return {}
+        records = {}
+        params = {'TableName': MIGRATIONS_TABLE, 'ConsistentRead': True}
+        while True:
+            response = self.dynamodb.scan(**params)
+            for item in response.get('Items', []):
+                record = self.codec.decode(item)
+                records[record.id] = record
+            if 'LastEvaluatedKey' not in response:
+                return records
+            params['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    def _save(self, record: MigrationRecord):
+        if not self.dry_run:
+            self.dynamodb.put_item(TableName=MIGRATIONS_TABLE, Item=self.codec.encode(record))
+
+    def _capacity_caps(self, table: str):
+        """(read units/s, write units/s) this run may consume on table
+
+        Every write to the table is also written to each of its global
+        secondary indexes, so the write cap follows the least provisioned of
+        them. The scan only reads the table itself.
+        """
+        description = self.dynamodb.describe_table(TableName=table)['Table']
+        throughput = description.get('ProvisionedThroughput', {})
+        read_units = throughput.get('ReadCapacityUnits') or 0
+        write_units = throughput.get('WriteCapacityUnits') or 0
+        for index in description.get('GlobalSecondaryIndexes', []):
+            index_write_units = index.get('ProvisionedThroughput', {}).get('WriteCapacityUnits') or 0
+            if index_write_units:
+                write_units = min(write_units, index_write_units)
+        if not read_units or not write_units:
+            # On-demand tables have no provisioned capacity to take a share of
+            return self.on_demand_read_units, self.on_demand_write_units
+        return read_units * self.capacity_share, write_units * self.capacity_share
+
+    def run(self, migrations: list, only: str = None):
+        """Apply every migration not yet applied (or just `only`), in id order"""
+        if not self.dry_run:
+            self._create_migrations_table_if_not_exists()
+        records = self.get_records()
+        for migration in sorted(migrations, key=lambda m: m.id):
+            if only and migration.id != only:
+                continue
+            record = records.get(migration.id)
+            if record and record.status == 'applied':
+                print(f"{migration.id}: already applied")
+                continue
+            self.apply(migration, record)
+
+    def apply(self, migration, record: MigrationRecord = None):
+        if record is None:
+            record = MigrationRecord(id=migration.id, segments=self.segments, started_at=datetime.now())
+        else:
+            print(f"{migration.id}: resuming ({record.scanned} items scanned so far)")
+        print(f"{migration.id}: {migration.description}{' (dry run)' if self.dry_run else ''}")
+
+        read_cap = write_cap = None
+        if migration.table:
+            read_cap, write_cap = self._capacity_caps(migration.table)
+        ctx = MigrationContext(
+            self.dynamodb, self.dry_run,
+            CapacityThrottle(read_cap) if read_cap else None,
+            CapacityThrottle(write_cap) if write_cap else None
+        )
+        self._save(record)
+
+        migration.before(ctx)
+        if migration.table:
+            self._backfill(migration, ctx, record, read_cap)
+        migration.after(ctx)
+
+        record.status = 'applied'
+        record.applied_at = datetime.now()
+        self._save(record)
+        print(f"{migration.id}: {'would change' if self.dry_run else 'changed'} {record.changed} "
+              f"of {record.scanned} items scanned")
+
+    def _backfill(self, migration, ctx: MigrationContext, record: MigrationRecord, read_cap: float):
+        checkpoints = {int(segment): key for segment, key in json.loads(record.checkpoints).items()}
+        lock = threading.Lock()
+        # Bounds the pages waiting to be processed, so a slow migration
+        # throttles the scan instead of buffering the table in memory
+        slots = threading.Semaphore(record.segments * 2)
+
+        def process_page(segment: int, items: list, last_key):
+            try:
+                changed = 0
+                for item in items:
+                    if migration.process(ctx, item):
+                        changed += 1
+                with lock:
+                    record.scanned += len(items)
+                    record.changed += changed
+                    checkpoints[segment] = last_key
+                    record.checkpoints = json.dumps(checkpoints)
+                    # A dry run never records progress
+                    self._save(record)
+            finally:
+                slots.release()
+
+        # One thread per segment keeps each segment's pages, and so its
+        # checkpoints, in order
+        executors = [ThreadPoolExecutor(max_workers=1) for _ in range(record.segments)]
+        futures = []
+        try:
+            for segment, items, last_key in scan_pages(
+                    self.dynamodb, record.segments, read_cap,
+                    start_keys=checkpoints, TableName=migration.table, **migration.scan_params()):
+                slots.acquire()
+                futures.append(executors[segment].submit(process_page, segment, items, last_key))
+                # Surface failures promptly rather than after the whole scan
+                for future in [f for f in futures if f.done()]:
+                    future.result()
+                    futures.remove(future)
+            for future in futures:
+                future.result()
+        finally:
+            for executor in executors:
+                executor.shutdown(wait=True)
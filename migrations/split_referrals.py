@@ -0,0 +1,62 @@
+from migrations.base import Migration
+from models.codec import codec_for
+from models.user import User
+from models.submission import Submission
+
+SUBMISSIONS_TABLE = 'smart-referral-submissions'
+
+class SplitReferrals(Migration):
+    id = '0003_split_referrals'
+    description = "Move users' friends/referrals_score lists into submission items"
+    table = 'smart-referral-users'
+
+    def __init__(self):
+        self.user_codec = codec_for(User)
+        self.submission_codec = codec_for(Submission)
+
+    def scan_params(self):
+        return {
+            'FilterExpression': 'attribute_exists(friends) OR attribute_exists(referrals_score)',
+            **self.user_codec.projection('email', 'friends', 'referrals_score')
+        }
+
+    def process(self, ctx, item):
+        user = self.user_codec.decode(item)
+        friends = user.friends or []
+        scores = user.referrals_score or []
+
+        for i in range(max(len(friends), len(scores))):
+            # Fill in only the fields the application hasn't written itself
+            fields = {'friends': friends[i] if i < len(friends) else []}
+            if i < len(scores) and scores[i] is not None:
+                fields['score'] = scores[i]
+            ctx.write(
+                'update_item',
+                TableName=SUBMISSIONS_TABLE,
+                Key=self.submission_codec.key(user_email=user.email, submission_number=i),
+                UpdateExpression='SET ' + ', '.join(f'#{field} = if_not_exists(#{field}, :{field})' for field in fields),
+                ExpressionAttributeNames={
+                    f'#{field}': self.submission_codec.attribute_names[field] for field in fields
+                },
+                ExpressionAttributeValues={
+                    f':{field}': self.submission_codec.encode_value(field, value) for field, value in fields.items()
+                }
+            )
+
+        # Only remove the lists if nothing was appended to them while copying
+        conditions = []
+        values = {}
+        if user.friends is not None:
+            conditions.append('size(friends) = :friends_size')
+            values[':friends_size'] = {'N': str(len(friends))}
+        if user.referrals_score is not None:
+            conditions.append('size(referrals_score) = :scores_size')
+            values[':scores_size'] = {'N': str(len(scores))}
+        return ctx.write(
+            'update_item',
+            TableName=self.table,
+            Key=self.user_codec.key(email=user.email),
+            UpdateExpression='REMOVE friends, referrals_score',
+            ConditionExpression=' AND '.join(conditions),
+            ExpressionAttributeValues=values
+        )
@@ -0,0 +1,18 @@
+from migrations.base import Migration
+
+class UsersCompanyIndex(Migration):
+    """Every user already carries company_email, so DynamoDB backfills the
+    index itself; there is nothing to rewrite."""
+    id = '0001_users_company_index'
+    description = 'Add CompanyEmailIndex to the users table'
+
+    def before(self, ctx):
+        ctx.create_index(
+            'smart-referral-users',
+            {
+                'IndexName': 'CompanyEmailIndex',
+                'KeySchema': [{'AttributeName': 'company_email', 'KeyType': 'HASH'}],
+                'Projection': {'ProjectionType': 'ALL'}
+            },
+            [{'AttributeName': 'company_email', 'AttributeType': 'S'}]
+        )
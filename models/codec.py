@@ -0,0 +1,163 @@
+"""Schema-driven codec between DynamoDB's wire format and the model classes.
+
+Models are `__slots__` dataclasses whose fields are declared with `attr()`,
+naming the stored attribute and its kind. `codec_for(cls)` generates plain
+Python `decode`/`encode` functions for the model once, so converting an item
+is a straight run of dict lookups with no per-field dispatch.
+"""
+from dataclasses import MISSING, field, fields, is_dataclass
+from datetime import datetime
+from decimal import Decimal
+
+class Kind:
+    """How one attribute is represented in DynamoDB.
+
+    `decode(src)` and `encode(src)` return Python source for an expression
+    converting the attribute value (or model value) held in variable `src`.
+    """
+    def __init__(self, name: str, decode: str, encode: str):
+        self.name = name
+        self._decode = decode
+        self._encode = encode
+
+    def decode(self, src: str, ns: dict, depth: int = 0) -> str:
+        return self._decode.format(v=src)
+
+    def encode(self, src: str, ns: dict, depth: int = 0) -> str:
+        return self._encode.format(v=src)
+
+    def __repr__(self):
+        return self.name
+
+STRING = Kind('STRING', "{v}['S']", "{{'S': {v}}}")
+INT = Kind('INT', "int({v}['N'])", "{{'N': str({v})}}")
+DECIMAL = Kind('DECIMAL', "Decimal({v}['N'])", "{{'N': str({v})}}")
+BOOL = Kind('BOOL', "{v}['BOOL']", "{{'BOOL': {v}}}")
+BINARY = Kind('BINARY', "bytes({v}['B'])", "{{'B': {v}}}")
+ISO_DATETIME = Kind('ISO_DATETIME', "datetime.fromisoformat({v}['S'])", "{{'S': {v}.isoformat()}}")
+EPOCH_DATETIME = Kind(
+    'EPOCH_DATETIME',
+    "datetime.fromtimestamp(int({v}['N']))",
+    "{{'N': str(int({v}.timestamp()))}}"
+)
+
+class ListOf(Kind):
+    """A DynamoDB list (L) whose elements all share one kind"""
+    def __init__(self, element: Kind):
+        self.name = f'ListOf({element!r})'
+        self.element = element
+
+    def decode(self, src: str, ns: dict, depth: int = 0) -> str:
+        var = f'_x{depth}'
+        return f"[{self.element.decode(var, ns, depth + 1)} for {var} in {src}['L']]"
+
+    def encode(self, src: str, ns: dict, depth: int = 0) -> str:
+        var = f'_x{depth}'
+        return f"{{'L': [{self.element.encode(var, ns, depth + 1)} for {var} in {src}]}}"
+
+class MapOf(Kind):
+    """A DynamoDB map (M) holding a nested model"""
+    def __init__(self, model: type):
+        self.name = f'MapOf({model.__name__})'
+        self.model = model
+
+    def decode(self, src: str, ns: dict, depth: int = 0) -> str:
+        ns[f'_decode_{self.model.__name__}'] = codec_for(self.model).decode
+        return f"_decode_{self.model.__name__}({src}['M'])"
+
+    def encode(self, src: str, ns: dict, depth: int = 0) -> str:
+        ns[f'_encode_{self.model.__name__}'] = codec_for(self.model).encode
+        return f"{{'M': _encode_{self.model.__name__}({src})}}"
+
+def attr(name: str = None, kind: Kind = STRING, default=MISSING, default_factory=MISSING):
+    """Declare a model field stored as DynamoDB attribute `name` (defaults to the field name)
+
+    Every field needs a default, since projected reads return partial items.
+    """
+    if default is MISSING and default_factory is MISSING:
+        default = None
+    return field(default=default, default_factory=default_factory,
+                 metadata={'dynamo_name': name, 'dynamo_kind': kind})
+
+class ItemCodec:
+    """Generated converter between one model class and DynamoDB items"""
+
+    def __init__(self, model: type):
+        if not is_dataclass(model):
+            raise TypeError(f"{model.__name__} is not a dataclass")
+        self.model = model
+        self.fields = {}  # field name -> (attribute name, kind)
+        for f in fields(model):
+            kind = f.metadata.get('dynamo_kind')
+            if kind is not None:
+                self.fields[f.name] = (f.metadata.get('dynamo_name') or f.name, kind)
+        self.attribute_names = {name: attribute for name, (attribute, _) in self.fields.items()}
+        self.decode = self._build_decode()
+        self.encode = self._build_encode()
+        self._value_encoders = {}
+
+    def _build_decode(self):
+        ns = {'Decimal': Decimal, 'datetime': datetime, '_model': self.model}
+        lines = ['def decode(item):', '    if not item:', '        return None']
+        args = []
+        # Positional construction is measurably faster, but only safe when
+        # every field is stored
+        positional = len(self.fields) == len(fields(self.model))
+        for i, f in enumerate(fields(self.model)):
+            if f.name not in self.fields:
+                continue
+            attribute, kind = self.fields[f.name]
+            if f.default_factory is not MISSING:
+                ns[f'_factory{i}'] = f.default_factory
+                default = f'_factory{i}()'
+            else:
+                ns[f'_default{i}'] = f.default
+                default = f'_default{i}'
+            lines.append(f"    v = item.get({attribute!r})")
+            lines.append(f"    f{i} = {kind.decode('v', ns)} if v is not None else {default}")
+            args.append(f"f{i}" if positional else f"{f.name}=f{i}")
+        lines.append(f"    return _model({', '.join(args)})")
+        exec('\n'.join(lines), ns)
+        return ns['decode']
+
+    def _build_encode(self):
+        ns = {}
+        lines = ['def encode(obj):', '    item = {}']
+        for name, (attribute, kind) in self.fields.items():
+            lines.append(f"    v = obj.{name}")
+            lines.append('    if v is not None:')
+            lines.append(f"        item[{attribute!r}] = {kind.encode('v', ns)}")
+        lines.append('    return item')
+        exec('\n'.join(lines), ns)
+        return ns['encode']
+
+    def encode_value(self, name: str, value) -> dict:
+        """Encode a single field value, e.g. for an UpdateExpression"""
+        encoder = self._value_encoders.get(name)
+        if encoder is None:
+            ns = {}
+            _, kind = self.fields[name]
+            exec(f"def encode(v):\n    return {kind.encode('v', ns)}", ns)
+            encoder = self._value_encoders[name] = ns['encode']
+        return encoder(value)
+
+    def key(self, **values) -> dict:
+        """Build a Key argument from field values"""
+        return {self.attribute_names[name]: self.encode_value(name, value) for name, value in values.items()}
+
+    def projection(self, *names) -> dict:
+        """ProjectionExpression and ExpressionAttributeNames reading only the given fields"""
+        attribute_names = {f'#p{i}': self.attribute_names[name] for i, name in enumerate(names)}
+        return {
+            'ProjectionExpression': ', '.join(attribute_names),
+            'ExpressionAttributeNames': attribute_names
+        }
+
+_codecs = {}
+
+def codec_for(model: type) -> ItemCodec:
+    """Return the (cached) generated codec for a model class"""
+    codec = _codecs.get(model)
+    if codec is None:
+        codec = _codecs[model] = ItemCodec(model)
+    return codec
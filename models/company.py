@@ -0,0 +1,53 @@
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import List, Optional
+from models.codec import attr, codec_for, STRING, INT, DECIMAL, ListOf, MapOf
+
+@dataclass(slots=True)
+class Discount:
+    limit: Decimal = attr(kind=DECIMAL, default=Decimal('100'))
+    multiplier: Decimal = attr(kind=DECIMAL, default=Decimal('0.3'))
+
+@dataclass(slots=True)
+class Company:
+    email: str = attr(default='')
+    name: Optional[str] = attr()
+    subscription_status: Optional[str] = attr()
+    phone: Optional[str] = attr()
+    website: Optional[str] = attr()
+    discount: Discount = attr(kind=MapOf(Discount), default_factory=Discount)
+    hashtags: List[str] = attr(kind=ListOf(STRING), default_factory=list)
+    post_media_key: Optional[str] = attr()   # None until recorded, '' once deleted
+    post_media_type: Optional[str] = attr()
+    # Dashboard counters, kept current with ADD updates (see AWSService._add_company_stats)
+    stats_clients: int = attr(kind=INT, default=0)
+    stats_referrals: int = attr(kind=INT, default=0)
+    stats_submissions: int = attr(kind=INT, default=0)
+    stats_friends: int = attr(kind=INT, default=0)
+    stats_pending: int = attr(kind=INT, default=0)
+    stats_approved: int = attr(kind=INT, default=0)
+    stats_disapproved: int = attr(kind=INT, default=0)
+    stats_score_total: int = attr(kind=INT, default=0)
+    stats_scored: int = attr(kind=INT, default=0)
+
+    @classmethod
+    def from_dynamo_item(cls, item):
+        """Create a Company instance from DynamoDB item"""
+        return codec_for(cls).decode(item)
+
+    def to_dynamo_item(self):
+        """Convert Company instance to DynamoDB item format"""
+        return codec_for(Company).encode(self)
+
+    def stats_summary(self):
+        """Dashboard summary as returned by the API"""
+        return {
+            'clients': self.stats_clients,
+            'total_referrals': self.stats_referrals,
+            'submissions': self.stats_submissions,
+            'friends': self.stats_friends,
+            'pending': self.stats_pending,
+            'approved': self.stats_approved,
+            'disapproved': self.stats_disapproved,
+            'average_score': round(self.stats_score_total / self.stats_scored, 2) if self.stats_scored else 0
+        }
@@ -0,0 +1,50 @@
+from dataclasses import dataclass
+from typing import Optional
+from models.codec import attr, codec_for, BOOL, INT
+
+# Reason recorded on the approval row when a form is submitted
+PENDING_REASON = "Not approved by the company yet."
+
+@dataclass(slots=True)
+class FormApproval:
+    form_id: str = attr(default='')  # useremail#form{number}
+    user_email: Optional[str] = attr()  # UserFormIndex key, never ''
+    form_number: Optional[int] = attr(kind=INT)
+    is_approved: bool = attr(kind=BOOL, default=False)
+    updated_at: str = attr(default='')
+    reason: Optional[str] = attr()
+    # PendingApprovalIndex keys, only present while the form awaits review
+    pending_company: Optional[str] = attr()
+    submitted_at: Optional[str] = attr()
+
+    @classmethod
+    def from_dynamo_item(cls, item):
+        """Create a FormApproval instance from DynamoDB item"""
+        return codec_for(cls).decode(item)
+
+    def to_dynamo_item(self):
+        """Convert FormApproval instance to DynamoDB item format"""
+        return codec_for(FormApproval).encode(self)
+
+    @staticmethod
+    def parse_form_id(form_id: str):
+        """Split a legacy form_id into (user_email, form_number)"""
+        user_email, _, number = form_id.rpartition('#form')
+        return user_email, int(number)
+
+    @property
+    def state(self) -> str:
+        """'approved', 'pending' or 'disapproved'"""
+        if self.is_approved:
+            return 'approved'
+        return 'pending' if self.reason == PENDING_REASON else 'disapproved'
+
+    def to_status(self):
+        """Status dict as returned by the API"""
+        result = {
+            'is_approved': self.is_approved,
+            'updated_at': self.updated_at
+        }
+        if self.reason is not None:
+            result['reason'] = self.reason
+        return result
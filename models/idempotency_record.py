@@ -0,0 +1,23 @@
+from dataclasses import dataclass
+from typing import Optional
+from models.codec import attr, codec_for, INT, BINARY
+
+@dataclass(slots=True)
+class IdempotencyRecord:
+    """The outcome of a request made with an Idempotency-Key"""
+    id: str = attr(default='')  # user#METHOD path#key
+    fingerprint: str = attr(default='')  # sha256 of the request body
+    status: str = attr(default='in_progress')  # 'in_progress' or 'completed'
+    status_code: Optional[int] = attr(kind=INT)
+    body: Optional[bytes] = attr(kind=BINARY)
+    content_type: Optional[str] = attr()
+    expires_at: int = attr(kind=INT, default=0)  # epoch seconds, the table's TTL attribute
+
+    @classmethod
+    def from_dynamo_item(cls, item):
+        """Create an IdempotencyRecord instance from DynamoDB item"""
+        return codec_for(cls).decode(item)
+
+    def to_dynamo_item(self):
+        """Convert IdempotencyRecord instance to DynamoDB item format"""
+        return codec_for(IdempotencyRecord).encode(self)
@@ -0,0 +1,22 @@
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+from models.codec import attr, codec_for, INT, ISO_DATETIME
+
+@dataclass(slots=True)
+class MediaHash:
+    """Where a user's upload with a given content hash is already stored"""
+    user_email: str = attr(default='')
+    sha256: str = attr(default='')
+    key: str = attr(default='')  # S3 key of the first copy
+    size: int = attr(kind=INT, default=0)
+    created_at: Optional[datetime] = attr(kind=ISO_DATETIME)
+
+    @classmethod
+    def from_dynamo_item(cls, item):
+        """Create a MediaHash instance from DynamoDB item"""
+        return codec_for(cls).decode(item)
+
+    def to_dynamo_item(self):
+        """Convert MediaHash instance to DynamoDB item format"""
+        return codec_for(MediaHash).encode(self)
@@ -0,0 +1,25 @@
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+from models.codec import attr, codec_for, INT, ISO_DATETIME
+
+@dataclass(slots=True)
+class MigrationRecord:
+    """Progress of one schema migration, kept in the migrations table"""
+    id: str = attr(default='')
+    status: str = attr(default='running')  # 'running' or 'applied'
+    segments: int = attr(kind=INT, default=1)
+    checkpoints: str = attr(default='{}')  # JSON: segment -> LastEvaluatedKey, null once finished
+    scanned: int = attr(kind=INT, default=0)
+    changed: int = attr(kind=INT, default=0)
+    started_at: Optional[datetime] = attr(kind=ISO_DATETIME)
+    applied_at: Optional[datetime] = attr(kind=ISO_DATETIME)
+
+    @classmethod
+    def from_dynamo_item(cls, item):
+        """Create a MigrationRecord instance from DynamoDB item"""
+        return codec_for(cls).decode(item)
+
+    def to_dynamo_item(self):
+        """Convert MigrationRecord instance to DynamoDB item format"""
+        return codec_for(MigrationRecord).encode(self)
@@ -1,33 +1,32 @@
 from dataclasses import dataclass
-from typing import List
 from datetime import datetime
+from typing import Optional
+from models.codec import attr, codec_for, EPOCH_DATETIME
 
-@dataclass
+@dataclass(slots=True)
 class ReferralLink:
-    step_name: str  # reviews, social media, content, tagging
-    platform: str   # social media name
-    link: str       # actual URL
-    created_at: datetime
+    id: str = attr(default='')         # company_name#step_name#platform
+    step_name: str = attr(default='')  # reviews, social media, content, tagging
+    platform: str = attr(default='')   # social media name
+    link: str = attr(default='')       # actual URL
+    created_at: Optional[datetime] = attr(kind=EPOCH_DATETIME)
 
     @classmethod
-    def from_dynamo_item(cls, item):
-        """Create a ReferralLink instance from DynamoDB item"""
-        if not item:
-            return None
-            
+    def create(cls, company_name: str, step_name: str, platform: str, link: str):
+        """Create a new link keyed by company, step and platform"""
         return cls(
-            step_name=item['step_name']['S'],
-            platform=item['platform']['S'],
-            link=item['link']['S'],
-            created_at=datetime.fromtimestamp(int(item['created_at']['N']))
+            id=f"{company_name}#{step_name}#{platform}",
+            step_name=step_name,
+            platform=platform,
+            link=link,
+            created_at=datetime.now()
         )
 
+    @classmethod
+    def from_dynamo_item(cls, item):
+        """Create a ReferralLink instance from DynamoDB item"""
+        return codec_for(cls).decode(item)
+
     def to_dynamo_item(self):
         """Convert ReferralLink instance to DynamoDB item format"""
-        return {
-            'id': {'S': f"{self.step_name}#{self.platform}"},  # Composite key
-            'step_name': {'S': self.step_name},
-            'platform': {'S': self.platform},
-            'link': {'S': self.link},
-            'created_at': {'N': str(int(self.created_at.timestamp()))}
-        }
+        return codec_for(ReferralLink).encode(self)
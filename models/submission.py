@@ -0,0 +1,24 @@
+from dataclasses import dataclass
+from datetime import datetime
+from typing import List, Optional
+from models.codec import attr, codec_for, INT, ISO_DATETIME, ListOf, MapOf
+from models.user import Friend
+
+@dataclass(slots=True)
+class Submission:
+    """One referral form submission, stored under the user's partition"""
+    user_email: str = attr(default='')
+    submission_number: int = attr(kind=INT, default=0)
+    friends: List[Friend] = attr(kind=ListOf(MapOf(Friend)), default_factory=list)
+    score: Optional[int] = attr(kind=INT)
+    submitted_at: Optional[datetime] = attr(kind=ISO_DATETIME)
+    scored_at: Optional[datetime] = attr(kind=ISO_DATETIME)
+
+    @classmethod
+    def from_dynamo_item(cls, item):
+        """Create a Submission instance from DynamoDB item"""
+        return codec_for(cls).decode(item)
+
+    def to_dynamo_item(self):
+        """Convert Submission instance to DynamoDB item format"""
+        return codec_for(Submission).encode(self)
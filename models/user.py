@@ -1,70 +1,46 @@
 from dataclasses import dataclass
-from typing import List
 from datetime import datetime
+from typing import List, Optional
+from models.codec import attr, codec_for, INT, BOOL, ISO_DATETIME, ListOf, MapOf
 
-@dataclass
+@dataclass(slots=True)
 class Friend:
-    name: str
-    email: str
-    phone: str
+    name: str = attr(default='')
+    email: str = attr(default='')
+    phone: str = attr('phone_number', default='')
 
-@dataclass
+    @classmethod
+    def from_dict(cls, data: dict):
+        """Create a Friend from a submitted form entry"""
+        return cls(
+            name=data.get('name', ''),
+            email=data.get('email', ''),
+            phone=data.get('phone', '')
+        )
+
+    def to_dict(self):
+        return {'name': self.name, 'email': self.email, 'phone': self.phone}
+
+@dataclass(slots=True)
 class User:
-    email: str
-    password_hash: str
-    total_referrals: int
-    friends: List[List[Friend]]  # 2D list of Friend objects
-    referrals_score: List[int]
-    created_at: datetime
+    email: str = attr(default='')
+    password_hash: str = attr('password', default='')
+    name: str = attr(default='')
+    company_name: str = attr(default='')
+    company_email: str = attr(default='')
+    created_at: Optional[datetime] = attr(kind=ISO_DATETIME)
+    terms_accepted: bool = attr(kind=BOOL, default=False)
+    total_referrals: int = attr(kind=INT, default=0)
+    # Legacy per-submission lists, now stored in the submissions table
+    # (see migrations/split_referrals.py); only read for users not yet migrated
+    referrals_score: Optional[List[int]] = attr(kind=ListOf(INT))
+    friends: Optional[List[List[Friend]]] = attr(kind=ListOf(ListOf(MapOf(Friend))))  # one group per submission
 
     @classmethod
     def from_dynamo_item(cls, item):
         """Create a User instance from DynamoDB item"""
-        if not item:
-            return None
-
-        return cls(
-            email=item['email']['S'],
-            password_hash=item['password']['S'],
-            created_at=datetime.fromtimestamp(int(item['created_at']['N'])),
-            total_referrals=int(item['total_referrals']['N']),
-            referrals_score=[int(x) for x in item['referrals_score']['L']],
-            friends=[
-                [
-                    Friend(
-                        name=friend['M']['name']['S'],
-                        email=friend['M']['email']['S'],
-                        phone=friend['M']['phone_number']['S']
-                    )
-                    for friend in friend_group['L']
-                ]
-                for friend_group in item['friends']['L']
-            ]
-        )
+        return codec_for(cls).decode(item)
 
     def to_dynamo_item(self):
         """Convert User instance to DynamoDB item format"""
-        return {
-            'email': {'S': self.email},
-            'password': {'S': self.password_hash},
-            'created_at': {'N': str(int(self.created_at.timestamp()))},
-            'total_referrals': {'N': str(self.total_referrals)},
-            'referrals_score': {'L': [{'N': str(score)} for score in self.referrals_score]},
-            'friends': {
-                'L': [
-                    {
-                        'L': [
-                            {
-                                'M': {
-                                    'name': {'S': friend.name},
-                                    'email': {'S': friend.email},
-                                    'phone_number': {'S': friend.phone}
-                                }
-                            }
-                            for friend in friend_group
-                        ]
-                    }
-                    for friend_group in self.friends
-                ]
-            }
-        }
+        return codec_for(User).encode(self)
@@ -0,0 +1,25 @@
+import sys
+from dotenv import load_dotenv
+from services.aws_service import AWSService
+from services.capacity import background
+
+@background
+def recompute_company_stats(company_emails=None):
+    """Rebuild the dashboard counters of the given companies (all by default)
+    from their clients, repairing any drift in the incremental updates."""
+    # Load environment variables from .env file
+    load_dotenv()
+
+    aws_service = AWSService()
+    company_emails = company_emails or aws_service.get_all_companies_emails()
+    for company_email in company_emails:
+        if company_email == 'default':
+            continue
+        summary = aws_service.recompute_company_stats(company_email)
+        if summary is None:
+            print(f"Failed to recompute stats for {company_email}")
+        else:
+            print(f"Recomputed stats for {company_email}: {summary}")
+
+if __name__ == "__main__":
+    recompute_company_stats(sys.argv[1:])
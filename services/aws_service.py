@@ -1,12 +1,41 @@
 import boto3
+from botocore.config import Config
+import hashlib
 import os
+import time
 from datetime import datetime
+from decimal import Decimal
 import random
 from werkzeug.utils import secure_filename
 from werkzeug.security import generate_password_hash
+from utils.media_tokens import generate_media_token, verify_media_token
+from utils.cursors import encode_cursor, decode_cursor
+from models.codec import codec_for
+from models.user import User, Friend
+from models.company import Company, Discount
+from models.referral_link import ReferralLink
+from models.form_approval import FormApproval, PENDING_REASON
+from models.submission import Submission
+from models.idempotency_record import IdempotencyRecord
+from models.media_hash import MediaHash
+from services import request_loader
+from utils.metrics import metrics
+from utils.uploads import uploaded_type, uploaded_digest
+from services.task_queue import task_queue
+from services.scanner import scan_items
+from services.capacity import CapacityLimiter, background
+from services.thumbnails import ThumbnailGenerator, thumbnail_key, THUMBNAIL_PREFIX
 
 class AWSService:
-    def __init__(self):
+    PENDING_REASON = PENDING_REASON
+    # BatchWriteItem accepts at most 25 requests per call
+    BATCH_WRITE_LIMIT = 25
+    COMPANY_STATS_FIELDS = (
+        'stats_clients', 'stats_referrals', 'stats_submissions', 'stats_friends', 'stats_pending',
+        'stats_approved', 'stats_disapproved', 'stats_score_total', 'stats_scored'
+    )
+
+    def __init__(self, media_token_secret: str = None):
         # Update variable names to match .env file
         self.aws_access_key_id = os.environ.get('AWS_ACCESS_KEY_ID')
         self.aws_secret_access_key = os.environ.get('AWS_SECRET_ACCESS_KEY')
@@ -26,15 +55,59 @@ class AWSService:
             'dynamodb',
             region_name='us-west-1',
             aws_access_key_id=self.aws_access_key_id,
-            aws_secret_access_key=self.aws_secret_access_key
+            aws_secret_access_key=self.aws_secret_access_key,
+            # Throttled calls are retried with backoff instead of surfacing as errors
+            config=Config(retries={
+                'mode': 'adaptive',
+                'max_attempts': int(os.environ.get('DYNAMODB_MAX_ATTEMPTS', '8'))
+            })
         )
+        # Pace calls to each table's provisioned capacity, interactive work first
+        self.capacity_limiter = CapacityLimiter(
+            background_share=float(os.environ.get('DYNAMODB_BACKGROUND_SHARE', '0.5')),
+            max_wait=float(os.environ.get('DYNAMODB_MAX_WAIT', '5'))
+        )
+        self.capacity_limiter.install(self.dynamodb)
         
         self.bucket_name = 'smartreferralhub-bucket'
         self.users_table = 'smart-referral-users'
+        self.users_company_index = 'CompanyEmailIndex'
         self.links_table = 'smart-referral-links'
         self.companies_table = 'smart-referral-companies'
         self.signup_tokens_table = 'smart-referral-signup-tokens'
         self.form_approvals_table = 'smart-referral-form-approvals'
+        self.form_approvals_user_index = 'UserFormIndex'
+        self.form_approvals_pending_index = 'PendingApprovalIndex'
+        self.submissions_table = 'smart-referral-submissions'
+        self.idempotency_table = 'smart-referral-idempotency'
+        self.media_hashes_table = 'smart-referral-media-hashes'
+        self.cache_versions_table = 'smart-referral-cache-versions'
+
+        # Item codecs for each table
+        self.user_codec = codec_for(User)
+        self.company_codec = codec_for(Company)
+        self.link_codec = codec_for(ReferralLink)
+        self.approval_codec = codec_for(FormApproval)
+        self.submission_codec = codec_for(Submission)
+        self.idempotency_codec = codec_for(IdempotencyRecord)
+        self.media_hash_codec = codec_for(MediaHash)
+
+        # Secret used to sign media download tokens
+        self.media_token_secret = media_token_secret or os.environ.get('MEDIA_TOKEN_SECRET')
+        if not self.media_token_secret:
+            raise ValueError("MEDIA_TOKEN_SECRET not found in environment variables")
+        self.media_token_ttl = int(os.environ.get('MEDIA_TOKEN_TTL', '3600'))
+
+        # Side effects handlers don't wait for, run by the task queue workers
+        task_queue.register('purge_prefix', background(self.purge_prefix))
+        task_queue.register('form_approval', background(self._form_approval_task))
+        task_queue.register('init_links', background(self.init_links))
+
+        # Downscaled previews of uploaded media, written in the background
+        self.thumbnails = ThumbnailGenerator(
+            self.s3_client, self.bucket_name,
+            max_size=int(os.environ.get('THUMBNAIL_MAX_SIZE', '480'))
+        )
 
         # Create tables if they don't exist
         self._create_users_table_if_not_exists()
@@ -42,6 +115,10 @@ class AWSService:
         self._create_companies_table_if_not_exists()
         # self._create_signup_tokens_table_if_not_exists()
         self._create_form_approvals_table_if_not_exists()
+        self._create_submissions_table_if_not_exists()
+        self._create_idempotency_table_if_not_exists()
+        self._create_media_hashes_table_if_not_exists()
+        self._create_cache_versions_table_if_not_exists()
 
     def _create_users_table_if_not_exists(self):
         """Create the users table if it doesn't exist"""
@@ -56,7 +133,23 @@ class AWSService:
                 ],
                 AttributeDefinitions=[
                     {'AttributeName': 'email', 'AttributeType': 'S'},
-                    {'AttributeName': 'name', 'AttributeType': 'S'}
+                    {'AttributeName': 'company_email', 'AttributeType': 'S'}
+                ],
+                GlobalSecondaryIndexes=[
+                    {
+                        # A company's clients, see migrate.py for existing tables
+                        'IndexName': 'CompanyEmailIndex',
+                        'KeySchema': [
+                            {'AttributeName': 'company_email', 'KeyType': 'HASH'}
+                        ],
+                        'Projection': {
+                            'ProjectionType': 'ALL'
+                        },
+                        'ProvisionedThroughput': {
+                            'ReadCapacityUnits': 5,
+                            'WriteCapacityUnits': 5
+                        }
+                    }
                 ],
                 ProvisionedThroughput={
                     'ReadCapacityUnits': 5,
@@ -136,18 +229,7 @@ class AWSService:
             # Add default settings for new companies
             self.dynamodb.put_item(
                 TableName=self.companies_table,
-                Item={
-                    'email': {'S': 'default'},
-                    'discount': {
-                        'M': {
-                            'limit': {'N': '100'},
-                            'multiplier': {'N': '0.3'}
-                        }
-                    },
-                    'hashtags': {
-                        'L': []
-                    }
-                }
+                Item=self.company_codec.encode(Company(email='default'))
             )
 
     def _create_form_approvals_table_if_not_exists(self):
@@ -162,7 +244,37 @@ class AWSService:
                     {'AttributeName': 'form_id', 'KeyType': 'HASH'}  # form_id will be in format "useremail#form{number}"
                 ],
                 AttributeDefinitions=[
-                    {'AttributeName': 'form_id', 'AttributeType': 'S'}
+                    {'AttributeName': 'form_id', 'AttributeType': 'S'},
+                    {'AttributeName': 'user_email', 'AttributeType': 'S'},
+                    {'AttributeName': 'form_number', 'AttributeType': 'N'},
+                    {'AttributeName': 'pending_company', 'AttributeType': 'S'},
+                    {'AttributeName': 'submitted_at', 'AttributeType': 'S'}
+                ],
+                GlobalSecondaryIndexes=[
+                    {
+                        # A user's approvals in form order, see migrate.py for existing tables
+                        'IndexName': 'UserFormIndex',
+                        'KeySchema': [
+                            {'AttributeName': 'user_email', 'KeyType': 'HASH'},
+                            {'AttributeName': 'form_number', 'KeyType': 'RANGE'}
+                        ],
+                        'Projection': {
+                            'ProjectionType': 'ALL'
+                        }
+                    },
+                    {
+                        # Sparse: only forms awaiting review carry pending_company,
+                        # see migrate.py for existing tables
+                        'IndexName': 'PendingApprovalIndex',
+                        'KeySchema': [
+                            {'AttributeName': 'pending_company', 'KeyType': 'HASH'},
+                            {'AttributeName': 'submitted_at', 'KeyType': 'RANGE'}
+                        ],
+                        'Projection': {
+                            'ProjectionType': 'INCLUDE',
+                            'NonKeyAttributes': ['user_email', 'form_number']
+                        }
+                    }
                 ],
                 BillingMode='PAY_PER_REQUEST'
             )
@@ -170,6 +282,136 @@ class AWSService:
             waiter = self.dynamodb.get_waiter('table_exists')
             waiter.wait(TableName=self.form_approvals_table)
 
+    def _create_submissions_table_if_not_exists(self):
+        """Create the referral submissions table if it doesn't exist"""
+        try:
+            self.dynamodb.describe_table(TableName=self.submissions_table)
+        except self.dynamodb.exceptions.ResourceNotFoundException:
+            print(f"Creating submissions table: {self.submissions_table}")
+            self.dynamodb.create_table(
+                TableName=self.submissions_table,
+                KeySchema=[
+                    {'AttributeName': 'user_email', 'KeyType': 'HASH'},
+                    {'AttributeName': 'submission_number', 'KeyType': 'RANGE'}
+                ],
+                AttributeDefinitions=[
+                    {'AttributeName': 'user_email', 'AttributeType': 'S'},
+                    {'AttributeName': 'submission_number', 'AttributeType': 'N'}
+                ],
+                BillingMode='PAY_PER_REQUEST'
+            )
+            # Wait for the table to be created
+            waiter = self.dynamodb.get_waiter('table_exists')
+            waiter.wait(TableName=self.submissions_table)
+
+    def _create_idempotency_table_if_not_exists(self):
+        """Create the idempotency keys table if it doesn't exist"""
+        try:
+            self.dynamodb.describe_table(TableName=self.idempotency_table)
+        except self.dynamodb.exceptions.ResourceNotFoundException:
+            print(f"Creating idempotency table: {self.idempotency_table}")
+            self.dynamodb.create_table(
+                TableName=self.idempotency_table,
+                KeySchema=[
+                    {'AttributeName': 'id', 'KeyType': 'HASH'}
+                ],
+                AttributeDefinitions=[
+                    {'AttributeName': 'id', 'AttributeType': 'S'}
+                ],
+                BillingMode='PAY_PER_REQUEST'
+            )
+            # Wait for the table to be created
+            waiter = self.dynamodb.get_waiter('table_exists')
+            waiter.wait(TableName=self.idempotency_table)
+            # Expired records are deleted by DynamoDB at no cost
+            self.dynamodb.update_time_to_live(
+                TableName=self.idempotency_table,
+                TimeToLiveSpecification={'Enabled': True, 'AttributeName': 'expires_at'}
+            )
+
+    def _create_cache_versions_table_if_not_exists(self):
+        """Create the HTTP cache version counters table if it doesn't exist"""
+        try:
+            self.dynamodb.describe_table(TableName=self.cache_versions_table)
+        except self.dynamodb.exceptions.ResourceNotFoundException:
+            print(f"Creating cache versions table: {self.cache_versions_table}")
+            self.dynamodb.create_table(
+                TableName=self.cache_versions_table,
+                KeySchema=[
+                    {'AttributeName': 'resource', 'KeyType': 'HASH'}
+                ],
+                AttributeDefinitions=[
+                    {'AttributeName': 'resource', 'AttributeType': 'S'}
+                ],
+                BillingMode='PAY_PER_REQUEST'
+            )
+            # Wait for the table to be created
+            waiter = self.dynamodb.get_waiter('table_exists')
+            waiter.wait(TableName=self.cache_versions_table)
+
+    def _create_media_hashes_table_if_not_exists(self):
+        """Create the uploaded media content hash table if it doesn't exist"""
+        try:
+            self.dynamodb.describe_table(TableName=self.media_hashes_table)
+        except self.dynamodb.exceptions.ResourceNotFoundException:
+            print(f"Creating media hashes table: {self.media_hashes_table}")
+            self.dynamodb.create_table(
+                TableName=self.media_hashes_table,
+                KeySchema=[
+                    {'AttributeName': 'user_email', 'KeyType': 'HASH'},
+                    {'AttributeName': 'sha256', 'KeyType': 'RANGE'}
+                ],
+                AttributeDefinitions=[
+                    {'AttributeName': 'user_email', 'AttributeType': 'S'},
+                    {'AttributeName': 'sha256', 'AttributeType': 'S'}
+                ],
+                BillingMode='PAY_PER_REQUEST'
+            )
+            # Wait for the table to be created
+            waiter = self.dynamodb.get_waiter('table_exists')
+            waiter.wait(TableName=self.media_hashes_table)
+
+    def _read_item(self, table: str, codec, fields: tuple, consistent: bool, **key):
+        """Point read of the given model fields, decoded with codec
+
+        Goes through the request's loader when one is active, so repeated reads
+        of the same item within a request hit DynamoDB once.
+        """
+        key = codec.key(**key)
+        loader = request_loader.current()
+        if loader is not None:
+            attributes = [codec.attribute_names[field] for field in fields]
+            return codec.decode(loader.get_item(table, key, attributes, consistent))
+
+        response = self.dynamodb.get_item(
+            TableName=table,
+            Key=key,
+            ConsistentRead=consistent,
+            **codec.projection(*fields)
+        )
+        return codec.decode(response.get('Item'))
+
+    def _invalidate_item(self, table: str, codec, **key):
+        """Forget a cached read after writing the item"""
+        loader = request_loader.current()
+        if loader is not None:
+            loader.invalidate(table, codec.key(**key))
+
+    def prefetch_user_and_company(self, email: str):
+        """Fetch the user's referral counter and the company check used by uploads in one BatchGetItem"""
+        loader = request_loader.current()
+        if loader is None:
+            return
+        try:
+            loader.prefetch([
+                (self.users_table, self.user_codec.key(email=email),
+                 [self.user_codec.attribute_names['total_referrals']], True),
+                (self.companies_table, self.company_codec.key(email=email),
+                 [self.company_codec.attribute_names['email']], False)
+            ])
+        except Exception as e:
+            print(f"Error prefetching user and company: {str(e)}")
+
     def generate_file_name(self, file_type: str) -> str:
         """Generate a unique file name with timestamp and random number"""
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
@@ -183,40 +425,35 @@ class AWSService:
             unique_filename = self.generate_file_name(file_type)
             # add file extension
             unique_filename += os.path.splitext(original_filename)[1]
-            content_type = file.content_type
+            content_type = uploaded_type(file)
             
             # check user_email is company_email            
-            if(self.get_company_by_email(user_email)):
-                file_type = "post"
-                unique_filename = f"post{os.path.splitext(original_filename)[1]}"
-                
-                # before putting remove all objects in the directory
-                response = self.s3_client.list_objects_v2(Bucket=self.bucket_name, Prefix=f"{user_email}/{file_type}/")
-                if 'Contents' in response and len(response['Contents']) > 0:
-                    # print all contents 
-                    for obj in response['Contents']:
-                        self.s3_client.delete_object(Bucket=self.bucket_name, Key=obj['Key'])
-                
-                self.s3_client.put_object(
-                    Bucket=self.bucket_name,
-                    Key=f"{user_email}/{file_type}/{unique_filename}",
-                    Body=file.read(),
-                    ContentType=content_type
-                )
-                
-                # Generate URL
-                url = f"https://{self.bucket_name}.s3.amazonaws.com//{user_email}/{file_type}/{unique_filename}"
+            if(self.get_company_by_email(user_email, attributes=('email',))):
+                url, original_filename, _, _ = self.upload_post_media(file, user_email)
                 return url, original_filename
             
             current_referral_number = self.get_total_referrals(user_email)
             
-            # Upload to S3
-            self.s3_client.put_object(
-                Bucket=self.bucket_name,
-                Key=f"{user_email}/{current_referral_number}/{file_type}/{unique_filename}",
-                Body=file.read(),
-                ContentType=content_type
-            )
+            # Upload to S3, or copy server-side if the user already uploaded the same bytes
+            key = f"{user_email}/{current_referral_number}/{file_type}/{unique_filename}"
+            # Hashed while the upload streamed in; re-read only for files
+            # parsed without an upload policy
+            digest, size = uploaded_digest(file) or self._hash_stream(file.stream)
+            file.stream.seek(0)
+            source_key = self._copy_duplicate_media(user_email, digest, key, content_type)
+            if source_key:
+                self.thumbnails.submit(key, content_type, source_key=source_key)
+            else:
+                self.s3_client.put_object(
+                    Bucket=self.bucket_name,
+                    Key=key,
+                    Body=file.stream,
+                    ContentType=content_type
+                )
+                self._record_media_hash(MediaHash(
+                    user_email=user_email, sha256=digest, key=key, size=size, created_at=datetime.now()
+                ))
+                self.thumbnails.submit(key, content_type)
             
             # Generate URL
             url = f"https://{self.bucket_name}.s3.amazonaws.com/{user_email}/{file_type}/{unique_filename}"
@@ -226,6 +463,142 @@ class AWSService:
             print(f"Error uploading file to S3: {str(e)}")
             return None, None
     
+    @staticmethod
+    def _hash_stream(stream, chunk_size: int = 64 * 1024):
+        """sha256 hex digest and size of a seekable upload stream, rewound afterwards"""
+        digest = hashlib.sha256()
+        size = 0
+        stream.seek(0)
+        for chunk in iter(lambda: stream.read(chunk_size), b''):
+            digest.update(chunk)
+            size += len(chunk)
+        stream.seek(0)
+        return digest.hexdigest(), size
+
+    def _copy_duplicate_media(self, user_email: str, digest: str, key: str, content_type: str):
+        """Copy an identical earlier upload of the user's to key within S3
+
+        Returns:
+            str: The copied key, or None if there is no earlier copy to reuse
+        """
+        try:
+            existing = self._read_item(
+                self.media_hashes_table, self.media_hash_codec, ('key', 'size'),
+                consistent=False, user_email=user_email, sha256=digest
+            )
+            if not existing:
+                return None
+            self.s3_client.copy_object(
+                Bucket=self.bucket_name,
+                Key=key,
+                CopySource={'Bucket': self.bucket_name, 'Key': existing.key},
+                ContentType=content_type,
+                MetadataDirective='REPLACE'
+            )
+            metrics.increment('uploads.deduplicated')
+            metrics.increment('uploads.bytes_saved', existing.size)
+            return existing.key
+        except Exception as e:
+            # The earlier copy may have been deleted; upload normally
+            print(f"Error copying duplicate media: {str(e)}")
+            return None
+
+    def _record_media_hash(self, media_hash: MediaHash):
+        try:
+            self.dynamodb.put_item(
+                TableName=self.media_hashes_table,
+                Item=self.media_hash_codec.encode(media_hash)
+            )
+            # The duplicate check just cached this hash as missing
+            self._invalidate_item(
+                self.media_hashes_table, self.media_hash_codec,
+                user_email=media_hash.user_email, sha256=media_hash.sha256
+            )
+        except Exception as e:
+            print(f"Error recording media hash: {str(e)}")
+
+    def upload_post_media(self, file, company_email: str, hashtags: list = None):
+        """Replace the company's post media in S3 and record it on the company
+
+        Args:
+            file: Uploaded media file
+            company_email: Company's email
+            hashtags: Hashtags to save along with the media, if any
+
+        Returns:
+            tuple: (url, original filename, S3 key, content type), or Nones on failure
+        """
+        try:
+            original_filename = secure_filename(file.filename)
+            content_type = uploaded_type(file)
+            key = f"{company_email}/post/post{os.path.splitext(original_filename)[1]}"
+
+            self.s3_client.put_object(
+                Bucket=self.bucket_name,
+                Key=key,
+                Body=file.read(),
+                ContentType=content_type
+            )
+
+            settings = {'post_media_key': key, 'post_media_type': content_type}
+            if hashtags is not None:
+                settings['hashtags'] = hashtags
+            if not self.update_company_settings(company_email, settings):
+                return None, None, None, None
+            self.bump_cache_version(f"posttags#{company_email}")
+
+            # Remove the previous post media (other extensions) in the background
+            self.queue_purge_prefix(f"{company_email}/post/", keep_key=key)
+
+            # Generate URL
+            url = f"https://{self.bucket_name}.s3.amazonaws.com//{key}"
+            return url, original_filename, key, content_type
+
+        except Exception as e:
+            print(f"Error uploading post media to S3: {str(e)}")
+            return None, None, None, None
+
+    def queue_purge_prefix(self, prefix: str, keep_key: str = None):
+        """Queue deletion of everything under prefix that exists now, except keep_key"""
+        task_queue.enqueue('purge_prefix', prefix=prefix, keep_key=keep_key, before=time.time())
+
+    def purge_prefix(self, prefix: str, keep_key: str = None, before: float = None):
+        """Delete the objects under prefix, except keep_key and anything written after before
+
+        The cutoff keeps a queued purge from removing media uploaded after it
+        was queued.
+        """
+        paginator = self.s3_client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket_name, Prefix=prefix):
+            keys = [
+                {'Key': obj['Key']} for obj in page.get('Contents', [])
+                if obj['Key'] != keep_key and (before is None or obj['LastModified'].timestamp() < before)
+            ]
+            if keys:
+                response = self.s3_client.delete_objects(
+                    Bucket=self.bucket_name,
+                    Delete={'Objects': keys, 'Quiet': True}
+                )
+                if response.get('Errors'):
+                    raise RuntimeError(f"Failed to delete {len(response['Errors'])} objects under {prefix}")
+
+    def queue_form_approval_status(self, user_email: str, form_number: int, is_approved: bool, reason: str = None):
+        """Write a form approval status from the task queue"""
+        task_queue.enqueue(
+            'form_approval', user_email=user_email, form_number=form_number,
+            is_approved=is_approved, reason=reason
+        )
+
+    def _form_approval_task(self, user_email: str, form_number: int, is_approved: bool, reason: str = None):
+        # The task may run late (retries, expired leases, restarts), so it
+        # must not undo a decision the company made in the meantime
+        if not self.update_form_approval_status(user_email, form_number, is_approved, reason, only_if_pending=True):
+            raise RuntimeError(f"Failed to update approval of {user_email} form {form_number}")
+
+    def queue_init_links(self, company_name: str, company_web: str):
+        """Create a new company's default links from the task queue"""
+        task_queue.enqueue('init_links', company_name=company_name, company_web=company_web)
+
     # get companies email
     def get_all_companies_emails(self):
         """Get all company emails from DynamoDB
@@ -234,63 +607,79 @@ class AWSService:
             list: List of company emails
         """
         try:
-            response = self.dynamodb.scan(TableName=self.companies_table)
-            emails = [item['email']['S'] for item in response['Items']]
-            return emails
+            return [
+                self.company_codec.decode(item).email
+                for item in scan_items(self.dynamodb, TableName=self.companies_table,
+                                       **self.company_codec.projection('email'))
+            ]
         except Exception as e:
             print(f"Error getting all companies emails: {str(e)}")
             return []
     
-    def get_company_by_name(self, company_name):
+    def get_company_by_name(self, company_name, attributes=('email', 'name')):
         """Get company details from DynamoDB by company name
         
         Args:
             company_name (str): Name of the company to fetch
+            attributes (tuple): Company fields to read
             
         Returns:
-            dict: Company details if found, None otherwise
+            Company: Company details if found, None otherwise
         """
         try:
-            # Query the companies table using the name
-            response = self.dynamodb.scan(
+            projection = self.company_codec.projection(*attributes)
+            # Scan the companies table for the name, page by page until the first match
+            items = scan_items(
+                self.dynamodb,
                 TableName=self.companies_table,
                 FilterExpression='contains(#name, :name)',
+                ProjectionExpression=projection['ProjectionExpression'],
                 ExpressionAttributeNames={
+                    **projection['ExpressionAttributeNames'],
                     '#name': 'name'
                 },
                 ExpressionAttributeValues={
                     ':name': {'S': company_name}
                 }
             )
-            
-            if 'Items' in response and len(response['Items']) > 0:
-                item = response['Items'][0]
-                return {
-                    'email': item.get('email', {}).get('S'),
-                    'name': item.get('name', {}).get('S'),
-                    'subscription_status': item.get('subscription_status', {}).get('S'),
-                    'phone': item.get('phone', {}).get('S'),
-                    'website': item.get('website', {}).get('S')
-                }
-            return None
+            try:
+                return self.company_codec.decode(next(items, None))
+            finally:
+                items.close()
             
         except Exception as e:
             print(f"Error getting company by name: {str(e)}")
             return None
     
-    def get_company_by_email(self, email):
+    def get_company_by_email(self, email, attributes=('email', 'name'), consistent: bool = False):
+        """Get company details by company email, None if it isn't a company
+
+        Args:
+            email (str): Company email
+            attributes (tuple): Company fields to read
+            consistent (bool): Use a strongly consistent read
+        """
         try:
-            response = self.dynamodb.get_item(
-                TableName=self.companies_table,
-                Key={'email': {'S': email}}
+            return self._read_item(
+                self.companies_table, self.company_codec, attributes,
+                consistent=consistent, email=email
             )
-            
-            if response:
-                return response['Item']
-            return None
         except Exception as e:
             print(f"Error getting company by email: {str(e)}")
             return None
+
+    def create_company(self, company: Company) -> bool:
+        """Create a new company with default discount settings"""
+        try:
+            self.dynamodb.put_item(
+                TableName=self.companies_table,
+                Item=self.company_codec.encode(company)
+            )
+            self._invalidate_item(self.companies_table, self.company_codec, email=company.email)
+            return True
+        except Exception as e:
+            print(f"Error creating company: {str(e)}")
+            return False
             
     def get_post_image(self):
         try:
@@ -307,19 +696,17 @@ class AWSService:
         
     def get_company_by_user_email(self, email):
         try:
-            response = self.dynamodb.get_item(
-                TableName=self.users_table,
-                Key={'email': {'S': email}}
+            user = self._read_item(
+                self.users_table, self.user_codec, ('company_name',),
+                consistent=False, email=email  # a user's company never changes
             )
-            
-            if 'Item' in response and 'company_name' in response['Item']:
-                company_name = response['Item']['company_name']['S']
-                return self.get_company_by_name(company_name)
+            if user and user.company_name:
+                return self.get_company_by_name(user.company_name)
             return None
         except Exception as e:
             print(f"Error getting company by email: {str(e)}")
             return None
-            
+
     def get_post_image(self):
         try:
             # Generate a clean download URL instead of direct S3 URL
@@ -337,61 +724,44 @@ class AWSService:
     def check_file_exists(self, key: str):
         """Check if a file exists in S3"""
         try:
-            print(f"Checking if file exists in S3: {key}")
             self.s3_client.head_object(Bucket=self.bucket_name, Key=key)
             return True
-        except Exception as e:
-            print(f"File does not exist in S3: {key}, Error: {str(e)}")
+        except Exception:
             return False
             
     def encode_key(self, key: str) -> str:
-        """Encode the S3 key to a URL-safe string"""
-        import base64
-        encoded = base64.urlsafe_b64encode(key.encode()).decode()
-        print(f"Encoded key: {key} -> {encoded}")
-        return encoded
+        """Encode the S3 key to a signed, expiring media token"""
+        return generate_media_token(key, self.media_token_secret, self.media_token_ttl)
         
     def decode_key(self, encoded_key: str) -> str:
-        """Decode the URL-safe string back to S3 key"""
-        import base64
-        try:
-            # Add padding if needed
-            padding = 4 - (len(encoded_key) % 4)
-            if padding != 4:
-                encoded_key += '=' * padding
-                
-            decoded = base64.urlsafe_b64decode(encoded_key.encode()).decode()
-            print(f"Decoded key: {encoded_key} -> {decoded}")
-            return decoded
-        except Exception as e:
-            print(f"Error decoding key: {encoded_key}, Error: {str(e)}")
-            return None
+        """Verify a media token and return the S3 key it grants access to"""
+        return verify_media_token(encoded_key, self.media_token_secret)
         
-    def get_download_url(self, encoded_key: str):
-        """Generate a pre-signed URL for downloading"""
+    def get_download_url(self, encoded_key: str, as_attachment: bool = True):
+        """Generate a pre-signed URL for downloading
+
+        The token signature proves the key was issued by this server, so no
+        HEAD request is made before presigning.
+        """
         try:
             key = self.decode_key(encoded_key)
             if not key:
-                print("Failed to decode key")
                 return None
-                
-            if not self.check_file_exists(key):
-                print("File does not exist in S3")
-                return None
-                
-            url = self.s3_client.generate_presigned_url(
+
+            params = {
+                'Bucket': self.bucket_name,
+                'Key': key,
+                # Add ResponseContentType for proper content type handling
+                'ResponseContentType': self._get_content_type(key)
+            }
+            if as_attachment:
+                params['ResponseContentDisposition'] = 'attachment'
+
+            return self.s3_client.generate_presigned_url(
                 'get_object',
-                Params={
-                    'Bucket': self.bucket_name,
-                    'Key': key,
-                    'ResponseContentDisposition': 'attachment',
-                    # Add ResponseContentType for proper content type handling
-                    'ResponseContentType': self._get_content_type(key)
-                },
+                Params=params,
                 ExpiresIn=300  # URL expires in 5 minutes
             )
-            print(f"Generated presigned URL for key: {key}")
-            return url
         except Exception as e:
             print(f"Error generating download URL: {str(e)}")
             return None
@@ -410,14 +780,19 @@ class AWSService:
         }
         return content_types.get(ext, 'application/octet-stream')
 
-    def get_user(self, email: str):
-        """Get user from DynamoDB"""
+    def get_user(self, email: str, attributes=('email',), consistent: bool = False):
+        """Get user from DynamoDB
+
+        Args:
+            email (str): User email
+            attributes (tuple): User fields to read, the whole item is never needed
+            consistent (bool): Use a strongly consistent read
+        """
         try:
-            response = self.dynamodb.get_item(
-                TableName=self.users_table,
-                Key={'email': {'S': email}}
+            return self._read_item(
+                self.users_table, self.user_codec, attributes,
+                consistent=consistent, email=email
             )
-            return response.get('Item')
         except Exception as e:
             print(f"Error getting user: {str(e)}")
             return None
@@ -444,27 +819,25 @@ class AWSService:
                 print(f"Missing required fields. Required: {required_fields}, Got: {list(user_data.keys())}")
                 return False
 
-            # Create DynamoDB item
-            item = {
-                'email': {'S': user_data['email']},
-                'password': {'S': user_data['password']},
-                'name': {'S': user_data['name']},
-                'company_name': {'S': user_data['company_name']},
-                'company_email': {'S': user_data['company_email']},
-                'created_at': {'S': user_data['created_at']},
-                'terms_accepted': {'BOOL': user_data.get('terms_accepted', False)},
-                'friends': {'L': []},
-                'referrals_score': {'L': []},
-                'total_referrals': {'N': '0'}
-            }
+            user = User(
+                email=user_data['email'],
+                password_hash=user_data['password'],
+                name=user_data['name'],
+                company_name=user_data['company_name'],
+                company_email=user_data['company_email'],
+                created_at=datetime.fromisoformat(user_data['created_at']),
+                terms_accepted=user_data.get('terms_accepted', False)
+            )
            
             # Try to create the user
             print(f"Creating user in DynamoDB: {user_data['email']}")
             self.dynamodb.put_item(
                 TableName=self.users_table,
-                Item=item,
+                Item=self.user_codec.encode(user),
                 ConditionExpression='attribute_not_exists(email)'
             )
+            self._invalidate_item(self.users_table, self.user_codec, email=user.email)
+            self._add_company_stats(user.company_email, stats_clients=1)
             print(f"Successfully created user: {user_data['email']}")
             return True
         except self.dynamodb.exceptions.ConditionalCheckFailedException:
@@ -476,83 +849,95 @@ class AWSService:
 
     def update_user_friends(self, email: str, friends: list):
         """
-        Update user's friends list in DynamoDB by adding a new group of friends
-        Each group represents friends from one form submission
+        Add friends to the user's current form submission
+        Each submission is its own item in the submissions table
         """
         try:
-            # First get the current friends list to check if it exists
-            response = self.dynamodb.get_item(
-                TableName=self.users_table,
-                Key={'email': {'S': email}}
+            submission_number = self.get_total_referrals(email, consistent=True)
+            friends = [Friend.from_dict(friend) for friend in friends]
+            response = self.dynamodb.update_item(
+                TableName=self.submissions_table,
+                Key=self.submission_codec.key(user_email=email, submission_number=submission_number),
+                UpdateExpression='SET friends = list_append(if_not_exists(friends, :empty_list), :friends), '
+                                 'submitted_at = :submitted_at',
+                ExpressionAttributeValues={
+                    ':empty_list': {'L': []},
+                    ':friends': self.submission_codec.encode_value('friends', friends),
+                    ':submitted_at': self.submission_codec.encode_value('submitted_at', datetime.now())
+                },
+                ReturnValues='UPDATED_OLD'
+            )
+            # A resubmission before the score is recorded adds to the same submission
+            old = self.submission_codec.decode(response.get('Attributes'))
+            self._add_company_stats(
+                self._get_company_email_of(email),
+                stats_submissions=0 if old else 1,
+                stats_friends=len(friends)
             )
-            
-            # Create friends group in DynamoDB format
-            friends_group = {
-                'L': [
-                    {
-                        'M': {
-                            'name': {'S': friend.get('name', '')},
-                            'email': {'S': friend.get('email', '')},
-                            'phone_number': {'S': friend.get('phone', '')}
-                        }
-                    }
-                    for friend in friends
-                ]
-            }
-
-            if 'Item' not in response or 'friends' not in response['Item']:
-                # If no friends list exists, create a new one with this group
-                self.dynamodb.update_item(
-                    TableName=self.users_table,
-                    Key={'email': {'S': email}},
-                    UpdateExpression='SET friends = :friends',
-                    ExpressionAttributeValues={
-                        ':friends': {'L': [friends_group]}
-                    }
-                )
-            else:
-                # If friends list exists, append new group
-                self.dynamodb.update_item(
-                    TableName=self.users_table,
-                    Key={'email': {'S': email}},
-                    UpdateExpression='SET friends = list_append(if_not_exists(friends, :empty_list), :new_group)',
-                    ExpressionAttributeValues={
-                        ':empty_list': {'L': []},
-                        ':new_group': {'L': [friends_group]}
-                    }
-                )
             return True
         except Exception as e:
             print(f"Error updating friends: {str(e)}")
             return False
 
+    def get_submissions(self, email: str, consistent: bool = False) -> list:
+        """Get all of a user's referral submissions in submission order"""
+        params = {
+            'TableName': self.submissions_table,
+            'KeyConditionExpression': 'user_email = :email',
+            'ExpressionAttributeValues': {':email': self.submission_codec.encode_value('user_email', email)},
+            'ConsistentRead': consistent,
+            **self.submission_codec.projection('submission_number', 'friends', 'score', 'submitted_at')
+        }
+        submissions = []
+        while True:
+            response = self.dynamodb.query(**params)
+            submissions.extend(self.submission_codec.decode(item) for item in response.get('Items', []))
+            if 'LastEvaluatedKey' not in response:
+                return submissions
+            params['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    def _merge_legacy_submissions(self, user: User, submissions: list) -> dict:
+        """Index submissions by number, filling missing fields from a not yet migrated user item"""
+        by_number = {submission.submission_number: submission for submission in submissions}
+        legacy_friends = user.friends or []
+        legacy_scores = user.referrals_score or []
+        for i in range(max(len(legacy_friends), len(legacy_scores))):
+            submission = by_number.setdefault(i, Submission(user_email=user.email, submission_number=i))
+            # A submission item may hold only the friends or only the score so far
+            if not submission.friends and i < len(legacy_friends):
+                submission.friends = legacy_friends[i]
+            if submission.score is None and i < len(legacy_scores):
+                submission.score = legacy_scores[i]
+        return by_number
+
     def update_terms_acceptance(self, email: str, accepted: bool) -> bool:
         """Update user's terms acceptance status"""
         try:
             self.dynamodb.update_item(
                 TableName=self.users_table,
-                Key={'email': {'S': email}},
+                Key=self.user_codec.key(email=email),
                 UpdateExpression='SET terms_accepted = :accepted',
                 ExpressionAttributeValues={
-                    ':accepted': {'BOOL': accepted}
+                    ':accepted': self.user_codec.encode_value('terms_accepted', accepted)
                 }
             )
+            self._invalidate_item(self.users_table, self.user_codec, email=email)
             return True
         except Exception as e:
             print(f"Error updating terms acceptance: {str(e)}")
             return False
 
-    def check_terms_accepted(self, email: str) -> bool:
-        """Check if user has accepted terms"""
+    def check_terms_accepted(self, email: str, consistent: bool = True) -> bool:
+        """Check if user has accepted terms
+
+        Strongly consistent by default, since the client checks right after accepting.
+        """
         try:
-            response = self.dynamodb.get_item(
-                TableName=self.users_table,
-                Key={'email': {'S': email}},
-                ProjectionExpression='terms_accepted'
+            user = self._read_item(
+                self.users_table, self.user_codec, ('terms_accepted',),
+                consistent=consistent, email=email
             )
-            if 'Item' in response:
-                return response['Item'].get('terms_accepted', {'BOOL': False})['BOOL']
-            return False
+            return user.terms_accepted if user else False
         except Exception as e:
             print(f"Error checking terms acceptance: {str(e)}")
             return False
@@ -566,12 +951,14 @@ class AWSService:
                 IndexName='StepNameIndex',
                 KeyConditionExpression='step_name = :step_name',
                 FilterExpression='begins_with(id, :id_prefix)',
+                # Global secondary indexes only support eventually consistent reads
+                **self.link_codec.projection('step_name', 'platform', 'link'),
                 ExpressionAttributeValues={
                     ':step_name': {'S': step_name},
                     ':id_prefix': {'S': f"{company_name}#"}
                 }
             )
-            return response.get('Items', [])
+            return [self.link_codec.decode(item) for item in response.get('Items', [])]
         except Exception as e:
             print(f"Error getting links: {str(e)}")
             return []
@@ -590,29 +977,23 @@ class AWSService:
                 # Delete old item
                 self.dynamodb.delete_item(
                     TableName=self.links_table,
-                    Key={'id': {'S': old_id}}
+                    Key=self.link_codec.key(id=old_id)
                 )
 
                 # Create new item with new platform
-                new_id = f"{company_name}#{step_name}#{new_platform}"
+                link = ReferralLink.create(company_name, step_name, new_platform, new_link)
                 self.dynamodb.put_item(
                     TableName=self.links_table,
-                    Item={
-                        'id': {'S': new_id},
-                        'step_name': {'S': step_name},
-                        'platform': {'S': new_platform},
-                        'link': {'S': new_link},
-                        'created_at': {'N': str(int(datetime.now().timestamp()))}
-                    }
+                    Item=self.link_codec.encode(link)
                 )
             else:
                 # Just update the link
                 self.dynamodb.update_item(
                     TableName=self.links_table,
-                    Key={'id': {'S': old_id}},
+                    Key=self.link_codec.key(id=old_id),
                     UpdateExpression='SET #link = :link',
                     ExpressionAttributeNames={'#link': 'link'},
-                    ExpressionAttributeValues={':link': {'S': new_link}}
+                    ExpressionAttributeValues={':link': self.link_codec.encode_value('link', new_link)}
                 )
             return True
         except ValueError as e:
@@ -625,56 +1006,33 @@ class AWSService:
     def get_all_clients(self, company_email):
         """Get all clients and their media from DynamoDB and S3"""
         # try:
-            # Scan the users table to get all users
-        response = self.dynamodb.scan(
-            TableName=self.users_table
-        )
-        
         clients = {}
-        for item in response.get('Items', []):
-            # if item has company email, then it's a client
-            if item.get('company_email', {}).get('S', '') != company_email:
-                continue
-            total_referrals = item.get('total_referrals', {}).get('N', '0')
-            email = item.get('email', {}).get('S', '')
-            name = item.get('name', {}).get('S', '')
-            terms_accepted = item.get('terms_accepted', {}).get('BOOL', False)
-            friends = item.get('friends', {}).get('L', [])
-            referrals_score = item.get('referrals_score', {}).get('L', [])
+        for user in self.iter_company_clients(company_email):
+            email = user.email
                             
             client = {
                 'email': email,
-                'name': name,
-                'terms_accepted': terms_accepted,
-                'total_referrals': total_referrals,
+                'name': user.name,
+                'terms_accepted': user.terms_accepted,
+                'total_referrals': str(user.total_referrals),
             }
             clients[email] = {}
             clients[email]['info'] = client
             clients[email]['data'] = []
+            thumbnails = self._list_client_thumbnails(email)
             
-            # get list of friends
-            friends = item.get('friends', {}).get('L', [])
-            # get list of scores
-            referrals_score = item.get('referrals_score', {}).get('L', [])
-            
-            for i in range(int(total_referrals)):
+            statuses = self._get_client_statuses(email, user.total_referrals)
+            submissions = self._merge_legacy_submissions(user, self.get_submissions(email))
+
+            for i in range(user.total_referrals):
+                submission = submissions.get(i) or Submission(user_email=email, submission_number=i)
                 client_single_referral_data = {}
-                client_single_referral_data['status'] = self.get_form_approval_status(email, i)
+                client_single_referral_data['status'] = statuses.get(i)
                 
-                client_single_referral_data['score'] = referrals_score[i].get('N', '0')
+                client_single_referral_data['score'] = str(submission.score if submission.score is not None else 0)
                 
                 # get ith group of friends
-                friends_group = friends[i].get('L', [])
-                
-                client_single_referral_data['friends'] = []
-                for j in range(len(friends_group)):
-                    client_single_referral_data['friends'].append({
-                        'name': friends_group[j].get('M', {}).get('name', {}).get('S', ''),
-                        'email': friends_group[j].get('M', {}).get('email', {}).get('S', ''),
-                        'phone': friends_group[j].get('M', {}).get('phone_number', {}).get('S', '')
-                    })
-                    
-                    
+                client_single_referral_data['friends'] = [friend.to_dict() for friend in submission.friends]
                     
                 try:
                     s3_response = self.s3_client.list_objects_v2(
@@ -695,12 +1053,15 @@ class AWSService:
                             if step_name not in client_single_referral_data['media']:
                                 client_single_referral_data['media'][step_name] = []
                                 
-                            # Generate pre-signed URL for the media file
+                            # Point at the thumbnail when there is one; the original
+                            # is fetched on demand through /api/media/download/<media_key>
+                            preview_key = thumbnail_key(obj['Key'])
+                            has_thumbnail = preview_key in thumbnails
                             url = self.s3_client.generate_presigned_url(
                                 'get_object',
                                 Params={
                                     'Bucket': self.bucket_name,
-                                    'Key': obj['Key']
+                                    'Key': preview_key if has_thumbnail else obj['Key']
                                 },
                                 ExpiresIn=3600  # URL expires in 1 hour
                             )
@@ -708,6 +1069,9 @@ class AWSService:
                             client_single_referral_data['media'][step_name].append({
                                 'filename': filename,
                                 'url': url,
+                                'thumbnail': has_thumbnail,
+                                'content_type': self._get_content_type(obj['Key']),
+                                'media_key': self.encode_key(obj['Key']),
                                 'uploaded_at': obj['LastModified'].isoformat()
                             })
                             
@@ -722,127 +1086,169 @@ class AWSService:
         #     print(f"Error getting clients: {str(e)}")
         #     raise e
         
-    def get_total_referrals(self, email: str) -> int:
+    def iter_company_clients(self, company_email: str, fields: tuple = (
+            'email', 'name', 'terms_accepted', 'total_referrals',
+            'friends', 'referrals_score'  # legacy, until 0003_split_referrals has run
+    )):
+        """Yield a company's clients page by page from CompanyEmailIndex"""
+        params = {
+            'TableName': self.users_table,
+            'IndexName': self.users_company_index,
+            'KeyConditionExpression': '#company_email = :company_email',
+            'ExpressionAttributeValues': {
+                ':company_email': self.user_codec.encode_value('company_email', company_email)
+            }
+        }
+        projection = self.user_codec.projection(*fields)
+        params['ProjectionExpression'] = projection['ProjectionExpression']
+        params['ExpressionAttributeNames'] = {**projection['ExpressionAttributeNames'], '#company_email': 'company_email'}
+        while True:
+            response = self.dynamodb.query(**params)
+            for item in response.get('Items', []):
+                yield self.user_codec.decode(item)
+            if 'LastEvaluatedKey' not in response:
+                return
+            params['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    def _get_client_statuses(self, email: str, total_referrals: int) -> dict:
+        """Approval status of each of a client's forms, keyed by form number"""
         try:
-            response = self.dynamodb.get_item(
-                TableName=self.users_table,
-                Key={'email': {'S': email}}
+            statuses = {a.form_number: a.to_status() for a in self.query_form_approvals(email)}
+        except Exception as e:
+            print(f"Error querying form approvals: {str(e)}")
+            statuses = {}
+        for i in range(total_referrals):
+            if i not in statuses:
+                # Rows written before UserFormIndex existed and not yet migrated
+                statuses[i] = self.get_form_approval_status(email, i)
+        return statuses
+
+    def _list_client_thumbnails(self, email: str) -> set:
+        """Keys of every thumbnail generated for a client's uploads"""
+        keys = set()
+        try:
+            paginator = self.s3_client.get_paginator('list_objects_v2')
+            for page in paginator.paginate(Bucket=self.bucket_name, Prefix=f"{THUMBNAIL_PREFIX}{email}/"):
+                keys.update(obj['Key'] for obj in page.get('Contents', []))
+        except Exception as e:
+            print(f"Error listing thumbnails: {str(e)}")
+        return keys
+
+    def _count_client_media(self, email: str) -> dict:
+        """Number of uploaded files per submission number, from one paginated listing"""
+        counts = {}
+        paginator = self.s3_client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket_name, Prefix=f"{email}/"):
+            for obj in page.get('Contents', []):
+                key_parts = obj['Key'].split('/')
+                if len(key_parts) >= 4 and key_parts[1].isdigit():
+                    number = int(key_parts[1])
+                    counts[number] = counts.get(number, 0) + 1
+        return counts
+
+    def iter_referral_rows(self, company_email: str):
+        """Yield one flat row per referred friend across all of a company's clients
+
+        Works one client at a time over paginated queries, so memory stays
+        constant however many clients the company has.
+        """
+        for user in self.iter_company_clients(company_email):
+            statuses = self._get_client_statuses(user.email, user.total_referrals)
+            submissions = self._merge_legacy_submissions(user, self.get_submissions(user.email))
+            media_counts = self._count_client_media(user.email)
+
+            for i in range(user.total_referrals):
+                submission = submissions.get(i) or Submission(user_email=user.email, submission_number=i)
+                status = statuses.get(i)
+                if status is None:
+                    approval_status = 'not submitted'
+                elif status['is_approved']:
+                    approval_status = 'approved'
+                elif status.get('reason') == self.PENDING_REASON:
+                    approval_status = 'pending'
+                else:
+                    approval_status = 'disapproved'
+
+                row = {
+                    'customer_email': user.email,
+                    'customer_name': user.name,
+                    'submission_number': i,
+                    'score': submission.score if submission.score is not None else 0,
+                    'approval_status': approval_status,
+                    'reason': (status or {}).get('reason') or '',
+                    'media_count': media_counts.get(i, 0)
+                }
+                for friend in submission.friends or [None]:
+                    yield {
+                        **row,
+                        'friend_name': friend.name if friend else '',
+                        'friend_email': friend.email if friend else '',
+                        'friend_phone': friend.phone if friend else ''
+                    }
+
+    def get_total_referrals(self, email: str, consistent: bool = True) -> int:
+        """Current referral counter; strongly consistent by default because it
+        picks the S3 prefix and submission number the next writes go to"""
+        try:
+            user = self._read_item(
+                self.users_table, self.user_codec, ('total_referrals',),
+                consistent=consistent, email=email
             )
-            return int(response.get('Item', {}).get('total_referrals', {}).get('N', '0'))
+            return user.total_referrals if user else 0
         except Exception as e:
             print(f"Error getting total referrals: {str(e)}")
             return 0
 
     def update_user_total_referrals(self, email: str):
+        """Increment the user's referral counter, returning its previous value (None on failure)"""
         try:
             # update total referrals + 1
-            self.dynamodb.update_item(
+            response = self.dynamodb.update_item(
                 TableName=self.users_table,
-                Key={'email': {'S': email}},
-                UpdateExpression='SET total_referrals = total_referrals + :inc',
+                Key=self.user_codec.key(email=email),
+                UpdateExpression='ADD total_referrals :inc',
                 ExpressionAttributeValues={
-                    ':inc': {'N': '1'}
-                }
+                    ':inc': self.user_codec.encode_value('total_referrals', 1)
+                },
+                ReturnValues='UPDATED_OLD'
             )
-            return True
+            self._invalidate_item(self.users_table, self.user_codec, email=email)
+            user = self.user_codec.decode(response.get('Attributes')) or User(email=email)
+            return user.total_referrals
         except Exception as e:
             print(f"Error updating total referrals: {str(e)}")
-            return False
+            return None
     
     def update_referrals_numbers(self, email: str, referral_score: int):
         try:
-            self.update_user_total_referrals(email)
-            # append new score in referrals_score list
-            self.dynamodb.update_item(
-                TableName=self.users_table,
-                Key={'email': {'S': email}},
-                UpdateExpression='SET referrals_score = list_append(if_not_exists(referrals_score, :empty_list), :new_score)',
+            submission_number = self.update_user_total_referrals(email)
+            if submission_number is None:
+                return False
+            # store the score on the submission it belongs to
+            score = int(referral_score)
+            response = self.dynamodb.update_item(
+                TableName=self.submissions_table,
+                Key=self.submission_codec.key(user_email=email, submission_number=submission_number),
+                UpdateExpression='SET score = :score, scored_at = :scored_at',
                 ExpressionAttributeValues={
-                    ':empty_list': {'L': []},
-                    ':new_score': {'L': [{'N': str(referral_score)}]}  # Format as DynamoDB number type
-                }
+                    ':score': self.submission_codec.encode_value('score', score),
+                    ':scored_at': self.submission_codec.encode_value('scored_at', datetime.now())
+                },
+                ReturnValues='UPDATED_OLD'
             )
-            return True
-        except Exception as e:
-            print(f"Error updating referrals numbers: {str(e)}")
-            return False
-
-    def get_item(self, table_name: str, key: dict) -> dict:
-        """Get an item from DynamoDB table"""
-        try:
-            response = self.dynamodb.get_item(
-                TableName=table_name,
-                Key={k: {'S': v} for k, v in key.items()}
-            )
-            return response.get('Item')
-        except Exception as e:
-            print(f"Error getting item from {table_name}: {str(e)}")
-            return None
-
-    def put_item(self, table_name: str, item: dict) -> bool:
-        """Put an item into DynamoDB table"""
-        try:
-            # Convert Python types to DynamoDB types
-            dynamodb_item = {}
-            for k, v in item.items():
-                if isinstance(v, str):
-                    dynamodb_item[k] = {'S': v}
-                elif isinstance(v, bool):
-                    dynamodb_item[k] = {'BOOL': v}
-                elif isinstance(v, (int, float)):
-                    dynamodb_item[k] = {'N': str(v)}
-                else:
-                    dynamodb_item[k] = {'S': str(v)}
-            
-            # if table is company add limit and discount
-            if table_name == self.companies_table:
-                dynamodb_item['discount'] = {'M': {
-                    'limit': {'N': '100'},
-                    'multiplier': {'N': '0.3'}
-                }} 
-
-            self.dynamodb.put_item(
-                TableName=table_name,
-                Item=dynamodb_item
+            old = self.submission_codec.decode(response.get('Attributes'))
+            old_score = old.score if old and old.score is not None else None
+            self._add_company_stats(
+                self._get_company_email_of(email),
+                stats_referrals=1,
+                stats_score_total=score - (old_score or 0),
+                stats_scored=0 if old_score is not None else 1
             )
             return True
         except Exception as e:
-            print(f"Error putting item into {table_name}: {str(e)}")
+            print(f"Error updating referrals numbers: {str(e)}")
             return False
 
-    def query_items(self, table_name: str, index_name: str, key_condition: dict) -> list:
-        """Query items from DynamoDB table using a secondary index"""
-        try:
-            # Build the key condition expression and attribute values
-            key_condition_expr = []
-            expr_attr_names = {}
-            expr_attr_values = {}
-            
-            for k, v in key_condition.items():
-                key_condition_expr.append(f"#{k} = :{k}")
-                expr_attr_names[f"#{k}"] = k
-                if isinstance(v, str):
-                    expr_attr_values[f":{k}"] = {'S': v}
-                elif isinstance(v, bool):
-                    expr_attr_values[f":{k}"] = {'BOOL': v}
-                elif isinstance(v, (int, float)):
-                    expr_attr_values[f":{k}"] = {'N': str(v)}
-                else:
-                    expr_attr_values[f":{k}"] = {'S': str(v)}
-
-            response = self.dynamodb.query(
-                TableName=table_name,
-                IndexName=index_name,
-                KeyConditionExpression=' AND '.join(key_condition_expr),
-                ExpressionAttributeNames=expr_attr_names,
-                ExpressionAttributeValues=expr_attr_values
-            )
-            
-            return response.get('Items', [])
-        except Exception as e:
-            print(f"Error querying items from {table_name}: {str(e)}")
-            return []
-
     def get_company_settings(self, company_email: str) -> dict:
         """Get company-specific settings from DynamoDB
         
@@ -853,25 +1259,17 @@ class AWSService:
             dict: Company settings including discount and hashtags
         """
         try:
-            response = self.dynamodb.get_item(
-                TableName=self.companies_table,
-                Key={'email': {'S': company_email}},
-                ProjectionExpression='discount, hashtags'
+            company = self._read_item(
+                self.companies_table, self.company_codec, ('discount', 'hashtags'),
+                consistent=False, email=company_email
             )
             
-            if 'Item' in response:
-                item = response['Item']
-                return {
-                    'discount': item.get('discount', {}).get('M', {}).get('limit', {}).get('N', '100'),
-                    'multiplier': item.get('discount', {}).get('M', {}).get('multiplier', {}).get('N', '0.3'),
-                    'hashtags': [tag['S'] for tag in item.get('hashtags', {}).get('L', [])]
-                }
-            
-            # Return default values if no settings found
+            # Default values are used if no settings found
+            company = company or Company(email=company_email)
             return {
-                'discount': '100',
-                'multiplier': '0.3',
-                'hashtags': []
+                'discount': str(company.discount.limit),
+                'multiplier': str(company.discount.multiplier),
+                'hashtags': company.hashtags
             }
             
         except Exception as e:
@@ -887,44 +1285,48 @@ class AWSService:
                 - discount: Score limit for discount
                 - multiplier: Discount multiplier
                 - hashtags: List of hashtags
+                - post_media_key: S3 key of the post media ('' once deleted)
+                - post_media_type: Content type of the post media
                 
         Returns:
             bool: True if update successful, False otherwise
         """
         try:
-            update_expr_parts = []
-            expr_attr_values = {}
+            values = {}
             
             # Update discount settings if provided
             if 'discount' in settings or 'multiplier' in settings:
-                discount_attr = {
-                    'M': {
-                        'limit': {'N': str(settings.get('discount', '100'))},
-                        'multiplier': {'N': str(settings.get('multiplier', '0.3'))}
-                    }
-                }
-                update_expr_parts.append('discount = :discount')
-                expr_attr_values[':discount'] = discount_attr
+                values['discount'] = Discount(
+                    limit=Decimal(str(settings.get('discount', '100'))),
+                    multiplier=Decimal(str(settings.get('multiplier', '0.3')))
+                )
             
             # Update hashtags settings if provided
             if 'hashtags' in settings:
-                hashtags_attr = {
-                    'L': [{'S': tag} for tag in settings.get('hashtags', [])]
-                }
-                update_expr_parts.append('hashtags = :hashtags')
-                expr_attr_values[':hashtags'] = hashtags_attr
+                values['hashtags'] = list(settings.get('hashtags', []))
+
+            # Post media location, so reads don't have to list the S3 prefix
+            for field in ('post_media_key', 'post_media_type'):
+                if field in settings:
+                    values[field] = settings[field] or ''
             
-            if not update_expr_parts:
+            if not values:
                 return True  # Nothing to update
                 
-            update_expression = 'SET ' + ', '.join(update_expr_parts)
+            update_expression = 'SET ' + ', '.join(f'#{field} = :{field}' for field in values)
             
             self.dynamodb.update_item(
                 TableName=self.companies_table,
-                Key={'email': {'S': company_email}},
+                Key=self.company_codec.key(email=company_email),
                 UpdateExpression=update_expression,
-                ExpressionAttributeValues=expr_attr_values
+                ExpressionAttributeNames={
+                    f'#{field}': self.company_codec.attribute_names[field] for field in values
+                },
+                ExpressionAttributeValues={
+                    f':{field}': self.company_codec.encode_value(field, value) for field, value in values.items()
+                }
             )
+            self._invalidate_item(self.companies_table, self.company_codec, email=company_email)
             return True
             
         except Exception as e:
@@ -941,38 +1343,24 @@ class AWSService:
             dict: Post settings including hashtags list and post image URL
         """
         try:
-            # Get hashtags from DynamoDB
-            response = self.dynamodb.get_item(
-                TableName=self.companies_table,
-                Key={'email': {'S': company_email}},
-                ProjectionExpression='hashtags'
+            # Hashtags and media key live on the company item
+            company = self._read_item(
+                self.companies_table, self.company_codec, ('hashtags', 'post_media_key'),
+                consistent=False, email=company_email
             )
-            
-            hashtags = []
-            if 'Item' in response and 'hashtags' in response['Item']:
-                hashtags = [tag['S'] for tag in response['Item']['hashtags'].get('L', [])]
-            
-            # Get post image from S3
-            post_image_url = None
-            try:
-                # List objects in the company's post directory
-                response = self.s3_client.list_objects_v2(
-                    Bucket=self.bucket_name,
-                    Prefix=f"{company_email}/post/",
-                    MaxKeys=1
-                )
-                
-                # Get the first image if any exists
-                if 'Contents' in response and len(response['Contents']) > 0:
-                    key = response['Contents'][0]['Key']
-                    # Return encoded key instead of direct S3 URL
-                    encoded_key = self.encode_key(key)
-                    post_image_url = f"/media/download/{encoded_key}"
-            except Exception as e:
-                print(f"Error getting post image: {str(e)}")
+            if company is None:
+                # Not a company; never create one from a public read
+                return {'hashtags': [], 'media': None}
+
+            key = company.post_media_key
+            if key is None:
+                # Posts uploaded before the key was stored on the company item
+                key = self._backfill_post_media_key(company_email)
+
+            post_image_url = f"/media/download/{self.encode_key(key)}" if key else None
             
             return {
-                'hashtags': hashtags,
+                'hashtags': company.hashtags,
                 'media': post_image_url
             }
             
@@ -982,7 +1370,36 @@ class AWSService:
                 'hashtags': [],
                 'media': None
             }
-  
+
+    def _backfill_post_media_key(self, company_email: str):
+        """Find a legacy post image in S3 and record its key on the company item"""
+        try:
+            response = self.s3_client.list_objects_v2(
+                Bucket=self.bucket_name,
+                Prefix=f"{company_email}/post/",
+                MaxKeys=1
+            )
+            contents = response.get('Contents', [])
+            key = contents[0]['Key'] if contents else ''
+            # Only ever fills in an existing company item
+            self.dynamodb.update_item(
+                TableName=self.companies_table,
+                Key=self.company_codec.key(email=company_email),
+                UpdateExpression='SET post_media_key = :key, post_media_type = :type',
+                ConditionExpression='attribute_exists(email)',
+                ExpressionAttributeValues={
+                    ':key': {'S': key},
+                    ':type': {'S': self._get_content_type(key) if key else ''}
+                }
+            )
+            self._invalidate_item(self.companies_table, self.company_codec, email=company_email)
+            return key
+        except self.dynamodb.exceptions.ConditionalCheckFailedException:
+            return None
+        except Exception as e:
+            print(f"Error getting post image: {str(e)}")
+            return None
+
     def init_links(self, company_name: str, company_web: str):
         # Initial links data
         initial_links = [
@@ -1007,22 +1424,27 @@ class AWSService:
         ]
 
         # Insert initial links
+        failed = 0
         for link_data in initial_links:
-            link = {
-                'id': {'S': f"{company_name}#{link_data['step_name']}#{link_data['platform']}"},
-                'step_name': {'S': link_data['step_name']},
-                'platform': {'S': link_data['platform']},
-                'link': {'S': link_data['link']},
-                'created_at': {'N': str(int(datetime.now().timestamp()))}
-            }
+            link = ReferralLink.create(company_name, link_data['step_name'], link_data['platform'], link_data['link'])
             try:
                 response = self.dynamodb.put_item(
                     TableName=self.links_table,
-                    Item=link
+                    Item=self.link_codec.encode(link),
+                    # A retried task must not reset links the company has edited since
+                    ConditionExpression='attribute_not_exists(id)'
                 )
                 print(f"Added link: {link_data['step_name']} - {link_data['platform']}")
+            except self.dynamodb.exceptions.ConditionalCheckFailedException:
+                pass
             except Exception as e:
+                failed += 1
                 print(f"Error adding link {link_data['step_name']} - {link_data['platform']}: {str(e)}")
+        # Links may have been served (empty) before they existed
+        self.bump_cache_version(f"links#{company_name}")
+        if failed:
+            # Raise so the task queue retries the missing links
+            raise RuntimeError(f"Failed to add {failed} links for {company_name}")
 
     def get_file_url(self, key: str) -> str:
         """Generate a presigned URL for the given S3 key"""
@@ -1041,77 +1463,429 @@ class AWSService:
             print(f"Error generating file URL: {str(e)}")
             return None
 
-    def update_form_approval_status(self, user_email: str, form_number: int, is_approved: bool, reason: str = None):
+    def _build_form_approval(self, user_email: str, form_number: int, is_approved: bool,
+                             reason: str, company_email: str) -> FormApproval:
+        approval = FormApproval(
+            form_id=f"{user_email}#form{form_number}",
+            user_email=user_email,
+            form_number=form_number,
+            is_approved=is_approved,
+            updated_at=datetime.now().isoformat()
+        )
+        # Add reason if provided or if form is rejected
+        if reason is not None or not is_approved:
+            approval.reason = reason if reason is not None else ''
+        if approval.state == 'pending' and company_email:
+            # Enter the review queue; any decision rewrites the item
+            # without these keys, dropping it from the sparse index
+            approval.pending_company = company_email
+            approval.submitted_at = approval.updated_at
+        return approval
+
+    @staticmethod
+    def _approval_stat_deltas(old: FormApproval, new: FormApproval, deltas: dict):
+        """Move a form from its previous state's counter to the new one"""
+        if old is not None and old.state == new.state:
+            return
+        deltas[f'stats_{new.state}'] = deltas.get(f'stats_{new.state}', 0) + 1
+        if old is not None:
+            deltas[f'stats_{old.state}'] = deltas.get(f'stats_{old.state}', 0) - 1
+
+    def update_form_approval_status(self, user_email: str, form_number: int, is_approved: bool, reason: str = None,
+                                    only_if_pending: bool = False):
         """Update the approval status of a specific form
         Args:
             user_email (str): Email of the user who submitted the form
             form_number (int): Number of the form
             is_approved (bool): Whether the form is approved or not
             reason (str, optional): Reason for rejection if form is not approved
+            only_if_pending (bool): Leave the form alone if it was already approved or
+                disapproved; returns True without writing in that case
         """
-        form_id = f"{user_email}#form{form_number}"
         try:
-            item = {
-                'form_id': {'S': form_id},
-                'is_approved': {'BOOL': is_approved},
-                'updated_at': {'S': datetime.now().isoformat()}
-            }
-            
-            # Add reason if provided or if form is rejected
-            if reason is not None or not is_approved:
-                item['reason'] = {'S': reason if reason is not None else ''}
-            
-            self.dynamodb.put_item(
-                TableName=self.form_approvals_table,
-                Item=item
-            )
+            company_email = self._get_company_email_of(user_email)
+            approval = self._build_form_approval(user_email, form_number, is_approved, reason, company_email)
+            params = {}
+            if only_if_pending:
+                params = {
+                    'ConditionExpression': 'attribute_not_exists(form_id) OR (is_approved = :false AND reason = :pending)',
+                    'ExpressionAttributeValues': {
+                        ':false': {'BOOL': False},
+                        ':pending': {'S': self.PENDING_REASON}
+                    }
+                }
+            try:
+                response = self.dynamodb.put_item(
+                    TableName=self.form_approvals_table,
+                    Item=self.approval_codec.encode(approval),
+                    ReturnValues='ALL_OLD',
+                    **params
+                )
+            except self.dynamodb.exceptions.ConditionalCheckFailedException:
+                # Already decided; nothing to do
+                return True
+            self._invalidate_item(self.form_approvals_table, self.approval_codec, form_id=approval.form_id)
+            deltas = {}
+            self._approval_stat_deltas(self.approval_codec.decode(response.get('Attributes')), approval, deltas)
+            self._add_company_stats(company_email, **deltas)
             return True
         except Exception as e:
             print(f"Error updating form approval status: {str(e)}")
             return False
 
-    def get_form_approval_status(self, user_email: str, form_number: int):
-        """Get the approval status of a specific form"""
-        form_id = f"{user_email}#form{form_number}"
+    def bulk_update_form_approval_status(self, decisions: list) -> list:
+        """Write many approval decisions with BatchWriteItem
+
+        Args:
+            decisions (list): Dicts with user_email, form_number, is_approved
+                and reason, each naming a distinct form
+
+        Returns:
+            list: One bool per decision, in order, True if it was written
+        """
+        # BatchWriteItem can't return old items, so the previous states the
+        # counters need are read up front (coalesced by the request loader)
+        loader = request_loader.current()
+        if loader is not None:
+            try:
+                loader.prefetch(
+                    [(self.users_table, self.user_codec.key(email=email),
+                      [self.user_codec.attribute_names['company_email']], False)
+                     for email in {d['user_email'] for d in decisions}] +
+                    [(self.form_approvals_table,
+                      self.approval_codec.key(form_id=f"{d['user_email']}#form{d['form_number']}"),
+                      [self.approval_codec.attribute_names[name] for name in ('is_approved', 'reason')], False)
+                     for d in decisions]
+                )
+            except Exception as e:
+                print(f"Error prefetching form approvals: {str(e)}")
+
+        approvals = []
+        for d in decisions:
+            try:
+                company_email = self._get_company_email_of(d['user_email'])
+                old = self._read_item(
+                    self.form_approvals_table, self.approval_codec, ('is_approved', 'reason'),
+                    consistent=False, form_id=f"{d['user_email']}#form{d['form_number']}"
+                )
+            except Exception as e:
+                print(f"Error reading form approval: {str(e)}")
+                company_email, old = None, None
+            approvals.append((
+                self._build_form_approval(
+                    d['user_email'], d['form_number'], d['is_approved'], d.get('reason'), company_email
+                ),
+                old,
+                company_email
+            ))
+
+        written = set()
+        for start in range(0, len(approvals), self.BATCH_WRITE_LIMIT):
+            chunk = {approval.form_id: approval for approval, _, _ in approvals[start:start + self.BATCH_WRITE_LIMIT]}
+            written |= self._batch_put(self.form_approvals_table, [
+                self.approval_codec.encode(approval) for approval in chunk.values()
+            ], 'form_id')
+
+        results = []
+        deltas_by_company = {}
+        for approval, old, company_email in approvals:
+            success = approval.form_id in written
+            results.append(success)
+            if success:
+                self._invalidate_item(self.form_approvals_table, self.approval_codec, form_id=approval.form_id)
+                self._approval_stat_deltas(old, approval, deltas_by_company.setdefault(company_email, {}))
+        for company_email, deltas in deltas_by_company.items():
+            self._add_company_stats(company_email, **deltas)
+        return results
+
+    def _batch_put(self, table: str, items: list, key_name: str, max_attempts: int = 5) -> set:
+        """Put up to BATCH_WRITE_LIMIT items, retrying unprocessed ones with backoff
+
+        Returns the key_name values of the items that were written.
+        """
+        pending = [{'PutRequest': {'Item': item}} for item in items]
+        delay = 0.05
+        for attempt in range(max_attempts):
+            try:
+                response = self.dynamodb.batch_write_item(RequestItems={table: pending})
+            except Exception as e:
+                print(f"Error writing batch to {table}: {str(e)}")
+                break
+            pending = response.get('UnprocessedItems', {}).get(table, [])
+            if not pending:
+                break
+            time.sleep(delay)
+            delay = min(delay * 2, 1)
+        unprocessed = {request['PutRequest']['Item'][key_name]['S'] for request in pending}
+        return {item[key_name]['S'] for item in items} - unprocessed
+
+    def get_cache_version(self, resource: str):
+        """Current version of a cached resource (0 if never written), or None on error"""
         try:
             response = self.dynamodb.get_item(
-                TableName=self.form_approvals_table,
-                Key={
-                    'form_id': {'S': form_id}
+                TableName=self.cache_versions_table,
+                Key={'resource': {'S': resource}},
+                ProjectionExpression='version',
+                # Every worker must agree on the version right after a bump
+                ConsistentRead=True
+            )
+            return int(response.get('Item', {}).get('version', {}).get('N', '0'))
+        except Exception as e:
+            print(f"Error reading cache version: {str(e)}")
+            return None
+
+    def bump_cache_version(self, resource: str) -> bool:
+        """Mark a cached resource as changed for every worker"""
+        try:
+            self.dynamodb.update_item(
+                TableName=self.cache_versions_table,
+                Key={'resource': {'S': resource}},
+                UpdateExpression='ADD version :one',
+                ExpressionAttributeValues={':one': {'N': '1'}}
+            )
+            return True
+        except Exception as e:
+            print(f"Error bumping cache version: {str(e)}")
+            return False
+
+    def reserve_idempotency_key(self, record_id: str, fingerprint: str, lease_seconds: int):
+        """Claim an idempotency key for the request about to run
+
+        The claim lapses after lease_seconds, so a worker dying mid-request
+        doesn't block the key until its TTL.
+
+        Returns:
+            IdempotencyRecord: The existing record if the key is already taken,
+            or None if this request now owns it
+        """
+        now = int(time.time())
+        record = IdempotencyRecord(id=record_id, fingerprint=fingerprint, expires_at=now + lease_seconds)
+        try:
+            self.dynamodb.put_item(
+                TableName=self.idempotency_table,
+                Item=self.idempotency_codec.encode(record),
+                # TTL deletion is lazy, so expired records are treated as absent
+                ConditionExpression='attribute_not_exists(id) OR expires_at < :now',
+                ExpressionAttributeValues={':now': self.idempotency_codec.encode_value('expires_at', now)},
+                ReturnValuesOnConditionCheckFailure='ALL_OLD'
+            )
+            return None
+        except self.dynamodb.exceptions.ConditionalCheckFailedException as e:
+            return self.idempotency_codec.decode(e.response.get('Item')) or record
+
+    def complete_idempotency_key(self, record_id: str, status_code: int, body: bytes,
+                                 content_type: str, ttl_seconds: int):
+        """Store the response for replay to retries until the TTL passes"""
+        self.dynamodb.update_item(
+            TableName=self.idempotency_table,
+            Key=self.idempotency_codec.key(id=record_id),
+            UpdateExpression='SET #status = :status, status_code = :status_code, body = :body, '
+                             'content_type = :content_type, expires_at = :expires_at',
+            ExpressionAttributeNames={'#status': 'status'},
+            ExpressionAttributeValues={
+                ':status': self.idempotency_codec.encode_value('status', 'completed'),
+                ':status_code': self.idempotency_codec.encode_value('status_code', status_code),
+                ':body': self.idempotency_codec.encode_value('body', body),
+                ':content_type': self.idempotency_codec.encode_value('content_type', content_type),
+                ':expires_at': self.idempotency_codec.encode_value('expires_at', int(time.time()) + ttl_seconds)
+            }
+        )
+
+    def release_idempotency_key(self, record_id: str):
+        """Drop a claim whose request failed, so a retry runs it again"""
+        self.dynamodb.delete_item(
+            TableName=self.idempotency_table,
+            Key=self.idempotency_codec.key(id=record_id)
+        )
+
+    def _get_company_email_of(self, user_email: str):
+        """The company a client belongs to, or None"""
+        user = self._read_item(
+            self.users_table, self.user_codec, ('company_email',),
+            consistent=False, email=user_email
+        )
+        return user.company_email if user else None
+
+    def _add_company_stats(self, company_email: str, **deltas):
+        """Atomically ADD deltas to a company's dashboard counters
+
+        Counter updates never fail the write they follow; any drift is
+        repaired by recompute_company_stats.
+        """
+        deltas = {name: delta for name, delta in deltas.items() if delta}
+        if not company_email or not deltas:
+            return
+        try:
+            self.dynamodb.update_item(
+                TableName=self.companies_table,
+                Key=self.company_codec.key(email=company_email),
+                UpdateExpression='ADD ' + ', '.join(f'#{name} :{name}' for name in deltas),
+                # Don't create a company item for an unknown company
+                ConditionExpression='attribute_exists(email)',
+                ExpressionAttributeNames={f'#{name}': self.company_codec.attribute_names[name] for name in deltas},
+                ExpressionAttributeValues={
+                    f':{name}': self.company_codec.encode_value(name, delta) for name, delta in deltas.items()
                 }
             )
-            if 'Item' in response:
-                result = {
-                    'is_approved': response['Item']['is_approved']['BOOL'],
-                    'updated_at': response['Item']['updated_at']['S']
+            self._invalidate_item(self.companies_table, self.company_codec, email=company_email)
+        except Exception as e:
+            print(f"Error updating company stats for {company_email}: {str(e)}")
+
+    def get_company_stats(self, company_email: str) -> dict:
+        """A company's dashboard summary, read from its counters in one get_item"""
+        try:
+            company = self._read_item(
+                self.companies_table, self.company_codec, ('email',) + self.COMPANY_STATS_FIELDS,
+                consistent=False, email=company_email
+            )
+            return company.stats_summary() if company else None
+        except Exception as e:
+            print(f"Error getting company stats: {str(e)}")
+            return None
+
+    def recompute_company_stats(self, company_email: str):
+        """Rebuild a company's counters from its clients' items and overwrite them
+
+        Returns the recomputed summary, or None on failure.
+        """
+        stats = Company(email=company_email)
+        try:
+            for user in self.iter_company_clients(company_email):
+                stats.stats_clients += 1
+                stats.stats_referrals += user.total_referrals
+                submissions = self._merge_legacy_submissions(user, self.get_submissions(user.email))
+                for submission in submissions.values():
+                    if submission.friends or submission.submitted_at:
+                        stats.stats_submissions += 1
+                        stats.stats_friends += len(submission.friends)
+                    if submission.score is not None:
+                        stats.stats_scored += 1
+                        stats.stats_score_total += submission.score
+                for approval in self.query_form_approvals(user.email):
+                    setattr(stats, f'stats_{approval.state}', getattr(stats, f'stats_{approval.state}') + 1)
+
+            self.dynamodb.update_item(
+                TableName=self.companies_table,
+                Key=self.company_codec.key(email=company_email),
+                UpdateExpression='SET ' + ', '.join(f'#{name} = :{name}' for name in self.COMPANY_STATS_FIELDS),
+                ConditionExpression='attribute_exists(email)',
+                ExpressionAttributeNames={
+                    f'#{name}': self.company_codec.attribute_names[name] for name in self.COMPANY_STATS_FIELDS
+                },
+                ExpressionAttributeValues={
+                    f':{name}': self.company_codec.encode_value(name, getattr(stats, name))
+                    for name in self.COMPANY_STATS_FIELDS
                 }
-                # Add reason if it exists
-                if 'reason' in response['Item']:
-                    result['reason'] = response['Item']['reason']['S']
-                return result
+            )
+            self._invalidate_item(self.companies_table, self.company_codec, email=company_email)
+            return stats.stats_summary()
+        except Exception as e:
+            print(f"Error recomputing company stats: {str(e)}")
             return None
+
+    def get_form_approval_status(self, user_email: str, form_number: int):
+        """Get the approval status of a specific form"""
+        form_id = f"{user_email}#form{form_number}"
+        try:
+            approval = self._read_item(
+                self.form_approvals_table, self.approval_codec, ('is_approved', 'updated_at', 'reason'),
+                consistent=False, form_id=form_id
+            )
+            return approval.to_status() if approval else None
         except Exception as e:
             print(f"Error getting form approval status: {str(e)}")
             return None
 
-    def get_all_form_approvals_for_user(self, user_email: str):
+    def query_form_approvals(self, user_email: str, start: int = None, end: int = None, latest: int = None):
+        """Query a user's form approvals in form order using UserFormIndex
+
+        Args:
+            user_email: Email of the user who submitted the forms
+            start, end: Optional inclusive range of form numbers
+            latest: Only return the latest N forms, newest first
+        """
+        key_condition = 'user_email = :email'
+        values = {':email': self.approval_codec.encode_value('user_email', user_email)}
+        if start is not None and end is not None:
+            key_condition += ' AND form_number BETWEEN :start AND :end'
+            values[':start'] = self.approval_codec.encode_value('form_number', start)
+            values[':end'] = self.approval_codec.encode_value('form_number', end)
+        elif start is not None:
+            key_condition += ' AND form_number >= :start'
+            values[':start'] = self.approval_codec.encode_value('form_number', start)
+        elif end is not None:
+            key_condition += ' AND form_number <= :end'
+            values[':end'] = self.approval_codec.encode_value('form_number', end)
+
+        params = {
+            'TableName': self.form_approvals_table,
+            'IndexName': self.form_approvals_user_index,
+            'KeyConditionExpression': key_condition,
+            'ExpressionAttributeValues': values,
+            'ScanIndexForward': latest is None,
+            # Global secondary indexes only support eventually consistent reads
+            **self.approval_codec.projection('form_id', 'form_number', 'is_approved', 'updated_at', 'reason')
+        }
+        if latest is not None:
+            params['Limit'] = latest
+
+        approvals = []
+        while True:
+            response = self.dynamodb.query(**params)
+            approvals.extend(self.approval_codec.decode(item) for item in response.get('Items', []))
+            if 'LastEvaluatedKey' not in response or (latest is not None and len(approvals) >= latest):
+                break
+            params['ExclusiveStartKey'] = response['LastEvaluatedKey']
+        return approvals[:latest] if latest is not None else approvals
+
+    def query_pending_approvals(self, company_email: str, limit: int = 50, cursor: str = None):
+        """One page of a company's forms awaiting review, oldest submission first
+
+        Reads only PendingApprovalIndex, so the cost follows the number of
+        pending forms rather than the number of clients.
+
+        Args:
+            company_email: Company whose review queue to read
+            limit: Maximum number of forms to return
+            cursor: Opaque cursor returned with the previous page
+
+        Returns:
+            tuple: (list of FormApproval, cursor for the next page or None)
+
+        Raises:
+            ValueError: If cursor is malformed
+        """
+        params = {
+            'TableName': self.form_approvals_table,
+            'IndexName': self.form_approvals_pending_index,
+            'KeyConditionExpression': 'pending_company = :company',
+            'ExpressionAttributeValues': {
+                ':company': self.approval_codec.encode_value('pending_company', company_email)
+            },
+            'Limit': limit,
+            # Global secondary indexes only support eventually consistent reads
+            **self.approval_codec.projection('form_id', 'user_email', 'form_number', 'submitted_at')
+        }
+        if cursor:
+            params['ExclusiveStartKey'] = decode_cursor(cursor)
+        response = self.dynamodb.query(**params)
+        approvals = [self.approval_codec.decode(item) for item in response.get('Items', [])]
+        last_key = response.get('LastEvaluatedKey')
+        return approvals, encode_cursor(last_key) if last_key else None
+
+    def get_all_form_approvals_for_user(self, user_email: str, start: int = None, end: int = None, latest: int = None):
         """Get all form approval statuses for a specific user"""
         try:
-            response = self.dynamodb.scan(
-                TableName=self.form_approvals_table,
-                FilterExpression='begins_with(form_id, :email)',
-                ExpressionAttributeValues={
-                    ':email': {'S': user_email}
-                }
-            )
+            approvals = self.query_form_approvals(user_email, start, end, latest)
             return [
                 {
-                    'form_id': item['form_id']['S'],
-                    'is_approved': item['is_approved']['BOOL'],
-                    'updated_at': item['updated_at']['S'],
-                    'reason': item.get('reason', {}).get('S', '') if not item['is_approved']['BOOL'] else None
+                    'form_id': approval.form_id,
+                    'form_number': approval.form_number,
+                    'is_approved': approval.is_approved,
+                    'updated_at': approval.updated_at,
+                    'reason': (approval.reason or '') if not approval.is_approved else None
                 }
-                for item in response.get('Items', [])
+                for approval in approvals
             ]
         except Exception as e:
             print(f"Error getting user form approvals: {str(e)}")
@@ -1120,18 +1894,26 @@ class AWSService:
     def check_platform_exists(self, company_name: str, platform: str, current_step: str) -> bool:
         """Check if platform exists in any step for this company"""
         try:
-            # Scan the links table for any matching platform in the same step
-            response = self.dynamodb.scan(
-                TableName=self.links_table,
-                FilterExpression='begins_with(id, :company_prefix) AND contains(id, :platform) AND step_name = :current_step',
-                ExpressionAttributeValues={
+            # Only the step's links can match, so query StepNameIndex instead of scanning the table
+            params = {
+                'TableName': self.links_table,
+                'IndexName': 'StepNameIndex',
+                'KeyConditionExpression': 'step_name = :current_step',
+                'FilterExpression': 'begins_with(id, :company_prefix) AND contains(id, :platform)',
+                'ProjectionExpression': 'id',
+                'ExpressionAttributeValues': {
                     ':company_prefix': {'S': f"{company_name}#"},
                     ':platform': {'S': platform.lower()},
                     ':current_step': {'S': current_step}
                 }
-            )
-            return len(response.get('Items', [])) > 0
+            }
+            while True:
+                response = self.dynamodb.query(**params)
+                if response.get('Items'):
+                    return True
+                if 'LastEvaluatedKey' not in response:
+                    return False
+                params['ExclusiveStartKey'] = response['LastEvaluatedKey']
         except Exception as e:
             print(f"Error checking platform existence: {str(e)}")
             return False
-
@@ -0,0 +1,248 @@
+"""Client-side rate limiting of DynamoDB calls against each table's provisioned capacity.
+
+`CapacityLimiter.install(client)` hooks a boto3 DynamoDB client's botocore
+events: every data-plane call first takes capacity units from a token bucket
+for its table and operation class (read or write), refilled at the table's
+provisioned rate. Calls ask DynamoDB to report ConsumedCapacity, and the
+bucket is charged the difference between the estimate and what was actually
+consumed, so a large query or scan makes the calls after it wait. A throttled
+call empties the bucket, backing every caller off together.
+
+Work marked as background (task queue jobs, admin scripts) is additionally
+held to `background_share` of the rate, so interactive requests always keep
+the rest. On-demand tables are not limited.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from utils.metrics import metrics
+
+INTERACTIVE = 'interactive'
+BACKGROUND = 'background'
+
+_priority = ContextVar('dynamodb_priority', default=INTERACTIVE)
+
+READ_OPERATIONS = {'GetItem', 'BatchGetItem', 'Query', 'Scan', 'TransactGetItems'}
+WRITE_OPERATIONS = {'PutItem', 'UpdateItem', 'DeleteItem', 'BatchWriteItem', 'TransactWriteItems'}
+THROTTLE_ERRORS = {'ProvisionedThroughputExceededException', 'ThrottlingException', 'RequestLimitExceeded'}
+
+@contextmanager
+def background_priority():
+    """DynamoDB calls made inside the block count as background work"""
+    token = _priority.set(BACKGROUND)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+def background(f):
+    """Decorator running f's DynamoDB calls as background work"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        with background_priority():
+            return f(*args, **kwargs)
+    return decorated_function
+
+class TokenBucket:
+    """Capacity units refilled at `rate` per second, holding at most `burst`
+
+    Callers take their units up front and wait until the balance is back
+    above zero, so the bucket can go into debt when actual consumption turns
+    out higher than estimated.
+    """
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    def take(self, units: float) -> float:
+        """Take units; returns the seconds to wait before using them"""
+        with self._lock:
+            self._refill()
+            self._tokens -= units
+            return max(-self._tokens / self.rate, 0)
+
+    def charge(self, units: float):
+        """Adjust the balance by units actually consumed beyond the estimate (negative to refund)"""
+        with self._lock:
+            self._refill()
+            self._tokens = min(self.burst, self._tokens - units)
+
+    def drain(self):
+        """Empty the bucket after DynamoDB throttled a call"""
+        with self._lock:
+            self._refill()
+            self._tokens = min(self._tokens, 0)
+
+class _TableBuckets:
+    def __init__(self, rate: float, burst_seconds: float, background_share: float):
+        self.shared = TokenBucket(rate, rate * burst_seconds)
+        self.background = TokenBucket(rate * background_share, rate * background_share * burst_seconds)
+
+class CapacityLimiter:
+    """Token buckets per table and operation class, fed by a DynamoDB client's events
+
+    Args:
+        background_share: Share of a table's rate background work may use
+        burst_seconds: Seconds of unused capacity a bucket can save up
+        max_wait: Longest a call waits for capacity before going ahead anyway
+        refresh_interval: Seconds between re-reading a table's provisioned capacity
+    """
+
+    def __init__(self, background_share: float = 0.5, burst_seconds: float = 10,
+                 max_wait: float = 5.0, refresh_interval: float = 300):
+        self.background_share = background_share
+        self.burst_seconds = burst_seconds
+        self.max_wait = max_wait
+        self.refresh_interval = refresh_interval
+        self._client = None
+        self._buckets = {}  # table -> ({'read'/'write': _TableBuckets}, capacity read at)
+        self._lock = threading.Lock()
+
+    def install(self, client):
+        """Register the limiter on a boto3 DynamoDB client"""
+        self._client = client
+        events = client.meta.events
+        for operation in READ_OPERATIONS | WRITE_OPERATIONS:
+            events.register(f'before-parameter-build.dynamodb.{operation}', self._before_call)
+            events.register(f'after-call.dynamodb.{operation}', self._after_call)
+            events.register(f'needs-retry.dynamodb.{operation}', self._on_retry)
+        return client
+
+    def _provisioned_rates(self, table: str) -> dict:
+        """Provisioned units per second by operation class; empty for on-demand tables"""
+        try:
+            description = self._client.describe_table(TableName=table)['Table']
+        except Exception as e:
+            print(f"Error reading capacity of {table}: {str(e)}")
+            return {}
+        throughput = description.get('ProvisionedThroughput', {})
+        rates = {
+            'read': throughput.get('ReadCapacityUnits') or 0,
+            'write': throughput.get('WriteCapacityUnits') or 0
+        }
+        return {operation_class: rate for operation_class, rate in rates.items() if rate}
+
+    def _table_buckets(self, table: str, operation_class: str):
+        """A table's buckets for an operation class, or None if it isn't limited"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._buckets.get(table)
+            stale = entry is None or now - entry[1] >= self.refresh_interval
+            if stale and entry is not None:
+                # Other callers keep the current buckets while this one re-reads capacity
+                self._buckets[table] = (entry[0], now)
+        if stale:
+            self._refresh(table)
+        with self._lock:
+            return self._buckets[table][0].get(operation_class)
+
+    def _refresh(self, table: str):
+        rates = self._provisioned_rates(table)
+        with self._lock:
+            entry = self._buckets.get(table)
+            current = entry[0] if entry else {}
+            buckets = {}
+            for operation_class, rate in rates.items():
+                existing = current.get(operation_class)
+                # Keep a bucket's balance unless the table's capacity changed
+                if existing is not None and existing.shared.rate == rate:
+                    buckets[operation_class] = existing
+                else:
+                    buckets[operation_class] = _TableBuckets(rate, self.burst_seconds, self.background_share)
+            self._buckets[table] = (buckets, time.monotonic())
+
+    @staticmethod
+    def _estimates(operation: str, params: dict) -> dict:
+        """Units a call is expected to consume, by table"""
+        if operation == 'BatchGetItem':
+            return {table: len(request.get('Keys', [])) for table, request in params.get('RequestItems', {}).items()}
+        if operation == 'BatchWriteItem':
+            return {table: len(requests) for table, requests in params.get('RequestItems', {}).items()}
+        if operation in ('TransactGetItems', 'TransactWriteItems'):
+            estimates = {}
+            for entry in params.get('TransactItems', []):
+                for request in entry.values():
+                    table = request.get('TableName')
+                    # Transactions cost twice the units of plain requests
+                    estimates[table] = estimates.get(table, 0) + 2
+            return estimates
+        return {params.get('TableName'): 1}
+
+    def _before_call(self, params, model, context=None, **kwargs):
+        operation = model.name
+        operation_class = 'read' if operation in READ_OPERATIONS else 'write'
+        priority = _priority.get()
+        params.setdefault('ReturnConsumedCapacity', 'TOTAL')
+
+        estimates = self._estimates(operation, params)
+        wait = 0
+        for table, units in estimates.items():
+            buckets = self._table_buckets(table, operation_class) if table else None
+            if buckets is None:
+                continue
+            wait = max(wait, buckets.shared.take(units))
+            if priority == BACKGROUND:
+                wait = max(wait, buckets.background.take(units))
+        if context is not None:
+            context['capacity'] = (operation_class, priority, estimates)
+
+        if wait > 0:
+            metrics.increment(f'dynamodb.limiter.delayed.{priority}')
+            metrics.observe(f'dynamodb.limiter.wait_ms.{priority}', min(wait, self.max_wait) * 1000)
+            time.sleep(min(wait, self.max_wait))
+
+    def _after_call(self, parsed, model, context=None, **kwargs):
+        capacity = (context or {}).get('capacity')
+        if capacity is None:
+            return
+        operation_class, priority, estimates = capacity
+
+        if parsed.get('Error', {}).get('Code') in THROTTLE_ERRORS:
+            # Still throttled after botocore's retries; the caller sees the error
+            metrics.increment(f'dynamodb.throttle_errors.{model.name}')
+            return
+
+        consumed = parsed.get('ConsumedCapacity')
+        if consumed is None:
+            return
+        for entry in consumed if isinstance(consumed, list) else [consumed]:
+            table = entry.get('TableName')
+            units = entry.get('CapacityUnits', 0)
+            metrics.increment(f'dynamodb.consumed.{table}.{operation_class}', units)
+            buckets = self._table_buckets(table, operation_class)
+            if buckets is None:
+                continue
+            extra = units - estimates.get(table, 0)
+            buckets.shared.charge(extra)
+            if priority == BACKGROUND:
+                buckets.background.charge(extra)
+
+    def _on_retry(self, response=None, request_dict=None, **kwargs):
+        if response is None:
+            return None
+        code = response[1].get('Error', {}).get('Code')
+        if code not in THROTTLE_ERRORS:
+            return None
+        capacity = (request_dict or {}).get('context', {}).get('capacity')
+        if capacity is None:
+            metrics.increment('dynamodb.throttled')
+            return None
+        operation_class, priority, estimates = capacity
+        for table in estimates:
+            metrics.increment(f'dynamodb.throttled.{table}.{operation_class}')
+            buckets = self._table_buckets(table, operation_class) if table else None
+            if buckets is not None:
+                buckets.shared.drain()
+        # Leave the retry decision and its backoff to botocore
+        return None
@@ -0,0 +1,161 @@
+import time
+from contextvars import ContextVar
+
+_current_loader = ContextVar('request_loader', default=None)
+
+# BatchGetItem accepts at most 100 keys per call
+BATCH_GET_LIMIT = 100
+
+def _key_id(table: str, key: dict) -> tuple:
+    """Hashable identity of a DynamoDB key, e.g. ('users', (('email', 'S', 'a@b.c'),))"""
+    return (table, tuple(sorted((name, *next(iter(value.items()))) for name, value in key.items())))
+
+def _projection(attributes) -> dict:
+    names = {f'#a{i}': attribute for i, attribute in enumerate(sorted(attributes))}
+    return {'ProjectionExpression': ', '.join(names), 'ExpressionAttributeNames': names}
+
+class RequestLoader:
+    """Per-request cache and batcher for DynamoDB point reads.
+
+    Identical reads within a request are answered from memory, and reads
+    registered with `prefetch` are coalesced into BatchGetItem calls. Writes
+    made through AWSService invalidate the keys they touch.
+    """
+
+    def __init__(self, dynamodb):
+        self.dynamodb = dynamodb
+        self._entries = {}  # key id -> (attributes or None for all, consistent, item or None)
+        self.requested = 0
+        self.calls = 0
+
+    @property
+    def calls_saved(self) -> int:
+        return self.requested - self.calls
+
+    def _cached(self, key_id: tuple, attributes, consistent: bool):
+        entry = self._entries.get(key_id)
+        if entry is None:
+            return False, None
+        cached_attributes, cached_consistent, item = entry
+        if consistent and not cached_consistent:
+            return False, None
+        if item is not None and cached_attributes is not None and attributes is not None \
+                and not set(attributes) <= cached_attributes:
+            return False, None
+        return True, item
+
+    def _store(self, key_id: tuple, attributes, consistent: bool, item):
+        self._entries[key_id] = (set(attributes) if attributes is not None else None, consistent, item)
+
+    def _wanted_attributes(self, key_id: tuple, attributes):
+        """Requested attributes widened with any already cached for the key"""
+        entry = self._entries.get(key_id)
+        if attributes is None or (entry and entry[0] is None):
+            return None
+        return set(attributes) | (entry[0] if entry else set())
+
+    def get_item(self, table: str, key: dict, attributes=None, consistent: bool = False):
+        """Return the raw item (or None) for key, reading DynamoDB only on a cache miss"""
+        self.requested += 1
+        key_id = _key_id(table, key)
+        hit, item = self._cached(key_id, attributes, consistent)
+        if hit:
+            return item
+
+        wanted = self._wanted_attributes(key_id, attributes)
+        params = {'TableName': table, 'Key': key, 'ConsistentRead': consistent}
+        if wanted is not None:
+            params.update(_projection(wanted))
+        self.calls += 1
+        item = self.dynamodb.get_item(**params).get('Item')
+        self._store(key_id, wanted, consistent, item)
+        return item
+
+    def prefetch(self, reads: list):
+        """Load several (table, key, attributes, consistent) reads with BatchGetItem
+
+        Reads that are already cached are skipped; later `get_item` calls for
+        the prefetched keys are answered from memory.
+        """
+        pending = {}
+        for table, key, attributes, consistent in reads:
+            key_id = _key_id(table, key)
+            if self._cached(key_id, attributes, consistent)[0] or key_id in pending:
+                continue
+            pending[key_id] = (table, key, self._wanted_attributes(key_id, attributes), consistent)
+        if not pending:
+            return
+
+        pending = list(pending.items())
+        for start in range(0, len(pending), BATCH_GET_LIMIT):
+            self._batch_get(pending[start:start + BATCH_GET_LIMIT])
+
+    def _batch_get(self, reads: list, max_attempts: int = 5):
+        """Load reads with BatchGetItem, retrying unprocessed keys with backoff
+
+        Keys still unprocessed after max_attempts calls are left uncached, so
+        `get_item` reads them one by one.
+        """
+        request_items = {}
+        by_table = {}
+        for key_id, (table, key, attributes, consistent) in reads:
+            spec = request_items.setdefault(table, {'Keys': [], 'ConsistentRead': False, 'attributes': set()})
+            spec['Keys'].append(key)
+            spec['ConsistentRead'] = spec['ConsistentRead'] or consistent
+            if attributes is None or spec['attributes'] is None:
+                spec['attributes'] = None
+            else:
+                spec['attributes'] |= attributes
+            by_table.setdefault(table, []).append((key_id, key))
+
+        found = {}
+        for table, spec in request_items.items():
+            attributes = spec.pop('attributes')
+            if attributes is not None:
+                # key attributes are needed to match returned items to keys
+                attributes = attributes | set(spec['Keys'][0])
+                spec.update(_projection(attributes))
+            spec['attributes'] = attributes
+
+        unprocessed = {table: {k: v for k, v in spec.items() if k != 'attributes'}
+                       for table, spec in request_items.items()}
+        delay = 0.05
+        for attempt in range(max_attempts):
+            self.calls += 1
+            response = self.dynamodb.batch_get_item(RequestItems=unprocessed)
+            for table, items in response.get('Responses', {}).items():
+                for item in items:
+                    found[_key_id(table, {name: item[name] for name in by_table[table][0][1]})] = item
+            unprocessed = response.get('UnprocessedKeys') or {}
+            if not unprocessed:
+                break
+            time.sleep(delay)
+            delay = min(delay * 2, 1)
+        skipped = {_key_id(table, key) for table, spec in unprocessed.items() for key in spec['Keys']}
+
+        for table, keys in by_table.items():
+            spec = request_items[table]
+            for key_id, _ in keys:
+                if key_id not in skipped:
+                    self._store(key_id, spec['attributes'], spec['ConsistentRead'], found.get(key_id))
+
+    def invalidate(self, table: str, key: dict):
+        self._entries.pop(_key_id(table, key), None)
+
+def current():
+    """The loader for the request being handled, or None outside a request"""
+    return _current_loader.get()
+
+def activate(dynamodb):
+    """Start a fresh loader for the current request; returns a token for `deactivate`"""
+    return _current_loader.set(RequestLoader(dynamodb))
+
+def deactivate(token):
+    """Drop the current request's loader and return it (for its statistics)"""
+    loader = _current_loader.get()
+    try:
+        _current_loader.reset(token)
+    except ValueError:
+        # teardown ran in a different context than before_request
+        _current_loader.set(None)
+    return loader
@@ -0,0 +1,136 @@
+"""Paginated, optionally parallel DynamoDB scans for admin jobs and backfills.
+
+`scan_pages` splits a table into `segments` parallel Segment/TotalSegments
+workers, follows LastEvaluatedKey to the end of each segment and streams the
+pages back through a bounded queue, so memory stays flat however large the
+table is. A single-segment scan runs inline in the caller's thread. An
+optional read capacity cap keeps a full-table job from starving production
+traffic.
+"""
+import contextvars
+import queue
+import threading
+import time
+
+class CapacityThrottle:
+    """Keeps consumed capacity units per second at or under `units_per_second`
+
+    Shared by all the workers of a job; each worker reports what a request
+    consumed and sleeps until the job's average rate is back under the cap.
+    """
+
+    def __init__(self, units_per_second: float):
+        self.units_per_second = units_per_second
+        self._lock = threading.Lock()
+        self._started_at = time.monotonic()
+        self._spent = 0.0
+
+    def spend(self, units: float):
+        with self._lock:
+            self._spent += units
+            wait = self._spent / self.units_per_second - (time.monotonic() - self._started_at)
+        if wait > 0:
+            time.sleep(wait)
+
+class _Done:
+    def __init__(self, segment: int, error: Exception = None):
+        self.segment = segment
+        self.error = error
+
+def _segment_pages(dynamodb, segment: int, segments: int, throttle, start_key, params: dict):
+    """Yield (items, last_evaluated_key) for every page of one segment"""
+    if start_key is None:
+        return
+    request = dict(params)
+    if segments > 1:
+        request.update(Segment=segment, TotalSegments=segments)
+    if throttle:
+        request['ReturnConsumedCapacity'] = 'TOTAL'
+    if start_key:
+        request['ExclusiveStartKey'] = start_key
+    while True:
+        response = dynamodb.scan(**request)
+        if throttle:
+            throttle.spend(response.get('ConsumedCapacity', {}).get('CapacityUnits', 0))
+        last_key = response.get('LastEvaluatedKey')
+        yield response.get('Items', []), last_key
+        if not last_key:
+            return
+        request['ExclusiveStartKey'] = last_key
+
+def scan_pages(dynamodb, segments: int = 1, max_read_units: float = None, start_keys: dict = None, **params):
+    """Yield (segment, items, last_evaluated_key) for every page of a scan
+
+    Args:
+        dynamodb: boto3 DynamoDB client
+        segments: Number of parallel Segment/TotalSegments workers
+        max_read_units: Cap on consumed read capacity units per second, across workers
+        start_keys: ExclusiveStartKey per segment, to resume an interrupted scan;
+            a segment mapped to None is already finished
+        **params: Scan parameters (TableName, FilterExpression, ProjectionExpression...)
+
+    last_evaluated_key is None on a segment's final page. Pages of different
+    segments interleave; within a segment they arrive in order, so recording
+    last_evaluated_key after processing a page is a valid checkpoint.
+    """
+    start_keys = start_keys or {}
+    throttle = CapacityThrottle(max_read_units) if max_read_units else None
+
+    if segments == 1:
+        # A sequential scan runs in the caller's thread
+        for items, last_key in _segment_pages(dynamodb, 0, 1, throttle, start_keys.get(0, {}), params):
+            yield 0, items, last_key
+        return
+
+    pages = queue.Queue(maxsize=segments * 2)
+    stop = threading.Event()
+
+    def put(item):
+        # Give up if the consumer has stopped iterating
+        while not stop.is_set():
+            try:
+                pages.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def work(segment: int):
+        error = None
+        try:
+            for items, last_key in _segment_pages(
+                    dynamodb, segment, segments, throttle, start_keys.get(segment, {}), params):
+                if not put((segment, items, last_key)):
+                    return
+        except Exception as e:
+            error = e
+        finally:
+            put(_Done(segment, error))
+
+    # Workers run in a copy of the caller's context, so they keep its
+    # DynamoDB priority (see services/capacity.py)
+    workers = [
+        threading.Thread(target=contextvars.copy_context().run, args=(work, segment),
+                         name=f'scan-{params.get("TableName")}-{segment}', daemon=True)
+        for segment in range(segments)
+    ]
+    for worker in workers:
+        worker.start()
+
+    running = segments
+    try:
+        while running:
+            page = pages.get()
+            if isinstance(page, _Done):
+                if page.error is not None:
+                    raise page.error
+                running -= 1
+                continue
+            yield page
+    finally:
+        stop.set()
+
+def scan_items(dynamodb, segments: int = 1, max_read_units: float = None, **params):
+    """Yield every item of a scan, following pagination across all segments"""
+    for _, items, _ in scan_pages(dynamodb, segments, max_read_units, **params):
+        yield from items
@@ -0,0 +1,178 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from utils.metrics import metrics
+
+class TaskQueue:
+    """Durable in-process queue for side effects a request doesn't need to wait for.
+
+    Tasks are rows in a local SQLite file, so they survive restarts, and
+    several worker processes can share the file. A worker claims a task with a
+    lease; a task whose worker died is picked up again once the lease lapses.
+    Failed tasks are retried with exponential backoff and kept as 'failed'
+    after `max_attempts`.
+    """
+
+    def __init__(self, path: str, max_attempts: int = 5, lease_seconds: float = 300,
+                 poll_interval: float = 1.0, depth_interval: float = 5.0):
+        self.path = path
+        self.max_attempts = max_attempts
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.depth_interval = depth_interval
+        self._depth_recorded_at = 0
+        self._handlers = {}
+        self._wakeup = threading.Event()
+        self._workers = []
+        self._initialized = False
+        self._init_lock = threading.Lock()
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        if not self._initialized:
+            with self._init_lock:
+                if not self._initialized:
+                    connection.execute('PRAGMA journal_mode=WAL')
+                    connection.execute("""
+                        CREATE TABLE IF NOT EXISTS tasks (
+                            id INTEGER PRIMARY KEY AUTOINCREMENT,
+                            name TEXT NOT NULL,
+                            payload TEXT NOT NULL,
+                            status TEXT NOT NULL DEFAULT 'pending',
+                            attempts INTEGER NOT NULL DEFAULT 0,
+                            run_at REAL NOT NULL,
+                            locked_until REAL NOT NULL DEFAULT 0,
+                            created_at REAL NOT NULL,
+                            last_error TEXT
+                        )
+                    """)
+                    connection.execute('CREATE INDEX IF NOT EXISTS tasks_due ON tasks (status, run_at)')
+                    self._initialized = True
+        return connection
+
+    def register(self, name: str, handler):
+        """Run handler(**payload) for tasks called name; it should raise to be retried"""
+        self._handlers[name] = handler
+
+    def enqueue(self, name: str, delay: float = 0, **payload) -> int:
+        """Persist a task and wake a worker; returns the task id"""
+        now = time.time()
+        connection = self._connect()
+        try:
+            cursor = connection.execute(
+                'INSERT INTO tasks (name, payload, run_at, created_at) VALUES (?, ?, ?, ?)',
+                (name, json.dumps(payload), now + delay, now)
+            )
+            task_id = cursor.lastrowid
+        finally:
+            connection.close()
+        metrics.increment(f'task_queue.enqueued.{name}')
+        self._wakeup.set()
+        return task_id
+
+    def start(self, workers: int = 2):
+        """Start the worker threads (once per process)"""
+        if self._workers:
+            return
+        for i in range(workers):
+            worker = threading.Thread(target=self._work, name=f'task-queue-{i}', daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def _claim(self):
+        """Lease the oldest due task; returns (id, name, payload, attempts, run_at) or None"""
+        now = time.time()
+        connection = self._connect()
+        try:
+            connection.execute('BEGIN IMMEDIATE')
+            row = connection.execute(
+                """SELECT id, name, payload, attempts, run_at FROM tasks
+                   WHERE status = 'pending' AND run_at <= ? AND locked_until <= ?
+                   ORDER BY run_at LIMIT 1""",
+                (now, now)
+            ).fetchone()
+            if row is not None:
+                connection.execute(
+                    'UPDATE tasks SET locked_until = ?, attempts = attempts + 1 WHERE id = ?',
+                    (now + self.lease_seconds, row[0])
+                )
+            connection.execute('COMMIT')
+            return row
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
+        finally:
+            connection.close()
+
+    def _finish(self, task_id: int, name: str, attempts: int, error: Exception = None):
+        connection = self._connect()
+        try:
+            if error is None:
+                connection.execute('DELETE FROM tasks WHERE id = ?', (task_id,))
+                metrics.increment(f'task_queue.completed.{name}')
+            elif attempts >= self.max_attempts:
+                connection.execute(
+                    "UPDATE tasks SET status = 'failed', last_error = ? WHERE id = ?",
+                    (str(error), task_id)
+                )
+                metrics.increment(f'task_queue.failed.{name}')
+            else:
+                connection.execute(
+                    'UPDATE tasks SET run_at = ?, locked_until = 0, last_error = ? WHERE id = ?',
+                    (time.time() + min(2 ** attempts, 300), str(error), task_id)
+                )
+                metrics.increment(f'task_queue.retried.{name}')
+        finally:
+            connection.close()
+
+    def _work(self):
+        while True:
+            if time.monotonic() - self._depth_recorded_at >= self.depth_interval:
+                self._record_depth()
+            try:
+                task = self._claim()
+            except Exception as e:
+                print(f"Error claiming task: {str(e)}")
+                task = None
+            if task is None:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+                continue
+
+            task_id, name, payload, attempts, run_at = task
+            # Lag: how long the task waited past the time it became due
+            metrics.observe('task_queue.lag_ms', max(time.time() - run_at, 0) * 1000)
+            error = None
+            try:
+                handler = self._handlers.get(name)
+                if handler is None:
+                    raise LookupError(f"No handler registered for task {name}")
+                handler(**json.loads(payload))
+            except Exception as e:
+                print(f"Error running task {name} ({task_id}): {str(e)}")
+                error = e
+            try:
+                self._finish(task_id, name, attempts + 1, error)
+            except Exception as e:
+                print(f"Error finishing task {name} ({task_id}): {str(e)}")
+
+    def _record_depth(self):
+        self._depth_recorded_at = time.monotonic()
+        try:
+            connection = self._connect()
+            try:
+                depth, oldest = connection.execute(
+                    "SELECT COUNT(*), MIN(run_at) FROM tasks WHERE status = 'pending'"
+                ).fetchone()
+                failed = connection.execute("SELECT COUNT(*) FROM tasks WHERE status = 'failed'").fetchone()[0]
+            finally:
+                connection.close()
+            metrics.set_gauge('task_queue.depth', depth)
+            metrics.set_gauge('task_queue.failed', failed)
+            metrics.set_gauge('task_queue.oldest_age_seconds', max(time.time() - oldest, 0) if oldest else 0)
+        except Exception as e:
+            print(f"Error reading task queue depth: {str(e)}")
+
+task_queue = TaskQueue(os.environ.get('TASK_QUEUE_PATH', 'tasks.db'))
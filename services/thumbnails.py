@@ -0,0 +1,136 @@
+import io
+import os
+import shutil
+import subprocess
+import tempfile
+from services.task_queue import task_queue
+from utils.metrics import metrics
+
+try:
+    from PIL import Image, ImageOps, features
+except ImportError:  # Pillow is optional, without it only video posters are made
+    Image = None
+
+# Raised for originals that can't be decoded (UnidentifiedImageError is an OSError)
+DECODE_ERRORS = (OSError, ValueError, subprocess.SubprocessError)
+if Image is not None:
+    DECODE_ERRORS += (Image.DecompressionBombError,)
+
+# Thumbnails live under a parallel prefix: {email}/{n}/{step}/{file} -> thumbs/{email}/{n}/{step}/{stem}.webp
+THUMBNAIL_PREFIX = 'thumbs/'
+if Image is not None and features.check('webp'):
+    THUMBNAIL_FORMAT, THUMBNAIL_EXTENSION, THUMBNAIL_CONTENT_TYPE = 'WEBP', '.webp', 'image/webp'
+else:
+    THUMBNAIL_FORMAT, THUMBNAIL_EXTENSION, THUMBNAIL_CONTENT_TYPE = 'JPEG', '.jpg', 'image/jpeg'
+
+FFMPEG = shutil.which('ffmpeg')
+
+def thumbnail_key(key: str) -> str:
+    """S3 key of the thumbnail (or video poster) generated for an original"""
+    return THUMBNAIL_PREFIX + os.path.splitext(key)[0] + THUMBNAIL_EXTENSION
+
+class ThumbnailGenerator:
+    """Writes downscaled previews of uploaded media to S3 from the task queue"""
+
+    def __init__(self, s3_client, bucket_name: str, max_size: int = 480, quality: int = 75):
+        self.s3_client = s3_client
+        self.bucket_name = bucket_name
+        self.max_size = max_size
+        self.quality = quality
+        task_queue.register('thumbnail', self.generate_from_s3)
+
+    def can_generate(self, content_type: str) -> bool:
+        content_type = content_type or ''
+        if content_type.startswith('image/'):
+            return Image is not None
+        if content_type.startswith('video/'):
+            return FFMPEG is not None
+        return False
+
+    def submit(self, key: str, content_type: str, source_key: str = None):
+        """Queue thumbnail generation for an uploaded original
+
+        source_key names an identical earlier upload whose thumbnail can be
+        copied instead of generated.
+        """
+        if not self.can_generate(content_type):
+            metrics.increment('thumbnails.skipped')
+            return None
+        return task_queue.enqueue('thumbnail', key=key, content_type=content_type, source_key=source_key)
+
+    def generate_from_s3(self, key: str, content_type: str, source_key: str = None):
+        """Task handler: fetch the original and generate its thumbnail
+
+        S3 errors propagate so the task is retried; an original that can't
+        be decoded is not.
+        """
+        if source_key:
+            try:
+                self.s3_client.copy_object(
+                    Bucket=self.bucket_name,
+                    Key=thumbnail_key(key),
+                    CopySource={'Bucket': self.bucket_name, 'Key': thumbnail_key(source_key)}
+                )
+                metrics.increment('thumbnails.copied')
+                return
+            except self.s3_client.exceptions.ClientError as e:
+                print(f"No thumbnail to copy for {source_key}, generating: {str(e)}")
+        data = self.s3_client.get_object(Bucket=self.bucket_name, Key=key)['Body'].read()
+        self.generate(key, content_type, data)
+
+    def generate(self, key: str, content_type: str, data: bytes) -> bool:
+        """Build and upload the thumbnail for one original; False if it couldn't be decoded
+
+        Errors uploading the thumbnail propagate, so the task is retried.
+        """
+        try:
+            if content_type.startswith('video/'):
+                thumbnail = self._video_poster(data)
+            else:
+                thumbnail = self._downscale(Image.open(io.BytesIO(data)))
+        except DECODE_ERRORS as e:
+            metrics.increment('thumbnails.failed')
+            print(f"Error generating thumbnail for {key}: {str(e)}")
+            return False
+        self.s3_client.put_object(
+            Bucket=self.bucket_name,
+            Key=thumbnail_key(key),
+            Body=thumbnail,
+            ContentType=THUMBNAIL_CONTENT_TYPE,
+            # The key changes whenever the original does
+            CacheControl='public, max-age=31536000, immutable'
+        )
+        metrics.increment('thumbnails.generated')
+        return True
+
+    def _downscale(self, image) -> bytes:
+        size = (self.max_size, self.max_size)
+        # Let the JPEG decoder skip detail we're about to throw away
+        image.draft('RGB', size)
+        # Phone photos are usually stored sideways with an EXIF rotation
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail(size)
+        if image.mode not in ('RGB', 'RGBA') or (image.mode == 'RGBA' and THUMBNAIL_FORMAT == 'JPEG'):
+            image = image.convert('RGB')
+        output = io.BytesIO()
+        image.save(output, THUMBNAIL_FORMAT, quality=self.quality)
+        return output.getvalue()
+
+    def _video_poster(self, data: bytes) -> bytes:
+        """Extract a representative frame with ffmpeg, already scaled down"""
+        with tempfile.TemporaryDirectory() as directory:
+            source = os.path.join(directory, 'source')
+            poster = os.path.join(directory, 'poster.jpg')
+            with open(source, 'wb') as f:
+                f.write(data)
+            subprocess.run(
+                [FFMPEG, '-v', 'error', '-i', source, '-frames:v', '1',
+                 '-vf', f'thumbnail,scale=w={self.max_size}:h={self.max_size}:force_original_aspect_ratio=decrease',
+                 poster],
+                check=True, timeout=60, stdin=subprocess.DEVNULL, capture_output=True
+            )
+            with open(poster, 'rb') as f:
+                frame = f.read()
+        if Image is not None and THUMBNAIL_FORMAT != 'JPEG':
+            return self._downscale(Image.open(io.BytesIO(frame)))
+        return frame
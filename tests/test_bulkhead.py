@@ -0,0 +1,57 @@
+import pytest
+
+flask = pytest.importorskip('flask')
+
+from flask import Flask, Response, jsonify
+from utils.bulkhead import Bulkhead
+
+@pytest.fixture
+def bulkhead():
+    return Bulkhead('test', limit=1, wait=0, retry_after=3)
+
+@pytest.fixture
+def client(bulkhead):
+    app = Flask(__name__)
+
+    @app.route('/export')
+    @bulkhead
+    def export():
+        return Response((f"row {i}\n" for i in range(3)), mimetype='text/csv')
+
+    @app.route('/clients')
+    @bulkhead
+    def clients():
+        return jsonify({"clients": []})
+
+    @app.route('/broken')
+    @bulkhead
+    def broken():
+        raise RuntimeError('boom')
+
+    return app.test_client()
+
+def test_streamed_response_holds_its_slot_until_closed(client, bulkhead):
+    stream = client.get('/export?company_email=c@example.com', buffered=False)
+    assert stream.status_code == 200
+
+    rejected = client.get('/clients?company_email=c@example.com')
+    assert rejected.status_code == 429
+    assert rejected.headers['Retry-After'] == '3'
+
+    assert b''.join(stream.response) == b'row 0\nrow 1\nrow 2\n'
+    stream.close()
+    assert client.get('/clients?company_email=c@example.com').status_code == 200
+    assert bulkhead._compartments == {}
+
+def test_tenants_have_separate_slots(client):
+    stream = client.get('/export?company_email=c@example.com', buffered=False)
+    assert client.get('/clients?company_email=other@example.com').status_code == 200
+    # The company email is matched case-insensitively
+    assert client.get('/clients?company_email=C@Example.com').status_code == 429
+    stream.close()
+
+def test_slot_is_released_when_the_handler_raises(client, bulkhead):
+    client.application.testing = False
+    assert client.get('/broken?company_email=c@example.com').status_code == 500
+    assert bulkhead._compartments == {}
+    assert client.get('/clients?company_email=c@example.com').status_code == 200
@@ -0,0 +1,78 @@
+from dataclasses import dataclass
+from datetime import datetime
+from decimal import Decimal
+from typing import List, Optional
+import pytest
+from models.codec import attr, codec_for, INT, DECIMAL, BOOL, BINARY, EPOCH_DATETIME, ListOf
+from models.company import Company, Discount
+from models.user import User, Friend
+
+@dataclass(slots=True)
+class Sample:
+    id: str = attr(default='')
+    count: int = attr('n', kind=INT, default=0)
+    ratio: Optional[Decimal] = attr(kind=DECIMAL)
+    active: bool = attr(kind=BOOL, default=False)
+    blob: Optional[bytes] = attr(kind=BINARY)
+    seen_at: Optional[datetime] = attr(kind=EPOCH_DATETIME)
+    groups: List[List[int]] = attr(kind=ListOf(ListOf(INT)), default_factory=list)
+    transient: str = ''  # not stored
+
+def test_round_trip_of_every_kind():
+    codec = codec_for(Sample)
+    sample = Sample(
+        id='a', count=3, ratio=Decimal('0.25'), active=True, blob=b'\x00\x01',
+        seen_at=datetime(2024, 5, 1, 12, 30), groups=[[1, 2], [3]]
+    )
+    item = codec.encode(sample)
+    assert item == {
+        'id': {'S': 'a'},
+        'n': {'N': '3'},
+        'ratio': {'N': '0.25'},
+        'active': {'BOOL': True},
+        'blob': {'B': b'\x00\x01'},
+        'seen_at': {'N': str(int(datetime(2024, 5, 1, 12, 30).timestamp()))},
+        'groups': {'L': [{'L': [{'N': '1'}, {'N': '2'}]}, {'L': [{'N': '3'}]}]}
+    }
+    assert codec.decode(item) == sample
+
+def test_encode_skips_none_and_unstored_fields():
+    item = codec_for(Sample).encode(Sample(id='a', transient='x'))
+    assert 'ratio' not in item and 'blob' not in item and 'transient' not in item
+
+def test_decode_fills_defaults_for_projected_items():
+    company = codec_for(Company).decode({'email': {'S': 'c@example.com'}})
+    assert company.email == 'c@example.com'
+    assert company.name is None
+    assert company.discount == Discount()
+    assert company.hashtags == []
+    # default_factory values are not shared between items
+    assert company.hashtags is not codec_for(Company).decode({'email': {'S': 'd@example.com'}}).hashtags
+
+def test_decode_of_missing_item_is_none():
+    assert codec_for(User).decode(None) is None
+    assert codec_for(User).decode({}) is None
+
+def test_nested_models_and_renamed_attributes():
+    user = User(email='u@example.com', password_hash='h',
+                friends=[[Friend(name='F', email='f@example.com', phone='1')]])
+    item = codec_for(User).encode(user)
+    assert item['password'] == {'S': 'h'}
+    assert item['friends']['L'][0]['L'][0]['M']['phone_number'] == {'S': '1'}
+    assert codec_for(User).decode(item) == user
+
+def test_encode_value_key_and_projection():
+    codec = codec_for(Sample)
+    assert codec.encode_value('count', 7) == {'N': '7'}
+    assert codec.key(id='a', count=1) == {'id': {'S': 'a'}, 'n': {'N': '1'}}
+    assert codec.projection('id', 'count') == {
+        'ProjectionExpression': '#p0, #p1',
+        'ExpressionAttributeNames': {'#p0': 'id', '#p1': 'n'}
+    }
+
+def test_codec_is_cached_per_model():
+    assert codec_for(Company) is codec_for(Company)
+
+def test_non_dataclass_is_rejected():
+    with pytest.raises(TypeError):
+        codec_for(dict)
@@ -0,0 +1,118 @@
+import hashlib
+import pytest
+
+flask = pytest.importorskip('flask')
+
+from flask import Flask, g, jsonify, request
+from models.idempotency_record import IdempotencyRecord
+from utils.idempotency import Idempotency
+
+class FakeStore:
+    """In-memory stand-in for AWSService's idempotency methods"""
+
+    def __init__(self):
+        self.records = {}
+
+    def reserve_idempotency_key(self, record_id, fingerprint, lease_seconds):
+        existing = self.records.get(record_id)
+        if existing is not None:
+            return existing
+        self.records[record_id] = IdempotencyRecord(id=record_id, fingerprint=fingerprint)
+        return None
+
+    def complete_idempotency_key(self, record_id, status_code, body, content_type, ttl_seconds):
+        record = self.records[record_id]
+        record.status = 'completed'
+        record.status_code = status_code
+        record.body = body
+        record.content_type = content_type
+
+    def release_idempotency_key(self, record_id):
+        self.records.pop(record_id, None)
+
+@pytest.fixture
+def store():
+    return FakeStore()
+
+@pytest.fixture
+def calls():
+    return []
+
+@pytest.fixture
+def client(store, calls):
+    app = Flask(__name__)
+    idempotent = Idempotency(store)
+
+    @app.before_request
+    def identify():
+        # What login_required leaves behind for a signed-in user
+        if request.headers.get('X-User'):
+            g.identity = f"user:{request.headers['X-User']}"
+
+    @app.route('/api/submit', methods=['POST'])
+    @idempotent
+    def submit():
+        calls.append(request.get_json())
+        status = request.args.get('status', '201')
+        return jsonify({"submission": len(calls)}), int(status)
+
+    return app.test_client()
+
+def post(client, key='key-1', user='a@example.com', json=None, **params):
+    headers = {'X-User': user} if user else {}
+    if key:
+        headers['Idempotency-Key'] = key
+    return client.post('/api/submit', json=json or {'friends': []}, headers=headers, query_string=params)
+
+def test_retry_replays_the_stored_response(client, calls):
+    first = post(client)
+    retry = post(client)
+    assert len(calls) == 1
+    assert retry.status_code == 201
+    assert retry.get_json() == first.get_json()
+    assert retry.headers['Idempotent-Replayed'] == 'true'
+    assert 'Idempotent-Replayed' not in first.headers
+
+def test_requests_without_a_key_always_run(client, calls):
+    post(client, key=None)
+    post(client, key=None)
+    assert len(calls) == 2
+
+def test_keys_are_scoped_to_the_caller(client, calls):
+    post(client, user='a@example.com')
+    post(client, user='b@example.com')
+    assert len(calls) == 2
+
+def test_key_is_ignored_without_a_caller_identity(client, calls, store):
+    post(client, user=None)
+    post(client, user=None)
+    assert len(calls) == 2
+    assert store.records == {}
+
+def test_reusing_a_key_for_a_different_request_is_rejected(client, calls):
+    post(client, json={'friends': [1]})
+    response = post(client, json={'friends': [2]})
+    assert response.status_code == 422
+    assert len(calls) == 1
+
+def test_request_still_in_progress_gets_a_409(client, calls, store):
+    record_id = 'user:a@example.com#POST /api/submit#key-1'
+    body = b'{"friends":[]}'
+    store.records[record_id] = IdempotencyRecord(id=record_id, fingerprint=hashlib.sha256(body).hexdigest())
+    response = client.post(
+        '/api/submit', data=body, content_type='application/json',
+        headers={'X-User': 'a@example.com', 'Idempotency-Key': 'key-1'}
+    )
+    assert response.status_code == 409
+    assert response.headers['Retry-After'] == '1'
+    assert calls == []
+
+def test_server_errors_are_not_stored(client, calls, store):
+    post(client, status='500')
+    assert store.records == {}
+    post(client)
+    assert len(calls) == 2
+
+def test_over_long_keys_are_rejected(client, calls):
+    assert post(client, key='k' * 256).status_code == 400
+    assert calls == []
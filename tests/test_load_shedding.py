@@ -0,0 +1,79 @@
+import pytest
+
+flask = pytest.importorskip('flask')
+
+from flask import Flask
+from utils.load_shedding import AdaptiveLimit, init_load_shedding, PRIORITY_SHARES, CRITICAL, LOW
+
+def saturate(limiter: AdaptiveLimit):
+    """Fill the limit so observations are allowed to move it"""
+    while limiter.acquire():
+        pass
+
+def test_first_sample_only_sets_the_baseline():
+    limiter = AdaptiveLimit(initial=20)
+    limiter.observe(0.1)
+    assert limiter.limit == 20
+
+def test_limit_grows_while_saturated_at_steady_latency():
+    limiter = AdaptiveLimit(initial=20, max_limit=200)
+    saturate(limiter)
+    for _ in range(20):
+        limiter.observe(0.1)
+    assert 25 < limiter.limit <= 200
+
+def test_limit_holds_while_mostly_idle():
+    limiter = AdaptiveLimit(initial=20)
+    for _ in range(50):
+        limiter.observe(0.1)
+    assert limiter.limit == 20
+
+def test_limit_shrinks_when_latency_rises():
+    limiter = AdaptiveLimit(initial=100, min_limit=4)
+    saturate(limiter)
+    for _ in range(50):
+        limiter.observe(0.1)
+    grown = limiter.limit
+    for _ in range(50):
+        limiter.observe(1.0)
+    assert limiter.limit < grown
+
+def test_limit_stays_within_its_bounds():
+    limiter = AdaptiveLimit(initial=10, min_limit=8, max_limit=12)
+    saturate(limiter)
+    for _ in range(200):
+        limiter.observe(0.1)
+    assert limiter.limit == 12
+    for latency in range(1, 200):
+        limiter.observe(float(latency))
+    assert limiter.limit == 8
+
+def test_acquire_respects_the_priority_share():
+    limiter = AdaptiveLimit(initial=10)
+    admitted = 0
+    while limiter.acquire(PRIORITY_SHARES[LOW]):
+        admitted += 1
+    assert admitted == 5
+    # Higher priorities can still use the rest
+    assert limiter.acquire(PRIORITY_SHARES[CRITICAL])
+    limiter.release()
+    assert limiter.in_flight == 5
+
+def test_low_priority_requests_are_shed_first():
+    app = Flask(__name__)
+    limiter = AdaptiveLimit(initial=4, min_limit=4)
+    init_load_shedding(app, limiter)
+
+    @app.route('/api/read', methods=['GET', 'POST'])
+    def read():
+        return 'ok'
+
+    client = app.test_client()
+    # Two requests are already in flight elsewhere
+    assert limiter.acquire() and limiter.acquire()
+    response = client.get('/api/read')
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
+    assert client.post('/api/read').status_code == 200
+    # The admitted request gave its slot back
+    assert limiter.in_flight == 2
@@ -0,0 +1,38 @@
+from utils import media_tokens
+from utils.media_tokens import generate_media_token, verify_media_token
+
+SECRET = 'test-secret'
+KEY = 'user@example.com/0/step1/20240501_120000_12345678.jpg'
+
+def test_token_grants_its_key():
+    assert verify_media_token(generate_media_token(KEY, SECRET), SECRET) == KEY
+
+def test_token_signed_with_another_secret_is_rejected():
+    assert verify_media_token(generate_media_token(KEY, 'other-secret'), SECRET) is None
+
+def test_tampered_key_or_expiry_is_rejected():
+    encoded_key, expires_at, signature = generate_media_token(KEY, SECRET).split('.')
+    other_key = generate_media_token('someone@example.com/0/step1/a.jpg', SECRET).split('.')[0]
+    assert verify_media_token(f"{other_key}.{expires_at}.{signature}", SECRET) is None
+    assert verify_media_token(f"{encoded_key}.{int(expires_at) + 3600}.{signature}", SECRET) is None
+
+def test_malformed_tokens_are_rejected():
+    for token in ('', 'abc', 'a.b.c', 'a.1.sig.extra', '!!!.1.sig'):
+        assert verify_media_token(token, SECRET) is None
+
+def test_token_expires(monkeypatch):
+    now = 1_700_000_000
+    monkeypatch.setattr(media_tokens.time, 'time', lambda: now)
+    token = generate_media_token(KEY, SECRET, expires_in=3600)
+
+    # Valid for between one and two periods after it was issued
+    monkeypatch.setattr(media_tokens.time, 'time', lambda: now + 3600)
+    assert verify_media_token(token, SECRET) == KEY
+    monkeypatch.setattr(media_tokens.time, 'time', lambda: now + 2 * 3600 + 1)
+    assert verify_media_token(token, SECRET) is None
+
+def test_token_is_stable_within_a_period(monkeypatch):
+    monkeypatch.setattr(media_tokens.time, 'time', lambda: 1_700_000_000)
+    first = generate_media_token(KEY, SECRET, expires_in=3600)
+    monkeypatch.setattr(media_tokens.time, 'time', lambda: 1_700_000_000 - 1_700_000_000 % 3600 + 3599)
+    assert generate_media_token(KEY, SECRET, expires_in=3600) == first
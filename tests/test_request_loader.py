@@ -0,0 +1,91 @@
+from services import request_loader
+from services.request_loader import RequestLoader
+
+def key(email):
+    return {'email': {'S': email}}
+
+def item(email, **attributes):
+    return {'email': {'S': email}, **{name: {'S': value} for name, value in attributes.items()}}
+
+class FakeDynamoDB:
+    """Serves items from a dict, leaving the first `unprocessed_rounds` batches unprocessed"""
+
+    def __init__(self, items, unprocessed_rounds=0):
+        self.items = items
+        self.unprocessed_rounds = unprocessed_rounds
+        self.get_calls = []
+        self.batch_calls = []
+
+    def get_item(self, TableName, Key, **params):
+        self.get_calls.append(Key)
+        found = self.items.get(Key['email']['S'])
+        return {'Item': found} if found else {}
+
+    def batch_get_item(self, RequestItems):
+        self.batch_calls.append(RequestItems)
+        if len(self.batch_calls) <= self.unprocessed_rounds:
+            return {'Responses': {}, 'UnprocessedKeys': RequestItems}
+        responses = {}
+        for table, spec in RequestItems.items():
+            responses[table] = [self.items[k['email']['S']] for k in spec['Keys'] if k['email']['S'] in self.items]
+        return {'Responses': responses}
+
+def test_repeated_reads_hit_the_cache():
+    dynamodb = FakeDynamoDB({'a': item('a', name='A')})
+    loader = RequestLoader(dynamodb)
+    assert loader.get_item('users', key('a')) == item('a', name='A')
+    assert loader.get_item('users', key('a')) == item('a', name='A')
+    assert len(dynamodb.get_calls) == 1
+    assert loader.calls_saved == 1
+
+def test_missing_items_are_cached_until_invalidated():
+    dynamodb = FakeDynamoDB({})
+    loader = RequestLoader(dynamodb)
+    assert loader.get_item('users', key('a')) is None
+    dynamodb.items['a'] = item('a')
+    assert loader.get_item('users', key('a')) is None
+    loader.invalidate('users', key('a'))
+    assert loader.get_item('users', key('a')) == item('a')
+
+def test_consistent_read_bypasses_an_eventually_consistent_entry():
+    dynamodb = FakeDynamoDB({'a': item('a')})
+    loader = RequestLoader(dynamodb)
+    loader.get_item('users', key('a'))
+    loader.get_item('users', key('a'), consistent=True)
+    loader.get_item('users', key('a'))
+    assert len(dynamodb.get_calls) == 2
+
+def test_prefetch_batches_reads():
+    dynamodb = FakeDynamoDB({'a': item('a'), 'b': item('b')})
+    loader = RequestLoader(dynamodb)
+    loader.prefetch([('users', key(email), None, False) for email in ('a', 'b', 'c')])
+    assert len(dynamodb.batch_calls) == 1
+    assert loader.get_item('users', key('b')) == item('b')
+    assert loader.get_item('users', key('c')) is None
+    assert dynamodb.get_calls == []
+
+def test_unprocessed_keys_are_retried(monkeypatch):
+    monkeypatch.setattr(request_loader.time, 'sleep', lambda seconds: None)
+    dynamodb = FakeDynamoDB({'a': item('a')}, unprocessed_rounds=2)
+    loader = RequestLoader(dynamodb)
+    loader.prefetch([('users', key('a'), None, False)])
+    assert len(dynamodb.batch_calls) == 3
+    assert loader.get_item('users', key('a')) == item('a')
+    assert dynamodb.get_calls == []
+
+def test_keys_left_unprocessed_fall_back_to_point_reads(monkeypatch):
+    monkeypatch.setattr(request_loader.time, 'sleep', lambda seconds: None)
+    dynamodb = FakeDynamoDB({'a': item('a')}, unprocessed_rounds=100)
+    loader = RequestLoader(dynamodb)
+    loader.prefetch([('users', key('a'), None, False)])
+    assert len(dynamodb.batch_calls) == 5
+    assert loader.get_item('users', key('a')) == item('a')
+    assert len(dynamodb.get_calls) == 1
+
+def test_activate_and_deactivate_scope_the_loader():
+    assert request_loader.current() is None
+    token = request_loader.activate(FakeDynamoDB({}))
+    loader = request_loader.current()
+    assert isinstance(loader, RequestLoader)
+    assert request_loader.deactivate(token) is loader
+    assert request_loader.current() is None
@@ -0,0 +1,84 @@
+import json
+import threading
+import pytest
+from services import task_queue as task_queue_module
+from services.task_queue import TaskQueue
+
+class Clock:
+    def __init__(self, now=1_700_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(task_queue_module.time, 'time', clock)
+    return clock
+
+@pytest.fixture
+def queue(tmp_path):
+    return TaskQueue(str(tmp_path / 'tasks.db'), max_attempts=3, lease_seconds=60)
+
+def status_of(queue, task_id):
+    connection = queue._connect()
+    try:
+        return connection.execute('SELECT status, attempts FROM tasks WHERE id = ?', (task_id,)).fetchone()
+    finally:
+        connection.close()
+
+def test_claimed_task_is_leased(queue, clock):
+    task_id = queue.enqueue('email', to='a@example.com')
+    claimed = queue._claim()
+    assert claimed[0] == task_id and claimed[1] == 'email'
+    assert json.loads(claimed[2]) == {'to': 'a@example.com'}
+    # Nobody else gets it while the lease holds
+    assert queue._claim() is None
+
+def test_task_of_a_dead_worker_is_reclaimed_after_the_lease(queue, clock):
+    task_id = queue.enqueue('email')
+    queue._claim()
+    clock.now += 61
+    claimed = queue._claim()
+    assert claimed[0] == task_id
+    assert claimed[3] == 1  # attempts before this claim
+
+def test_delayed_task_waits_until_due(queue, clock):
+    queue.enqueue('email', delay=30)
+    assert queue._claim() is None
+    clock.now += 30
+    assert queue._claim() is not None
+
+def test_completed_task_is_deleted(queue, clock):
+    task_id = queue.enqueue('email')
+    queue._claim()
+    queue._finish(task_id, 'email', 1)
+    assert status_of(queue, task_id) is None
+
+def test_failed_task_is_retried_with_backoff_then_kept_as_failed(queue, clock):
+    task_id = queue.enqueue('email')
+    for attempt in (1, 2):
+        assert queue._claim()[0] == task_id
+        queue._finish(task_id, 'email', attempt, RuntimeError('boom'))
+        assert queue._claim() is None
+        clock.now += 2 ** attempt
+    assert queue._claim()[0] == task_id
+    queue._finish(task_id, 'email', 3, RuntimeError('boom'))
+    assert status_of(queue, task_id) == ('failed', 3)
+    clock.now += 3600
+    assert queue._claim() is None
+
+def test_workers_run_registered_handlers(queue):
+    done = threading.Event()
+    received = []
+
+    def handler(**payload):
+        received.append(payload)
+        done.set()
+
+    queue.register('email', handler)
+    queue.start(workers=1)
+    queue.enqueue('email', to='a@example.com')
+    assert done.wait(5)
+    assert received == [{'to': 'a@example.com'}]
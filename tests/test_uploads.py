@@ -0,0 +1,76 @@
+import hashlib
+import io
+import pytest
+
+flask = pytest.importorskip('flask')
+
+from flask import Flask, jsonify, request
+from utils.uploads import init_upload_limits, sniff_mime_type, uploaded_digest, uploaded_type, UploadPolicy
+
+JPEG = b'\xff\xd8\xff\xe0' + b'\x00' * 60
+PNG = b'\x89PNG\r\n\x1a\n' + b'\x00' * 60
+MP4 = b'\x00\x00\x00\x18ftypisom' + b'\x00' * 60
+
+@pytest.mark.parametrize('head, expected', [
+    (JPEG, 'image/jpeg'),
+    (PNG, 'image/png'),
+    (b'GIF89a' + b'\x00' * 10, 'image/gif'),
+    (b'RIFF\x00\x00\x00\x00WEBPVP8 ', 'image/webp'),
+    (b'\x00\x00\x00\x18ftypheic\x00\x00\x00\x00', 'image/heic'),
+    (b'\x00\x00\x00\x14ftypqt  \x00\x00\x00\x00', 'video/quicktime'),
+    (MP4, 'video/mp4'),
+    (b'\x1a\x45\xdf\xa3' + b'\x00' * 12, 'video/webm'),
+    (b'%PDF-1.7\n' + b'\x00' * 8, None),
+    (b'', None),
+])
+def test_sniff_mime_type(head, expected):
+    assert sniff_mime_type(head) == expected
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    init_upload_limits(app, {
+        'upload': UploadPolicy(max_request=1024, max_sizes={'image': 100, 'video': 500})
+    })
+
+    @app.route('/upload', methods=['POST'])
+    def upload():
+        file = request.files['file']
+        data = file.read()
+        return jsonify({
+            "type": uploaded_type(file),
+            "digest": uploaded_digest(file),
+            "size": len(data)
+        })
+
+    return app.test_client()
+
+def upload(client, data, content_type='application/octet-stream'):
+    return client.post('/upload', data={'file': (io.BytesIO(data), 'file.bin', content_type)})
+
+def test_accepted_file_is_typed_from_its_bytes(client):
+    response = upload(client, JPEG, content_type='video/mp4')
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['type'] == 'image/jpeg'
+    assert body['digest'] == [hashlib.sha256(JPEG).hexdigest(), len(JPEG)]
+    assert body['size'] == len(JPEG)
+
+def test_short_file_is_checked_when_complete(client):
+    assert upload(client, JPEG[:8]).get_json()['type'] == 'image/jpeg'
+    assert upload(client, b'hello').status_code == 415
+
+def test_wrong_type_is_rejected(client):
+    response = upload(client, b'%PDF-1.7\n' + b'\x00' * 40, content_type='image/jpeg')
+    assert response.status_code == 415
+
+def test_empty_file_is_rejected(client):
+    assert upload(client, b'', content_type='image/jpeg').status_code == 415
+
+def test_file_over_its_category_limit_is_rejected(client):
+    assert upload(client, JPEG + b'\x00' * 100).status_code == 413
+    # Videos have a larger limit
+    assert upload(client, MP4 + b'\x00' * 100).status_code == 200
+
+def test_request_over_the_limit_is_rejected(client):
+    assert upload(client, MP4 + b'\x00' * 2000).status_code == 413
@@ -1,6 +1,6 @@
 import jwt
 from functools import wraps
-from flask import request, jsonify, current_app
+from flask import request, jsonify, current_app, g
 from datetime import datetime, timedelta
 
 def generate_token(email: str) -> str:
@@ -11,35 +11,68 @@ def generate_token(email: str) -> str:
         algorithm='HS256'
     )
 
-def get_user_from_request():
-    """Get user email from request headers"""
+def _verify_token():
+    """Verify the request's bearer token; returns (user, identity) or (None, None)
+
+    user is what get_user_from_request returns. identity names who the token
+    belongs to, 'user:<email>' or 'company:<email>', for scoping per-caller
+    state; it is None for a company token without an email claim.
+    """
+    token = None
     try:
         auth_header = request.headers.get('Authorization')
         if not auth_header:
-            return None
+            return None, None
         
         token = auth_header.split(' ')[1]  # Bearer <token>
         payload = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=['HS256'])
 
-        return payload.get('email')
+        email = payload.get('email')
+        return email, f"user:{email}" if email else None
     except Exception as e:
+        if token is None:
+            return None, None
         # check if it company
         import requests
         res = requests.get(f"https://smartreferralhub.com/?rest_route=/simple-jwt-login/v1/auth/validate&JWT={token}")
         
         if not res.ok:
-            return None
+            return None, None
         
         payload = res.json()
-        
-        return payload.get('success')
+
+        # The site has just validated the token, so its claims can be trusted
+        try:
+            claims = jwt.decode(token, options={'verify_signature': False})
+        except Exception:
+            claims = {}
+        data = payload.get('data')
+        user = data.get('user') if isinstance(data, dict) else None
+        user = user if isinstance(user, dict) else {}
+        email = claims.get('email') or user.get('user_email')
+        return payload.get('success'), f"company:{email.lower()}" if isinstance(email, str) and email else None
+
+def get_user_from_request():
+    """Get user email from request headers"""
+    if 'user_email' in g:
+        return g.user_email
+    return _verify_token()[0]
+
+def get_request_identity():
+    """Identity of the caller ('user:<email>' or 'company:<email>'), or None"""
+    if 'identity' in g:
+        return g.identity
+    return _verify_token()[1]
 
 def login_required(f):
     """Decorator to protect routes that require authentication"""
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        user_email = get_user_from_request()
+        user_email, identity = _verify_token()
         if not user_email:
             return jsonify({"error": "Authentication required"}), 401
+        # Remembered so decorators further in don't verify the token again
+        g.user_email = user_email
+        g.identity = identity
         return f(*args, **kwargs)
     return decorated_function
@@ -0,0 +1,96 @@
+import threading
+import time
+from functools import wraps
+from flask import request, jsonify, current_app
+from utils.auth import get_request_identity
+from utils.metrics import metrics
+
+def company_tenant():
+    """Tenant of a request: the company it's about, else the caller named by the token
+
+    g.user_email is not used: it is True for every company token. A request
+    with neither falls back to its client address, never a shared key.
+    """
+    company_email = request.args.get('company_email')
+    if company_email:
+        return f"company:{company_email.strip().lower()}"
+    return get_request_identity() or f"addr:{request.remote_addr}"
+
+class _Compartment:
+    def __init__(self):
+        self.active = 0
+        self.waiting = 0
+
+class Bulkhead:
+    """Decorator capping how many requests one tenant can run at once on expensive endpoints.
+
+    A request over the tenant's `limit` waits up to `wait` seconds for a slot
+    and is then rejected with a 429 and Retry-After, so a single tenant can't
+    occupy every worker thread. Every endpoint decorated with the same
+    instance shares the tenant's slots. Streamed responses hold their slot
+    until the stream is closed.
+    """
+
+    def __init__(self, name: str, limit: int = 2, wait: float = 0.5, retry_after: int = 2, tenant=company_tenant):
+        self.name = name
+        self.limit = limit
+        self.wait = wait
+        self.retry_after = retry_after
+        self.tenant = tenant
+        self._compartments = {}
+        self._condition = threading.Condition()
+
+    def _acquire(self, tenant: str) -> bool:
+        deadline = time.monotonic() + self.wait
+        with self._condition:
+            compartment = self._compartments.setdefault(tenant, _Compartment())
+            compartment.waiting += 1
+            try:
+                while compartment.active >= self.limit:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return False
+                    self._condition.wait(remaining)
+                compartment.active += 1
+                return True
+            finally:
+                compartment.waiting -= 1
+                self._discard_if_idle(tenant, compartment)
+
+    def _release(self, tenant: str):
+        with self._condition:
+            compartment = self._compartments[tenant]
+            compartment.active -= 1
+            self._discard_if_idle(tenant, compartment)
+            self._condition.notify_all()
+
+    def _discard_if_idle(self, tenant: str, compartment: _Compartment):
+        if not compartment.active and not compartment.waiting:
+            self._compartments.pop(tenant, None)
+        metrics.set_gauge(f'bulkhead.{self.name}.tenants', len(self._compartments))
+
+    def __call__(self, f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            tenant = self.tenant()
+            started = time.monotonic()
+            if not self._acquire(tenant):
+                metrics.increment(f'bulkhead.{self.name}.rejected')
+                response = jsonify({"error": "Too many concurrent requests for this company, please retry shortly"})
+                response.status_code = 429
+                response.headers['Retry-After'] = str(self.retry_after)
+                return response
+            metrics.observe(f'bulkhead.{self.name}.wait_ms', (time.monotonic() - started) * 1000)
+
+            try:
+                response = current_app.make_response(f(*args, **kwargs))
+            except Exception:
+                self._release(tenant)
+                raise
+            if response.is_streamed:
+                # Hold the slot while the body is being generated
+                response.call_on_close(lambda: self._release(tenant))
+            else:
+                self._release(tenant)
+            return response
+        return decorated_function
@@ -0,0 +1,141 @@
+import time
+import zlib
+from flask import request
+from utils.metrics import metrics
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip is always available
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = {
+    'application/json',
+    'application/x-ndjson',
+    'text/csv',
+    'text/plain',
+    'text/html'
+}
+
+# Suffix appended to a strong ETag for each content coding, since the
+# compressed bytes are a different representation of the resource
+ETAG_SUFFIXES = {'gzip': '-gzip', 'br': '-br'}
+
+# Streamed bodies are buffered to at least this size before each flush
+STREAM_FLUSH_SIZE = 16 * 1024
+
+class _Compressor:
+    """Uniform incremental interface over zlib (gzip) and brotli"""
+
+    def __init__(self, encoding: str, level: int):
+        self.encoding = encoding
+        if encoding == 'br':
+            self._obj = brotli.Compressor(quality=min(level, 11))
+        else:
+            self._obj = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        if self.encoding == 'br':
+            return self._obj.process(data) + self._obj.flush()
+        return self._obj.compress(data) + self._obj.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        if self.encoding == 'br':
+            return self._obj.finish()
+        return self._obj.flush()
+
+def _choose_encoding():
+    accepted = request.accept_encodings
+    if brotli is not None and accepted['br']:
+        return 'br'
+    if accepted['gzip']:
+        return 'gzip'
+    return None
+
+def _record(encoding: str, bytes_in: int, bytes_out: int, cpu_seconds: float):
+    metrics.increment(f'compression.responses.{encoding}')
+    metrics.increment('compression.bytes_in', bytes_in)
+    metrics.increment('compression.bytes_out', bytes_out)
+    if bytes_in:
+        metrics.observe('compression.ratio', bytes_out / bytes_in)
+    metrics.observe('compression.cpu_ms', cpu_seconds * 1000)
+
+def _compress_stream(chunks, encoding: str, level: int, flush_size: int = STREAM_FLUSH_SIZE):
+    """Compress a streamed body, flushing once at least flush_size bytes have
+    been produced so the client keeps receiving data without every small
+    chunk (e.g. one CSV row) paying for its own flush."""
+    compressor = _Compressor(encoding, level)
+    bytes_in = bytes_out = 0
+    cpu_seconds = 0.0
+    pending = []
+    pending_size = 0
+
+    def compress_pending():
+        nonlocal cpu_seconds, bytes_out, pending_size
+        started = time.thread_time()
+        data = compressor.compress(b''.join(pending))
+        cpu_seconds += time.thread_time() - started
+        bytes_out += len(data)
+        pending.clear()
+        pending_size = 0
+        return data
+
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode()
+            bytes_in += len(chunk)
+            pending.append(chunk)
+            pending_size += len(chunk)
+            if pending_size >= flush_size:
+                data = compress_pending()
+                if data:
+                    yield data
+        data = compress_pending() if pending else b''
+        tail = compressor.finish()
+        bytes_out += len(tail)
+        yield data + tail
+    finally:
+        if hasattr(chunks, 'close'):
+            chunks.close()
+        _record(encoding, bytes_in, bytes_out, cpu_seconds)
+
+def init_compression(app, min_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 5):
+    """Register an after_request hook compressing text responses above min_size"""
+
+    @app.after_request
+    def compress_response(response):
+        if (response.status_code < 200 or response.status_code in (204, 206, 304)
+                or response.direct_passthrough
+                or 'Content-Encoding' in response.headers
+                or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+            return response
+
+        response.vary.add('Accept-Encoding')
+        encoding = _choose_encoding()
+        if not encoding:
+            return response
+        level = brotli_quality if encoding == 'br' else gzip_level
+
+        etag, weak = response.get_etag()
+        if etag:
+            response.set_etag(etag + ETAG_SUFFIXES[encoding], weak)
+
+        if response.is_streamed:
+            response.response = _compress_stream(response.response, encoding, level)
+            response.headers.pop('Content-Length', None)
+        else:
+            data = response.get_data()
+            if len(data) < min_size:
+                if etag:
+                    response.set_etag(etag, weak)
+                return response
+            started = time.thread_time()
+            compressor = _Compressor(encoding, level)
+            compressed = compressor.compress(data) + compressor.finish()
+            _record(encoding, len(data), len(compressed), time.thread_time() - started)
+            response.set_data(compressed)
+
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+    return compress_response
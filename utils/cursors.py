@@ -0,0 +1,18 @@
+import base64
+import binascii
+import json
+
+def encode_cursor(last_evaluated_key: dict) -> str:
+    """Opaque pagination cursor for a DynamoDB LastEvaluatedKey"""
+    data = json.dumps(last_evaluated_key, separators=(',', ':'), sort_keys=True).encode()
+    return base64.urlsafe_b64encode(data).decode().rstrip('=')
+
+def decode_cursor(cursor: str) -> dict:
+    """ExclusiveStartKey for a cursor from encode_cursor; raises ValueError if malformed"""
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (binascii.Error, UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise ValueError("Invalid cursor") from e
+    if not isinstance(key, dict):
+        raise ValueError("Invalid cursor")
+    return key
@@ -0,0 +1,125 @@
+import hashlib
+import threading
+import time
+from flask import request, current_app, g
+from utils.compression import ETAG_SUFFIXES
+
+class ETagCache:
+    """Remembers the last ETag served for a resource.
+
+    Lets a conditional GET be answered with a 304 before the DynamoDB or S3
+    work behind the resource happens. Each remembered ETag is tagged with the
+    resource's version from `store` (one small consistent read), and writes
+    bump that version for every worker, so no worker answers 304 for data
+    another worker has changed. Without a store versions are always 0 and
+    only this worker's invalidations and `ttl` apply.
+
+    The version covers the first two parts of a key, e.g. ('links', company)
+    for ('links', company, step).
+    """
+
+    def __init__(self, ttl: float = 30, store=None):
+        self.ttl = ttl
+        self.store = store
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _resource(key: tuple) -> str:
+        return '#'.join(str(part) for part in key[:2])
+
+    def current_version(self, key: tuple):
+        """Version of key's resource, or None if it can't be read"""
+        if self.store is None:
+            return 0
+        return self.store.get_cache_version(self._resource(key))
+
+    def get(self, key: tuple, version: int):
+        with self._lock:
+            entry = self._entries.get(key)
+            if not entry:
+                return None
+            etag, entry_version, expires_at = entry
+            if expires_at < time.monotonic() or entry_version != version:
+                del self._entries[key]
+                return None
+            return etag
+
+    def set(self, key: tuple, etag: str, version: int):
+        with self._lock:
+            self._entries[key] = (etag, version, time.monotonic() + self.ttl)
+
+    def invalidate(self, *prefix):
+        """Drop every entry whose key starts with the given parts, in every worker"""
+        size = len(prefix)
+        with self._lock:
+            for key in [k for k in self._entries if k[:size] == prefix]:
+                del self._entries[key]
+        if self.store is not None:
+            self.store.bump_cache_version(self._resource(prefix))
+
+etag_cache = ETagCache()
+
+def compute_etag(data: bytes) -> str:
+    """Strong ETag derived from the response body"""
+    return hashlib.sha256(data).hexdigest()[:32]
+
+def _set_cache_headers(response, max_age: int, private: bool):
+    if private:
+        response.cache_control.private = True
+    else:
+        response.cache_control.public = True
+    response.cache_control.max_age = max_age
+    if not max_age:
+        # Revalidate on every use; the 304 path is cheap
+        response.cache_control.no_cache = True
+    response.cache_control.must_revalidate = True
+    response.vary.add('Origin')
+    return response
+
+def _client_etag(etag: str):
+    """Return the variant of etag (plain or content-coding suffixed) held by the client"""
+    for candidate in [etag] + [etag + suffix for suffix in ETAG_SUFFIXES.values()]:
+        if request.if_none_match.contains(candidate):
+            return candidate
+    return None
+
+def _not_modified(etag: str, max_age: int, private: bool):
+    response = current_app.response_class(status=304)
+    response.set_etag(etag)
+    return _set_cache_headers(response, max_age, private)
+
+def _versions() -> dict:
+    if 'etag_versions' not in g:
+        g.etag_versions = {}
+    return g.etag_versions
+
+def not_modified_response(key: tuple, max_age: int = 60, private: bool = False):
+    """Return a 304 response if the client already holds the cached ETag for key
+
+    Reads the resource's version before the handler builds its body; the
+    ETag conditional_response remembers is tagged with that version, so a
+    write that lands in between can't be hidden behind the older version.
+    """
+    version = _versions()[key] = etag_cache.current_version(key)
+    if version is None:
+        return None
+    etag = etag_cache.get(key, version)
+    client_etag = etag and _client_etag(etag)
+    if not client_etag:
+        return None
+    return _not_modified(client_etag, max_age, private)
+
+def conditional_response(response, key: tuple, max_age: int = 60, private: bool = False):
+    """Tag a 200 JSON response with an ETag and Cache-Control, remember the ETag
+    for key and downgrade to 304 if the client's copy is still current."""
+    etag = compute_etag(response.get_data())
+    versions = _versions()
+    version = versions[key] if key in versions else etag_cache.current_version(key)
+    if version is not None:
+        etag_cache.set(key, etag, version)
+    client_etag = _client_etag(etag)
+    if client_etag:
+        return _not_modified(client_etag, max_age, private)
+    response.set_etag(etag)
+    return _set_cache_headers(response, max_age, private)
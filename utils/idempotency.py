@@ -0,0 +1,91 @@
+import hashlib
+from functools import wraps
+from flask import request, jsonify, current_app
+from utils.auth import get_request_identity
+from utils.metrics import metrics
+
+# Responses larger than this are not stored (DynamoDB items are capped at 400 KB)
+MAX_STORED_BODY = 256 * 1024
+
+class Idempotency:
+    """Decorator making a mutating endpoint safe to retry with an Idempotency-Key header.
+
+    The first request with a key runs the handler and stores its response;
+    retries with the same key get the stored response back without running
+    the handler again. Keys are scoped to the user and endpoint. Requests
+    without the header are handled as usual.
+    """
+
+    def __init__(self, store, ttl: int = 86400, lease: int = 60):
+        self.store = store
+        self.ttl = ttl
+        self.lease = lease
+
+    def __call__(self, f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            key = request.headers.get('Idempotency-Key')
+            if not key:
+                return f(*args, **kwargs)
+            if len(key) > 255:
+                return jsonify({"error": "Idempotency-Key must be at most 255 characters"}), 400
+
+            # Company tokens resolve to True in g.user_email, so records are
+            # scoped by who the token actually names
+            identity = get_request_identity()
+            if not identity:
+                print("Idempotency-Key ignored: request has no caller identity to scope it to")
+                return f(*args, **kwargs)
+            record_id = f"{identity}#{request.method} {request.path}#{key}"
+            fingerprint = hashlib.sha256(request.get_data()).hexdigest()
+            try:
+                existing = self.store.reserve_idempotency_key(record_id, fingerprint, self.lease)
+            except Exception as e:
+                # Without the store, behave as if no key was sent
+                print(f"Error reserving idempotency key: {str(e)}")
+                return f(*args, **kwargs)
+
+            if existing is not None:
+                return self._replay(existing, fingerprint)
+
+            try:
+                response = current_app.make_response(f(*args, **kwargs))
+            except Exception:
+                self._release(record_id)
+                raise
+
+            body = None if response.is_streamed else response.get_data()
+            # Server errors are worth retrying for real, so they aren't stored
+            if response.status_code >= 500 or body is None or len(body) > MAX_STORED_BODY:
+                self._release(record_id)
+                return response
+            try:
+                self.store.complete_idempotency_key(
+                    record_id, response.status_code, body, response.mimetype, self.ttl
+                )
+            except Exception as e:
+                print(f"Error storing idempotent response: {str(e)}")
+                self._release(record_id)
+            return response
+        return decorated_function
+
+    def _replay(self, record, fingerprint: str):
+        if record.fingerprint != fingerprint:
+            metrics.increment('idempotency.mismatched')
+            return jsonify({"error": "Idempotency-Key was already used with a different request"}), 422
+        if record.status != 'completed':
+            metrics.increment('idempotency.in_progress')
+            response = jsonify({"error": "A request with this Idempotency-Key is still in progress"})
+            response.status_code = 409
+            response.headers['Retry-After'] = '1'
+            return response
+        metrics.increment('idempotency.replayed')
+        response = current_app.response_class(record.body, status=record.status_code, mimetype=record.content_type)
+        response.headers['Idempotent-Replayed'] = 'true'
+        return response
+
+    def _release(self, record_id: str):
+        try:
+            self.store.release_idempotency_key(record_id)
+        except Exception as e:
+            print(f"Error releasing idempotency key: {str(e)}")
@@ -0,0 +1,72 @@
+import json
+import os
+from datetime import date, datetime
+from decimal import Decimal
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # orjson is optional, the stdlib encoder is the fallback
+    orjson = None
+
+def _default(obj):
+    """Encode the types DynamoDB and our handlers produce that JSON lacks"""
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if isinstance(obj, Decimal):
+        return int(obj) if obj == obj.to_integral_value() else float(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    if hasattr(obj, '__slots__') and hasattr(obj, '__dataclass_fields__'):
+        return {name: getattr(obj, name) for name in obj.__dataclass_fields__}
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+def stdlib_dumps(obj, sort_keys: bool = False) -> bytes:
+    return json.dumps(obj, default=_default, ensure_ascii=False, separators=(',', ':'), sort_keys=sort_keys).encode()
+
+def orjson_dumps(obj, sort_keys: bool = False) -> bytes:
+    # orjson encodes datetimes natively; Decimal and the rest go through _default
+    option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_SORT_KEYS if sort_keys else 0)
+    return orjson.dumps(obj, default=_default, option=option)
+
+ENCODERS = {'stdlib': stdlib_dumps}
+if orjson is not None:
+    ENCODERS['orjson'] = orjson_dumps
+
+def get_encoder(name: str = None):
+    """Return the encoder called name, or the fastest installed one"""
+    name = (name or os.environ.get('JSON_ENCODER', 'auto')).lower()
+    if name == 'auto':
+        name = 'orjson' if 'orjson' in ENCODERS else 'stdlib'
+    if name not in ENCODERS:
+        print(f"JSON encoder {name} not available, falling back to stdlib")
+        name = 'stdlib'
+    return name, ENCODERS[name]
+
+class FastJSONProvider(DefaultJSONProvider):
+    """JSON provider serialising responses with the configured encoder
+
+    Honours sort_keys like Flask's provider; pretty-printed responses
+    (compact False, or None in debug mode) go through the stdlib encoder.
+    """
+
+    def __init__(self, app):
+        super().__init__(app)
+        self.encoder_name, self._encode = get_encoder(app.config.get('JSON_ENCODER'))
+
+    def dumps(self, obj, **kwargs) -> str:
+        if kwargs:
+            # Callers asking for specific formatting get the stdlib encoder
+            kwargs.setdefault('default', _default)
+            kwargs.setdefault('sort_keys', self.sort_keys)
+            return json.dumps(obj, **kwargs)
+        return self._encode(obj, sort_keys=self.sort_keys).decode()
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        if self.compact is False or (self.compact is None and self._app.debug):
+            return self._app.response_class(
+                self.dumps(obj, indent=2, ensure_ascii=self.ensure_ascii) + '\n', mimetype=self.mimetype
+            )
+        # Hand the encoded bytes straight to the response, skipping a decode
+        return self._app.response_class(self._encode(obj, sort_keys=self.sort_keys) + b'\n', mimetype=self.mimetype)
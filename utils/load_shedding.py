@@ -0,0 +1,131 @@
+import json
+import math
+import threading
+import time
+from flask import request, g
+from utils.metrics import metrics
+
+CRITICAL = 'critical'
+NORMAL = 'normal'
+LOW = 'low'
+
+# Share of the concurrency limit each priority may fill; lower priorities are
+# turned away first as requests pile up
+PRIORITY_SHARES = {CRITICAL: 1.0, NORMAL: 0.8, LOW: 0.5}
+
+def request_priority():
+    """Writes (logins, submits, uploads...) are critical, signed-in reads normal, public reads low"""
+    if request.method not in ('GET', 'HEAD'):
+        return CRITICAL
+    if request.headers.get('Authorization'):
+        return NORMAL
+    return LOW
+
+class AdaptiveLimit:
+    """Concurrency limit that follows observed latency (gradient algorithm)
+
+    Compares a short-term average of request latency with a long-term one.
+    While they agree the limit grows by about sqrt(limit) per sample; when
+    requests slow down (queueing, a throttled backend) the limit shrinks in
+    proportion, down to half per sample.
+
+    Args:
+        initial: Starting limit
+        min_limit, max_limit: Bounds of the limit
+        tolerance: How much slower than usual requests may get before the limit shrinks
+        smoothing: Weight of each new sample in the limit
+    """
+
+    def __init__(self, initial: int = 20, min_limit: int = 4, max_limit: int = 200,
+                 tolerance: float = 1.5, smoothing: float = 0.2):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.tolerance = tolerance
+        self.smoothing = smoothing
+        self._limit = float(initial)
+        self._short_latency = None
+        self._long_latency = None
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def acquire(self, share: float = 1.0) -> bool:
+        """Admit a request if fewer than share * limit are in flight"""
+        with self._lock:
+            if self._in_flight >= max(self._limit * share, 1):
+                return False
+            self._in_flight += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self._in_flight -= 1
+
+    def observe(self, latency: float):
+        """Adjust the limit with one request's latency in seconds"""
+        with self._lock:
+            if self._short_latency is None:
+                self._short_latency = self._long_latency = latency
+                return
+            self._short_latency += (latency - self._short_latency) * 0.1
+            self._long_latency += (latency - self._long_latency) * 0.005
+            if self._long_latency > self._short_latency * 2:
+                # Recover quickly once a sustained slowdown has passed
+                self._long_latency *= 0.95
+
+            # Only grow when the limit is actually what's holding requests back
+            if self._in_flight < self._limit / 2 and self._short_latency <= self._long_latency * self.tolerance:
+                return
+            gradient = max(0.5, min(1.0, self.tolerance * self._long_latency / self._short_latency))
+            target = self._limit * gradient + math.sqrt(self._limit)
+            self._limit = self._limit * (1 - self.smoothing) + target * self.smoothing
+            self._limit = max(self.min_limit, min(self.max_limit, self._limit))
+
+def init_load_shedding(app, limiter: AdaptiveLimit, priority=request_priority,
+                       exempt_endpoints=('get_metrics',), retry_after: int = 1):
+    """Admit requests through limiter, rejecting excess ones with a 503 by priority
+
+    Register before the other request hooks so a rejected request costs as
+    little as possible. Latency is measured until the handler returns, so
+    streamed responses count by their time to first byte; their slot is held
+    until the stream finishes.
+    """
+
+    @app.before_request
+    def admit_request():
+        if request.method == 'OPTIONS' or request.endpoint in exempt_endpoints:
+            return
+        level = priority()
+        if not limiter.acquire(PRIORITY_SHARES[level]):
+            metrics.increment(f'load_shedding.rejected.{level}')
+            metrics.set_gauge('load_shedding.limit', limiter.limit)
+            response = app.response_class(
+                json.dumps({"error": "Server is busy, please retry shortly"}),
+                status=503,
+                mimetype='application/json'
+            )
+            response.headers['Retry-After'] = str(retry_after)
+            return response
+        g.load_shedding_started = time.monotonic()
+
+    @app.after_request
+    def observe_latency(response):
+        started = g.get('load_shedding_started')
+        if started is not None:
+            limiter.observe(time.monotonic() - started)
+        return response
+
+    @app.teardown_request
+    def release_slot(exc=None):
+        if g.pop('load_shedding_started', None) is None:
+            return
+        limiter.release()
+        metrics.set_gauge('load_shedding.limit', limiter.limit)
+        metrics.set_gauge('load_shedding.in_flight', limiter.in_flight)
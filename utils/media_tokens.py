@@ -0,0 +1,39 @@
+import base64
+import hashlib
+import hmac
+import time
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).decode().rstrip('=')
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + '=' * (-len(data) % 4))
+
+def _sign(secret: str, key: str, expires_at: int) -> str:
+    message = f"{key}\n{expires_at}".encode()
+    return _b64encode(hmac.new(secret.encode(), message, hashlib.sha256).digest())
+
+def generate_media_token(key: str, secret: str, expires_in: int = 3600) -> str:
+    """Issue a signed token granting download access to one S3 key
+
+    The expiry is rounded up to the next `expires_in` boundary, so a token stays
+    valid for between one and two periods and the same key yields the same token
+    within a period (which keeps ETags on responses embedding it stable).
+    """
+    expires_at = (int(time.time()) // expires_in + 2) * expires_in
+    return f"{_b64encode(key.encode())}.{expires_at}.{_sign(secret, key, expires_at)}"
+
+def verify_media_token(token: str, secret: str):
+    """Return the S3 key a token grants access to, or None if it is invalid or expired"""
+    try:
+        encoded_key, expires_at, signature = token.split('.')
+        key = _b64decode(encoded_key).decode()
+        expires_at = int(expires_at)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+    if not hmac.compare_digest(signature, _sign(secret, key, expires_at)):
+        return None
+    if expires_at < time.time():
+        return None
+    return key
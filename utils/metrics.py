@@ -0,0 +1,50 @@
+import threading
+import time
+
+class Metrics:
+    """Thread-safe in-process counters, gauges and timing summaries.
+
+    Values are per worker process; `/api/metrics` exposes a snapshot.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._gauges = {}
+        self._observations = {}
+        self._started_at = time.time()
+
+    def increment(self, name: str, value: float = 1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def set_gauge(self, name: str, value: float):
+        with self._lock:
+            self._gauges[name] = value
+
+    def observe(self, name: str, value: float):
+        """Record one sample of a distribution (latency, ratio, size...)"""
+        with self._lock:
+            summary = self._observations.get(name)
+            if summary is None:
+                self._observations[name] = {'count': 1, 'sum': value, 'min': value, 'max': value}
+                return
+            summary['count'] += 1
+            summary['sum'] += value
+            summary['min'] = min(summary['min'], value)
+            summary['max'] = max(summary['max'], value)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            observations = {
+                name: dict(summary, avg=summary['sum'] / summary['count'])
+                for name, summary in self._observations.items()
+            }
+            return {
+                'uptime_seconds': round(time.time() - self._started_at, 1),
+                'counters': dict(self._counters),
+                'gauges': dict(self._gauges),
+                'observations': observations
+            }
+
+metrics = Metrics()
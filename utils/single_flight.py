@@ -0,0 +1,50 @@
+import threading
+from utils.metrics import metrics
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    """Collapses identical concurrent computations into one.
+
+    The first caller for a key runs the computation; callers arriving with
+    the same key while it is in flight wait for it and get the same result
+    (or exception) instead of repeating the work. Nothing is kept once the
+    computation finishes, so results are never stale. Callers share the
+    result object and must not mutate it.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: tuple, fn, *args, **kwargs):
+        """Return fn(*args, **kwargs), sharing an in-flight call for key if there is one"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            metrics.increment(f'single_flight.coalesced.{key[0]}')
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+single_flight = SingleFlight()
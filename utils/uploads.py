@@ -0,0 +1,152 @@
+import hashlib
+from flask import Request, request, jsonify
+from werkzeug.exceptions import RequestEntityTooLarge, UnsupportedMediaType
+
+MB = 1024 * 1024
+
+# Enough leading bytes to recognise every type below
+SNIFF_BYTES = 16
+
+def sniff_mime_type(head: bytes):
+    """Identify a media file from its magic number, or None if it isn't one we accept"""
+    if head.startswith(b'\xff\xd8\xff'):
+        return 'image/jpeg'
+    if head.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'image/png'
+    if head[:6] in (b'GIF87a', b'GIF89a'):
+        return 'image/gif'
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'image/webp'
+    if head[4:8] == b'ftyp':
+        # ISO base media file: the brand tells HEIC photos from MP4/MOV videos
+        brand = head[8:12]
+        if brand in (b'heic', b'heix', b'hevc', b'mif1', b'msf1'):
+            return 'image/heic'
+        if brand == b'qt  ':
+            return 'video/quicktime'
+        return 'video/mp4'
+    if head.startswith(b'\x1a\x45\xdf\xa3'):
+        return 'video/webm'
+    return None
+
+class UploadPolicy:
+    """Size limits for one endpoint's uploads
+
+    Args:
+        max_request: Largest accepted request body, checked against Content-Length
+        max_sizes: Largest accepted file per media category ('image', 'video');
+            files of other types are rejected
+    """
+
+    def __init__(self, max_request: int, max_sizes: dict):
+        self.max_request = max_request
+        self.max_sizes = max_sizes
+
+class _CheckedUpload:
+    """File part container that sniffs the type from the first bytes written
+    and enforces the policy while the multipart parser is still reading, so a
+    bad upload is cut off within its first chunk. The bytes are hashed as
+    they are written, so the content hash needs no second pass."""
+
+    def __init__(self, stream, policy: UploadPolicy):
+        self._stream = stream
+        self._policy = policy
+        self._head = b''
+        self._size = 0
+        self._max_size = None
+        self.sniffed_type = None
+        self._digest = hashlib.sha256()
+
+    @property
+    def sha256(self) -> str:
+        return self._digest.hexdigest()
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    @property
+    def media_category(self):
+        return self.sniffed_type.split('/')[0] if self.sniffed_type else None
+
+    def _check_type(self):
+        if not self._size:
+            raise UnsupportedMediaType("Empty files are not accepted")
+        self.sniffed_type = sniff_mime_type(self._head)
+        if self.media_category not in self._policy.max_sizes:
+            raise UnsupportedMediaType(
+                f"Only {', '.join(sorted(self._policy.max_sizes))} files are accepted"
+            )
+        self._max_size = self._policy.max_sizes[self.media_category]
+
+    def write(self, data: bytes):
+        self._size += len(data)
+        self._digest.update(data)
+        if self.sniffed_type is None and len(self._head) < SNIFF_BYTES:
+            self._head += data[:SNIFF_BYTES - len(self._head)]
+            if len(self._head) >= SNIFF_BYTES:
+                self._check_type()
+        if self._max_size is not None and self._size > self._max_size:
+            raise RequestEntityTooLarge(
+                f"{self.media_category.capitalize()} files are limited to {self._max_size // MB} MB"
+            )
+        return self._stream.write(data)
+
+    def seek(self, *args):
+        # The parser rewinds once the part is complete; files shorter than
+        # SNIFF_BYTES (including empty ones) are checked here
+        if self.sniffed_type is None:
+            self._check_type()
+        return self._stream.seek(*args)
+
+    def __iter__(self):
+        return iter(self._stream)
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+class UploadRequest(Request):
+    """Request whose file parts are checked against `upload_policy` as they stream in"""
+
+    upload_policy = None
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        stream = super()._get_file_stream(total_content_length, content_type, filename, content_length)
+        if self.upload_policy is None:
+            return stream
+        return _CheckedUpload(stream, self.upload_policy)
+
+def uploaded_type(file):
+    """Content type sniffed from an upload's bytes, falling back to the client's claim"""
+    return getattr(file.stream, 'sniffed_type', None) or file.content_type
+
+def uploaded_digest(file):
+    """(sha256 hex digest, size) computed while the upload streamed in, or None
+    for files parsed without an upload policy"""
+    stream = file.stream
+    if not isinstance(stream, _CheckedUpload):
+        return None
+    return stream.sha256, stream.size
+
+def init_upload_limits(app, policies: dict):
+    """Enforce an UploadPolicy on the endpoints named in policies
+
+    Requests whose Content-Length exceeds the policy get a 413 before any of
+    the body is read; file parts of the wrong type or size get a 415 or 413
+    as soon as their first bytes arrive.
+    """
+    app.request_class = UploadRequest
+
+    @app.before_request
+    def apply_upload_policy():
+        policy = policies.get(request.endpoint)
+        if policy is None or request.method not in ('POST', 'PUT'):
+            return
+        request.upload_policy = policy
+        request.max_content_length = policy.max_request
+
+    def upload_error(error):
+        return jsonify({"error": error.description}), error.code
+
+    app.register_error_handler(RequestEntityTooLarge, upload_error)
+    app.register_error_handler(UnsupportedMediaType, upload_error)